@@ -0,0 +1,167 @@
+# app/admission.py
+"""
+Admission control: a bound on how many requests a router works on at once.
+
+When storage slows down, requests would otherwise pile up in the worker
+(each holding its payload, a DB-executor slot, a lock queue entry) until
+clients time out or the process runs out of memory. In front of a router,
+an AdmissionLimiter lets at most `max_concurrent` requests run; the next
+`max_queue` wait in arrival order, each for at most `queue_timeout`
+seconds. Anything beyond that is shed at once:
+
+  429 Too Many Requests   – the wait queue is full
+  503 Service Unavailable – the request waited queue_timeout without a slot
+
+both with Retry-After. The chat route can answer shed requests with a
+degraded reply instead (AI_BUDDY_CHAT_DEGRADED=1, see chat_router.py).
+
+Metrics (ai_buddy_admission_* in /metrics): requests running and queued,
+shed counts by reason, degraded replies and the time spent queued.
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+
+from app.config import settings
+from app.metrics import Counter, Gauge, Histogram, REGISTRY
+
+admission_active = Gauge(
+    "ai_buddy_admission_active", "Requests admitted and running.", "limiter")
+admission_queued = Gauge(
+    "ai_buddy_admission_queue_depth", "Requests waiting for a slot.", "limiter")
+admission_shed = Counter(
+    "ai_buddy_admission_shed_total", "Requests rejected by admission control.", ("limiter", "reason"))
+admission_degraded = Counter(
+    "ai_buddy_admission_degraded_total", "Shed requests answered with a degraded reply.", ("limiter",))
+admission_wait_seconds = Histogram(
+    "ai_buddy_admission_queue_wait_seconds", "Time spent queued for a slot (admitted or not).", "limiter")
+REGISTRY.extend([admission_active, admission_queued, admission_shed, admission_degraded, admission_wait_seconds])
+
+
+class Overloaded(HTTPException):
+    """Raised by AdmissionLimiter.admit() when a request is shed."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(
+            status_code=status_code,
+            detail=f"Server busy ({reason}), retry later",
+            headers={"Retry-After": str(retry_after)}
+        )
+        self.reason = reason
+
+
+class AdmissionLimiter:
+    """Concurrency limit + bounded FIFO wait queue; all use must happen on one event loop."""
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float,
+                 retry_after: int):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self._waiters = deque()     # futures of queued requests, oldest first
+
+        admission_active.register(name, lambda: self.active)
+        admission_queued.register(name, lambda: len(self._waiters))
+
+    @property
+    def enabled(self):
+        return self.max_concurrent > 0
+
+    @asynccontextmanager
+    async def admit(self):
+        """`async with limiter.admit():` runs the block in a slot, or raises Overloaded."""
+        if not self.enabled:
+            yield
+            return
+
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+        else:
+            await self._wait()
+
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def dependency(self):
+        """The same as a FastAPI dependency, for routers whose routes are plain functions."""
+        async with self.admit():
+            yield
+
+    async def _wait(self):
+        if len(self._waiters) >= self.max_queue:
+            self._shed("queue_full", 429)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait((waiter,), timeout=self.queue_timeout)
+        except BaseException:
+            # cancelled (client went away): give back a slot handed over meanwhile
+            self._abandon(waiter)
+            raise
+        finally:
+            admission_wait_seconds.observe(self.name, time.perf_counter() - started)
+
+        if not waiter.done():
+            self._abandon(waiter)
+            self._shed("queue_timeout", 503)
+
+    def _abandon(self, waiter):
+        if waiter.done() and not waiter.cancelled():
+            self._release()
+        else:
+            waiter.cancel()
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+
+    def _release(self):
+        # the slot goes straight to the oldest waiter, so late arrivals
+        # can't overtake the queue
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def _shed(self, reason: str, status_code: int):
+        admission_shed.inc(self.name, reason)
+        raise Overloaded(status_code, reason, self.retry_after)
+
+    def record_degraded(self):
+        admission_degraded.inc(self.name)
+
+    def stats(self):
+        return {
+            "active": self.active,
+            "queued": len(self._waiters),
+            "shed_queue_full": admission_shed.value(self.name, "queue_full"),
+            "shed_queue_timeout": admission_shed.value(self.name, "queue_timeout"),
+            "degraded": admission_degraded.value(self.name),
+        }
+
+
+def _limiter(name: str, max_concurrent: int):
+    return AdmissionLimiter(
+        name,
+        max_concurrent=max_concurrent,
+        max_queue=settings.admission_queue,
+        queue_timeout=settings.admission_queue_timeout,
+        retry_after=settings.admission_retry_after
+    )
+
+
+chat_admission = _limiter("chat", settings.chat_concurrency)
+emotion_admission = _limiter("emotion", settings.emotion_concurrency)
@@ -0,0 +1,96 @@
+# app/config.py
+"""
+Runtime configuration, read once from the environment (AI_BUDDY_* vars).
+"""
+
+import os
+
+
+def _env(name: str, default: str):
+    return os.getenv(f"AI_BUDDY_{name}", default)
+
+
+class Settings:
+
+    def __init__(self):
+        # ---------------------------
+        # MongoDB
+        # ---------------------------
+        self.mongo_uri = _env("MONGO_URI", "mongodb://localhost:27017/")
+        self.mongo_db = _env("MONGO_DB", "ai_buddy")
+        self.mongo_max_pool_size = int(_env("MONGO_MAX_POOL_SIZE", "50"))
+        self.mongo_min_pool_size = int(_env("MONGO_MIN_POOL_SIZE", "0"))
+        self.mongo_server_selection_timeout_ms = int(_env("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+        self.mongo_connect_timeout_ms = int(_env("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+        self.mongo_socket_timeout_ms = int(_env("MONGO_SOCKET_TIMEOUT_MS", "10000"))
+
+        # ---------------------------
+        # Storage backend: mongo | memory | sqlite (see app/db/storage.py)
+        # ---------------------------
+        self.storage_backend = _env("STORAGE", "mongo")
+        self.sqlite_path = _env("SQLITE_PATH", "ai_buddy.db")
+
+        # Latency / rate instrumentation and GET /metrics (see app/metrics.py)
+        self.metrics_enabled = _env("METRICS", "1") == "1"
+
+        # Bounded pool for blocking storage calls from async routes
+        self.db_threads = int(_env("DB_THREADS", "16"))
+
+        # ---------------------------
+        # Admission control for /chat and /emotion (see app/admission.py);
+        # a concurrency of 0 turns the limiter off
+        # ---------------------------
+        self.chat_concurrency = int(_env("CHAT_CONCURRENCY", "64"))
+        self.emotion_concurrency = int(_env("EMOTION_CONCURRENCY", "128"))
+        self.admission_queue = int(_env("ADMISSION_QUEUE", "256"))
+        self.admission_queue_timeout = float(_env("ADMISSION_QUEUE_TIMEOUT", "2.0"))
+        self.admission_retry_after = int(_env("ADMISSION_RETRY_AFTER", "1"))
+        self.chat_degraded = _env("CHAT_DEGRADED", "0") == "1"
+
+        # ---------------------------
+        # Caches
+        # ---------------------------
+        self.cache_size = int(_env("CACHE_SIZE", "10000"))
+        self.cache_ttl = float(_env("CACHE_TTL", "5"))
+
+        # ---------------------------
+        # Emotion history
+        # ---------------------------
+        self.emotion_history_backend = _env("EMOTION_HISTORY", "memory")   # memory | mongo
+        self.emotion_history_users = int(_env("EMOTION_HISTORY_USERS", "10000"))
+        self.emotion_cache_size = int(_env("EMOTION_CACHE_SIZE", "10000"))
+
+        # ---------------------------
+        # Style write-behind
+        # ---------------------------
+        self.style_write_behind = _env("STYLE_WRITE_BEHIND", "0") == "1"
+        self.style_flush_users = int(_env("STYLE_FLUSH_USERS", "500"))
+        self.style_flush_interval = float(_env("STYLE_FLUSH_INTERVAL", "1.0"))
+
+        # ---------------------------
+        # Personality profiles (see profile_store.py)
+        # ---------------------------
+        self.profile_cache_users = int(_env("PROFILE_CACHE_USERS", "10000"))
+        self.profile_flush_users = int(_env("PROFILE_FLUSH_USERS", "100"))
+        self.profile_flush_interval = float(_env("PROFILE_FLUSH_INTERVAL", "5.0"))
+        # Columnar slider snapshot (path prefix, "" = none), memory-mapped on
+        # startup and written on shutdown; one per process (see slider_store.py)
+        self.profile_snapshot = _env("PROFILE_SNAPSHOT", "")
+        # Drift of idle users' sliders toward the defaults: every
+        # PROFILE_DECAY_INTERVAL seconds, users idle PROFILE_DECAY_IDLE
+        # seconds move PROFILE_DECAY_RATE of the way back (0 = off)
+        self.profile_decay_rate = float(_env("PROFILE_DECAY_RATE", "0"))
+        self.profile_decay_idle = float(_env("PROFILE_DECAY_IDLE", "86400"))
+        self.profile_decay_interval = float(_env("PROFILE_DECAY_INTERVAL", "86400"))
+
+        # ---------------------------
+        # Memory archive: cold tier behind the hot window (see memory_archive.py).
+        # Opt-in: with it off, evicted memories are dropped as before
+        # ---------------------------
+        self.archive_enabled = _env("ARCHIVE", "0") == "1"
+        self.archive_block_size = int(_env("ARCHIVE_BLOCK_SIZE", "64"))
+        self.archive_recall_candidates = int(_env("ARCHIVE_RECALL_CANDIDATES", "32"))
+        self.archive_recall_blocks = int(_env("ARCHIVE_RECALL_BLOCKS", "8"))
+
+
+settings = Settings()
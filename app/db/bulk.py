@@ -0,0 +1,31 @@
+# app/db/bulk.py
+
+from pymongo.errors import BulkWriteError, PyMongoError
+
+
+def bulk_write_by_user(collection, ops_by_user: dict):
+    """
+    Run one write op per user in a single unordered bulk_write.
+
+    ops_by_user: { user_id: pymongo write op }
+    Returns { user_id: error message } for the users whose write failed,
+    so callers can report per-item errors instead of failing the batch.
+    """
+    if not ops_by_user:
+        return {}
+
+    user_ids = list(ops_by_user)
+    ops = [ops_by_user[u] for u in user_ids]
+
+    try:
+        collection.bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        return {
+            user_ids[err["index"]]: err.get("errmsg", "write failed")
+            for err in e.details.get("writeErrors", [])
+        }
+    except PyMongoError as e:
+        # nothing is known to have been written
+        return {u: str(e) for u in user_ids}
+
+    return {}
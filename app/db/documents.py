@@ -0,0 +1,99 @@
+# app/db/documents.py
+"""
+Storage-neutral shapes of the stored documents, shared by every backend.
+
+A memory window is { memories: [...], memory_count, emotion_counts } plus,
+when archiving, archive_pending: the evicted memories (without vectors)
+waiting to be sealed into an archive block. A style document is
+{ total_messages, total_emojis, total_length, total_exclaims, slang_used }.
+The embedded backends apply writes with the helpers below; Mongo does the
+same thing server-side (see mongo_store.py).
+"""
+
+import heapq
+
+# How many recent memories each user keeps
+MEMORY_CAP = 20
+
+
+def append_to_window(window: dict, memories: list, archive: bool = False):
+    """
+    Append memories to a window in place, trim it to MEMORY_CAP and keep
+    emotion_counts in step (+1 per incoming memory, -1 per evicted one).
+    With `archive`, evicted memories move to archive_pending instead of
+    being dropped.
+    """
+    stored = window.setdefault("memories", [])
+    counts = window.setdefault("emotion_counts", {})
+
+    stored.extend(memories)
+    for memory in memories:
+        counts[memory["emotion"]] = counts.get(memory["emotion"], 0) + 1
+
+    if len(stored) > MEMORY_CAP:
+        for evicted in stored[:-MEMORY_CAP]:
+            counts[evicted["emotion"]] -= 1
+            if not counts[evicted["emotion"]]:
+                del counts[evicted["emotion"]]
+        if archive:
+            window.setdefault("archive_pending", []).extend(
+                archived_form(m) for m in stored[:-MEMORY_CAP]
+            )
+        del stored[:-MEMORY_CAP]
+
+    window["memory_count"] = len(stored)
+    return window
+
+
+def archived_form(memory: dict):
+    """What the archive keeps of a memory: vectors are recomputed on recall."""
+    return {"text": memory["text"], "emotion": memory["emotion"], "timestamp": memory["timestamp"]}
+
+
+# ---------------------------
+# Archive term index
+# ---------------------------
+# Archived memories are addressed as block_no * ID_STRIDE + slot in block
+ID_STRIDE = 1 << 16
+
+# A term found in more archived memories than this keeps only its count
+# (df): it is too common to narrow a search, and its postings would grow
+# with the history
+MAX_POSTINGS = 256
+
+
+def archive_memory_id(block_no: int, slot: int):
+    return block_no * ID_STRIDE + slot
+
+
+def add_postings(entry: dict, ids: list):
+    """
+    A term's { df, ids } after `ids` are added: ids stays the full postings
+    list until df passes MAX_POSTINGS, then it is dropped for good.
+    """
+    df = (entry["df"] if entry else 0) + len(ids)
+    if df > MAX_POSTINGS:
+        return {"df": df, "ids": []}
+    return {"df": df, "ids": (entry["ids"] if entry else []) + ids}
+
+
+def apply_style_delta(doc: dict, delta: dict):
+    """Returns the raw style document with `delta` applied (doc is not modified)."""
+    doc = dict(doc or {})
+    for field, amount in delta["inc"].items():
+        doc[field] = doc.get(field, 0) + amount
+    slang_used = list(doc.get("slang_used", []))
+    for slang in delta["slang"]:
+        if slang not in slang_used:
+            slang_used.append(slang)
+    doc["slang_used"] = slang_used
+    return doc
+
+
+def merge_user_ids(*sorted_ids):
+    """Sorted, distinct union of several sorted user_id streams (lazily)."""
+    previous = None
+    for user_id in heapq.merge(*sorted_ids):
+        if user_id != previous:
+            yield user_id
+            previous = user_id
@@ -0,0 +1,26 @@
+# app/db/executor.py
+
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from app.config import settings
+
+# Bounded pool for blocking pymongo calls.
+# Async routes hand their storage work to this pool so a slow Mongo round trip
+# only ties up one worker thread instead of the whole event loop.
+db_executor = ThreadPoolExecutor(
+    max_workers=settings.db_threads,
+    thread_name_prefix="ai-buddy-db"
+)
+
+
+async def run_in_db_executor(func, *args, **kwargs):
+    """
+    Run a blocking storage call on the DB executor and await its result.
+    The call sees the caller's contextvars (per-request metrics).
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(db_executor, partial(context.run, func, *args, **kwargs))
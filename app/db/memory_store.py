@@ -0,0 +1,183 @@
+# app/db/memory_store.py
+"""
+In-process storage backend: plain dicts behind one lock.
+
+Every call holds the lock for its whole read-modify-write, so writes are
+atomic exactly like their Mongo counterparts. Callers get copies, never the
+stored objects. Nothing is persisted.
+"""
+
+import threading
+
+from app.db.documents import add_postings, append_to_window, apply_style_delta, archive_memory_id
+from app.db.storage import Storage
+
+
+class InMemoryStorage(Storage):
+
+    def __init__(self, archive: bool = False):
+        self.archive = archive
+        self._windows = {}   # user_id → { memories, memory_count, emotion_counts, archive_pending }
+        self._styles = {}    # user_id → raw style document
+        self._profiles = {}  # user_id → personality profile document
+        self._blocks = {}    # user_id → [archive block, ...], index = block_no
+        self._postings = {}  # user_id → { term: { df, ids } }
+        self._lock = threading.Lock()
+
+    # ---------------------------
+    # Memory windows
+    # ---------------------------
+    def append_memories(self, user_id: str, memories: list):
+        with self._lock:
+            window = append_to_window(self._windows.setdefault(user_id, {}), memories, self.archive)
+            return dict(_counts(window), archive_pending=len(window.get("archive_pending", ())))
+
+    def append_memories_many(self, memories_by_user: dict):
+        with self._lock:
+            for user_id, memories in memories_by_user.items():
+                append_to_window(self._windows.setdefault(user_id, {}), memories, self.archive)
+        return {}
+
+    def get_memories(self, user_id: str):
+        with self._lock:
+            window = self._windows.get(user_id)
+            return list(window["memories"]) if window else []
+
+    def get_memories_many(self, user_ids: list):
+        with self._lock:
+            return {
+                u: list(self._windows[u]["memories"]) if u in self._windows else []
+                for u in user_ids
+            }
+
+    def get_memory_windows(self, user_ids: list):
+        with self._lock:
+            return {u: self._window(u) for u in user_ids}
+
+    def _window(self, user_id: str):
+        # caller holds the lock
+        window = self._windows.get(user_id, {})
+        return {
+            "memories": list(window.get("memories", ())),
+            "archive_pending": len(window.get("archive_pending", ())),
+            "archive_blocks": len(self._blocks.get(user_id, ()))
+        }
+
+    def get_memory_counts(self, user_id: str):
+        with self._lock:
+            window = self._windows.get(user_id)
+            return _counts(window) if window else None
+
+    # ---------------------------
+    # Memory archive
+    # ---------------------------
+    def seal_archive_blocks(self, user_ids: list, block_size: int, build_block):
+        sealed = 0
+        with self._lock:
+            for user_id in user_ids:
+                pending = self._windows.get(user_id, {}).get("archive_pending", [])
+                while len(pending) >= block_size:
+                    blocks = self._blocks.setdefault(user_id, [])
+                    block_no = len(blocks)
+                    block = build_block(pending[:block_size])
+                    blocks.append({
+                        "user_id": user_id, "block_no": block_no,
+                        **{k: v for k, v in block.items() if k != "postings"}
+                    })
+                    index = self._postings.setdefault(user_id, {})
+                    for term, slots in block["postings"].items():
+                        index[term] = add_postings(index.get(term), [archive_memory_id(block_no, s) for s in slots])
+                    del pending[:block_size]
+                    sealed += 1
+        return sealed
+
+    def get_archive_pending(self, user_id: str):
+        with self._lock:
+            return [dict(m) for m in self._windows.get(user_id, {}).get("archive_pending", [])]
+
+    def get_archive_postings(self, user_id: str, terms: list):
+        with self._lock:
+            index = self._postings.get(user_id, {})
+            return {
+                t: {"df": index[t]["df"], "ids": list(index[t]["ids"])}
+                for t in terms if t in index
+            }
+
+    def get_archive_blocks(self, user_id: str, block_nos: list):
+        with self._lock:
+            blocks = self._blocks.get(user_id, [])
+            return [
+                {"block_no": n, "data": blocks[n]["data"]}
+                for n in block_nos if 0 <= n < len(blocks)
+            ]
+
+    # ---------------------------
+    # Style documents
+    # ---------------------------
+    def update_style(self, user_id: str, delta: dict):
+        with self._lock:
+            doc = self._styles[user_id] = apply_style_delta(self._styles.get(user_id, {"user_id": user_id}), delta)
+            return _copy_style(doc)
+
+    def update_styles_many(self, deltas_by_user: dict):
+        with self._lock:
+            for user_id, delta in deltas_by_user.items():
+                self._styles[user_id] = apply_style_delta(self._styles.get(user_id, {"user_id": user_id}), delta)
+        return {}
+
+    def get_style_docs(self, user_ids: list):
+        with self._lock:
+            return {
+                u: _copy_style(self._styles[u]) if u in self._styles else None
+                for u in user_ids
+            }
+
+    # ---------------------------
+    # Personality profiles
+    # ---------------------------
+    def get_profile_docs(self, user_ids: list):
+        # stored as encoded-once documents, so a shallow copy is enough
+        with self._lock:
+            return {u: dict(self._profiles[u]) if u in self._profiles else None for u in user_ids}
+
+    def save_profile_docs(self, docs_by_user: dict):
+        with self._lock:
+            for user_id, doc in docs_by_user.items():
+                self._profiles[user_id] = dict(doc, user_id=user_id)
+        return {}
+
+    # ---------------------------
+    # Export
+    # ---------------------------
+    def iter_user_ids(self, start: str = None, end: str = None, batch_size: int = 1000):
+        # everything is in this process already; only the sorted id list is extra
+        with self._lock:
+            user_ids = sorted(set(self._windows) | set(self._styles) | set(self._profiles))
+        return (
+            u for u in user_ids
+            if (start is None or u >= start) and (end is None or u < end)
+        )
+
+    def iter_archive_blocks(self, user_id: str, batch_size: int = 100):
+        with self._lock:
+            blocks = [
+                {"block_no": n, **{k: block[k] for k in ("count", "first_ts", "last_ts", "data")}}
+                for n, block in enumerate(self._blocks.get(user_id, []))
+            ]
+        return iter(blocks)
+
+    def clear(self):
+        with self._lock:
+            self._windows.clear()
+            self._styles.clear()
+            self._profiles.clear()
+            self._blocks.clear()
+            self._postings.clear()
+
+
+def _counts(window: dict):
+    return {"emotion_counts": dict(window["emotion_counts"]), "memory_count": window["memory_count"]}
+
+
+def _copy_style(doc: dict):
+    return dict(doc, slang_used=list(doc.get("slang_used", [])))
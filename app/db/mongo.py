@@ -1,6 +1,71 @@
+# app/db/mongo.py
+"""
+One shared, lazily created MongoClient per process.
+
+Nothing connects at import time: the client (and its connection pool) is
+built on the first get_client() call, with URI, pool size and timeouts
+from app.config. Index creation lives in ensure_indexes(), which the app
+runs from its startup hook.
+"""
+
+import threading
+
 from pymongo import MongoClient
 
-client = MongoClient("mongodb://localhost:27017/")
-db = client["ai_buddy"]
+from app.config import settings
+from app.metrics import mongo_event_listeners
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(
+                    settings.mongo_uri,
+                    maxPoolSize=settings.mongo_max_pool_size,
+                    minPoolSize=settings.mongo_min_pool_size,
+                    serverSelectionTimeoutMS=settings.mongo_server_selection_timeout_ms,
+                    connectTimeoutMS=settings.mongo_connect_timeout_ms,
+                    socketTimeoutMS=settings.mongo_socket_timeout_ms,
+                    event_listeners=mongo_event_listeners(),
+                    connect=False   # first operation opens the pool
+                )
+    return _client
+
+
+def get_db():
+    return get_client()[settings.mongo_db]
+
+
+def get_collection(name: str):
+    return get_db()[name]
+
+
+def ensure_indexes():
+    """Create the indexes every collection relies on (idempotent)."""
+    get_collection("memory_windows").create_index("user_id", unique=True)
+    get_collection("memory_archive").create_index([("user_id", 1), ("block_no", 1)], unique=True)
+    get_collection("archive_terms").create_index([("user_id", 1), ("term", 1)], unique=True)
+    get_collection("user_style").create_index("user_id", unique=True)
+    get_collection("personality_profiles").create_index("user_id", unique=True)
+    if settings.emotion_history_backend == "mongo":
+        get_collection("emotion_history").create_index("user_id", unique=True)
+
+
+def ping():
+    """Round trip to the server; raises if Mongo is unreachable."""
+    get_client().admin.command("ping")
+
+
+def close_client():
+    global _client
 
-memories_collection = db["memories"]
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
@@ -0,0 +1,397 @@
+# app/db/mongo_store.py
+"""
+MongoDB storage backend.
+
+memory_windows: one capped document per user, written with a single update
+pipeline (push + trim + aggregates). user_style: one counter document per
+user, written with $inc / $addToSet. memory_archive: sealed blocks of
+evicted memories. archive_terms: the archive's term index, one
+{ user_id, term, df, ids, last_block } postings document per user and term.
+"""
+
+from pymongo import ASCENDING, ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from app.db.bulk import bulk_write_by_user
+from app.db.documents import MAX_POSTINGS, MEMORY_CAP, archive_memory_id, merge_user_ids
+from app.db.mongo import close_client, ensure_indexes, get_collection, ping
+from app.db.storage import Storage
+
+
+class MongoStorage(Storage):
+
+    def __init__(self, archive: bool = False):
+        self.archive = archive
+
+    @property
+    def memories(self):
+        return get_collection("memory_windows")
+
+    @property
+    def blocks(self):
+        return get_collection("memory_archive")
+
+    @property
+    def terms(self):
+        return get_collection("archive_terms")
+
+    @property
+    def styles(self):
+        return get_collection("user_style")
+
+    @property
+    def profiles(self):
+        return get_collection("personality_profiles")
+
+    # ---------------------------
+    # Memory windows
+    # ---------------------------
+    def append_memories(self, user_id: str, memories: list):
+        # the new aggregates come back with the write itself
+        doc = self.memories.find_one_and_update(
+            {"user_id": user_id},
+            push_memories(memories, self.archive),
+            projection={"emotion_counts": 1, "memory_count": 1, "pending_count": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return {
+            "emotion_counts": doc.get("emotion_counts", {}),
+            "memory_count": doc["memory_count"],
+            "archive_pending": doc.get("pending_count", 0)
+        }
+
+    def append_memories_many(self, memories_by_user: dict):
+        ops = {
+            user_id: UpdateOne({"user_id": user_id}, push_memories(memories, self.archive), upsert=True)
+            for user_id, memories in memories_by_user.items()
+        }
+        return bulk_write_by_user(self.memories, ops)
+
+    def get_memories(self, user_id: str):
+        doc = self.memories.find_one({"user_id": user_id}, {"memories": 1})
+        return doc.get("memories", []) if doc else []
+
+    def get_memories_many(self, user_ids: list):
+        found = {
+            doc["user_id"]: doc.get("memories", [])
+            for doc in self.memories.find({"user_id": {"$in": list(user_ids)}}, {"user_id": 1, "memories": 1})
+        }
+        return {u: found.get(u, []) for u in user_ids}
+
+    def get_memory_window(self, user_id: str):
+        doc = self.memories.find_one(
+            {"user_id": user_id},
+            {"memories": 1, "pending_count": 1, "archive_blocks": 1}
+        ) or {}
+        return {
+            "memories": doc.get("memories", []),
+            "archive_pending": doc.get("pending_count", 0),
+            "archive_blocks": doc.get("archive_blocks", 0)
+        }
+
+    def get_memory_windows(self, user_ids: list):
+        found = {
+            doc["user_id"]: doc
+            for doc in self.memories.find(
+                {"user_id": {"$in": list(user_ids)}},
+                {"user_id": 1, "memories": 1, "pending_count": 1, "archive_blocks": 1}
+            )
+        }
+        return {
+            u: {
+                "memories": found.get(u, {}).get("memories", []),
+                "archive_pending": found.get(u, {}).get("pending_count", 0),
+                "archive_blocks": found.get(u, {}).get("archive_blocks", 0)
+            }
+            for u in user_ids
+        }
+
+    def get_memory_counts(self, user_id: str):
+        # documents written before the aggregates existed come back without
+        # memory_count; MemoryService falls back to counting the memories
+        return self.memories.find_one(
+            {"user_id": user_id},
+            {"_id": 0, "emotion_counts": 1, "memory_count": 1}
+        )
+
+    # ---------------------------
+    # Memory archive
+    # ---------------------------
+    def seal_archive_blocks(self, user_ids: list, block_size: int, build_block):
+        ready = self.memories.find(
+            {"user_id": {"$in": list(user_ids)}, "pending_count": {"$gte": block_size}},
+            {"user_id": 1, "pending_count": 1}
+        )
+        sealed = 0
+        for doc in list(ready):
+            for _ in range(doc["pending_count"] // block_size):
+                if not self._seal_block(doc["user_id"], block_size, build_block):
+                    break
+                sealed += 1
+        return sealed
+
+    def _seal_block(self, user_id: str, block_size: int, build_block):
+        doc = self.memories.find_one(
+            {"user_id": user_id, "pending_count": {"$gte": block_size}},
+            {"archive_pending": {"$slice": block_size}, "archive_blocks": 1}
+        )
+        if not doc:
+            return False
+
+        block_no = doc.get("archive_blocks", 0)
+        block = build_block(doc["archive_pending"])
+        postings = block.pop("postings")
+        try:
+            self.blocks.insert_one(dict(block, user_id=user_id, block_no=block_no))
+        except DuplicateKeyError:
+            # an earlier attempt stored this block but never trimmed the
+            # pending list; the block holds the same memories, so go on
+            pass
+        self._index_block(user_id, block_no, postings)
+
+        # only the writer that still sees block_no trims; a concurrent sealer
+        # of the same block matches nothing here
+        trimmed = self.memories.update_one({"user_id": user_id, "archive_blocks": block_no}, [
+            {"$set": {
+                "archive_pending": {"$slice": ["$archive_pending", block_size, PENDING_MAX]},
+                "archive_blocks": block_no + 1
+            }},
+            {"$set": {"pending_count": {"$size": "$archive_pending"}}}
+        ])
+        return trimmed.modified_count == 1
+
+    def get_archive_pending(self, user_id: str):
+        doc = self.memories.find_one({"user_id": user_id}, {"archive_pending": 1})
+        return doc.get("archive_pending", []) if doc else []
+
+    def _index_block(self, user_id: str, block_no: int, postings: dict):
+        # last_block makes a retried seal a no-op per term: the filter misses,
+        # the upsert hits the unique (user_id, term) index and fails with a
+        # duplicate key, which only means "already indexed"
+        ops = [
+            UpdateOne(
+                {"user_id": user_id, "term": term, "last_block": {"$lt": block_no}},
+                add_postings_update([archive_memory_id(block_no, s) for s in slots], block_no),
+                upsert=True
+            )
+            for term, slots in postings.items()
+        ]
+        if not ops:
+            return
+        try:
+            self.terms.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                raise
+
+    def get_archive_postings(self, user_id: str, terms: list):
+        return {
+            doc["term"]: {"df": doc["df"], "ids": doc.get("ids", [])}
+            for doc in self.terms.find(
+                {"user_id": user_id, "term": {"$in": list(terms)}},
+                {"_id": 0, "term": 1, "df": 1, "ids": 1}
+            )
+        }
+
+    def get_archive_blocks(self, user_id: str, block_nos: list):
+        found = {
+            doc["block_no"]: doc
+            for doc in self.blocks.find(
+                {"user_id": user_id, "block_no": {"$in": list(block_nos)}},
+                {"_id": 0, "block_no": 1, "data": 1}
+            )
+        }
+        return [found[n] for n in block_nos if n in found]
+
+    # ---------------------------
+    # Style documents
+    # ---------------------------
+    def update_style(self, user_id: str, delta: dict):
+        return self.styles.find_one_and_update(
+            {"user_id": user_id},
+            style_update(delta),
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+
+    def update_styles_many(self, deltas_by_user: dict):
+        ops = {
+            user_id: UpdateOne({"user_id": user_id}, style_update(delta), upsert=True)
+            for user_id, delta in deltas_by_user.items()
+        }
+        return bulk_write_by_user(self.styles, ops)
+
+    def get_style_docs(self, user_ids: list):
+        if len(user_ids) == 1:
+            return {user_ids[0]: self.styles.find_one({"user_id": user_ids[0]})}
+
+        found = {
+            doc["user_id"]: doc
+            for doc in self.styles.find({"user_id": {"$in": list(user_ids)}})
+        }
+        return {u: found.get(u) for u in user_ids}
+
+    # ---------------------------
+    # Personality profiles
+    # ---------------------------
+    def get_profile_docs(self, user_ids: list):
+        found = {
+            doc["user_id"]: doc
+            for doc in self.profiles.find({"user_id": {"$in": list(user_ids)}}, {"_id": 0})
+        }
+        return {u: found.get(u) for u in user_ids}
+
+    def save_profile_docs(self, docs_by_user: dict):
+        ops = {
+            user_id: ReplaceOne({"user_id": user_id}, dict(doc, user_id=user_id), upsert=True)
+            for user_id, doc in docs_by_user.items()
+        }
+        return bulk_write_by_user(self.profiles, ops)
+
+    # ---------------------------
+    # Export
+    # ---------------------------
+    def iter_user_ids(self, start: str = None, end: str = None, batch_size: int = 1000):
+        query = user_id_range(start, end)
+
+        # one cursor per collection, each walking its unique user_id index
+        cursors = [
+            (doc["user_id"] for doc in collection.find(query, {"_id": 0, "user_id": 1})
+                .sort("user_id", ASCENDING).batch_size(batch_size))
+            for collection in (self.memories, self.styles, self.profiles)
+        ]
+        return merge_user_ids(*cursors)
+
+    def iter_archive_blocks(self, user_id: str, batch_size: int = 100):
+        return self.blocks.find(
+            {"user_id": user_id},
+            {"_id": 0, "block_no": 1, "count": 1, "first_ts": 1, "last_ts": 1, "data": 1}
+        ).sort("block_no", ASCENDING).batch_size(batch_size)
+
+    # ---------------------------
+    # Lifecycle
+    # ---------------------------
+    def ensure_schema(self):
+        ensure_indexes()
+
+    def ping(self):
+        ping()
+
+    def close(self):
+        close_client()
+
+
+# ---------------------------
+# Update documents
+# ---------------------------
+# upper bound for "the rest of archive_pending" in a 3-argument $slice
+PENDING_MAX = 2 ** 31 - 1
+
+
+def push_memories(memories: list, archive: bool = False):
+    """
+    Update pipeline that appends memories, trims to MEMORY_CAP and keeps the
+    per-user aggregates in step — all in ONE atomic update:
+        memory_count   – size of the window
+        emotion_counts – { emotion: count } over the window; +1 for each
+                         incoming memory, -1 for each memory the cap evicts
+    With `archive`, the evicted memories (minus their vectors) are appended
+    to archive_pending and pending_count / archive_blocks are kept in step.
+    """
+    incoming = {"$literal": [m["emotion"] for m in memories]}
+    counters = {"$objectToArray": {"$ifNull": ["$emotion_counts", {}]}}
+
+    def count_in(emotions, emotion):
+        return {"$size": {"$filter": {"input": emotions, "cond": {"$eq": ["$$this", emotion]}}}}
+
+    # current counter of emotion $$e (0 if never seen)
+    previous = {"$ifNull": [{"$arrayElemAt": [
+        {"$map": {
+            "input": {"$filter": {"input": counters, "cond": {"$eq": ["$$this.k", "$$e"]}}},
+            "in": "$$this.v"
+        }},
+        0
+    ]}, 0]}
+    overflow = {"$subtract": [{"$size": "$_combined"}, MEMORY_CAP]}
+
+    trim = {
+        # emotions of the oldest memories pushed out by the cap
+        "_evicted": {"$cond": [
+            {"$gt": [overflow, 0]},
+            {"$slice": ["$_combined.emotion", overflow]},
+            []
+        ]},
+        "memories": {"$slice": ["$_combined", -MEMORY_CAP]}
+    }
+    aggregates = {"memory_count": {"$size": "$memories"}}
+
+    if archive:
+        trim["archive_pending"] = {"$concatArrays": [
+            {"$ifNull": ["$archive_pending", []]},
+            {"$cond": [
+                {"$gt": [overflow, 0]},
+                {"$map": {
+                    "input": {"$slice": ["$_combined", overflow]},
+                    "in": {"text": "$$this.text", "emotion": "$$this.emotion", "timestamp": "$$this.timestamp"}
+                }},
+                []
+            ]}
+        ]}
+        trim["archive_blocks"] = {"$ifNull": ["$archive_blocks", 0]}
+        aggregates["pending_count"] = {"$size": "$archive_pending"}
+
+    return [
+        {"$set": {
+            "_combined": {"$concatArrays": [{"$ifNull": ["$memories", []]}, {"$literal": memories}]}
+        }},
+        {"$set": trim},
+        {"$set": {
+            **aggregates,
+            "emotion_counts": {"$arrayToObject": {"$filter": {
+                "input": {"$map": {
+                    "input": {"$setUnion": [{"$map": {"input": counters, "in": "$$this.k"}}, incoming]},
+                    "as": "e",
+                    "in": {
+                        "k": "$$e",
+                        "v": {"$subtract": [
+                            {"$add": [previous, count_in(incoming, "$$e")]},
+                            count_in("$_evicted", "$$e")
+                        ]}
+                    }
+                }},
+                "cond": {"$gt": ["$$this.v", 0]}
+            }}}
+        }},
+        {"$project": {"_combined": 0, "_evicted": 0}}
+    ]
+
+
+def user_id_range(start: str = None, end: str = None):
+    """Filter for start <= user_id < end (None = unbounded)."""
+    bounds = {}
+    if start is not None:
+        bounds["$gte"] = start
+    if end is not None:
+        bounds["$lt"] = end
+    return {"user_id": bounds} if bounds else {}
+
+
+def add_postings_update(ids: list, block_no: int):
+    """Update pipeline doing documents.add_postings server-side."""
+    return [
+        {"$set": {
+            "df": {"$add": [{"$ifNull": ["$df", 0]}, len(ids)]},
+            "ids": {"$concatArrays": [{"$ifNull": ["$ids", []]}, {"$literal": ids}]},
+            "last_block": block_no
+        }},
+        {"$set": {"ids": {"$cond": [{"$gt": ["$df", MAX_POSTINGS]}, [], "$ids"]}}}
+    ]
+
+
+def style_update(delta: dict):
+    """Mongo update document for a style delta."""
+    return {
+        "$inc": delta["inc"],
+        "$addToSet": {"slang_used": {"$each": delta["slang"]}}
+    }
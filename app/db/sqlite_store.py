@@ -0,0 +1,456 @@
+# app/db/sqlite_store.py
+"""
+Embedded SQLite storage backend.
+
+  memories    one row per stored memory, keyed (user_id, seq); a write
+              inserts the new rows and deletes everything older than the
+              newest MEMORY_CAP in the same transaction
+  user_style  one row of counters per user
+  personality_profiles  one JSON document per user
+  archive_pending  memories the cap evicted, moved here by the same
+              transaction that trims them (archiving on)
+  memory_archive  sealed blocks of evicted memories, keyed (user_id, block_no)
+  archive_terms   the archive's term index: df + JSON postings list of
+              memory ids per (user_id, term)
+
+The database runs in WAL mode, so readers never block the writer. Each DB
+executor thread gets its own connection, and each connection keeps a cache
+of prepared statements: every query below is a constant SQL string with
+bound parameters (IN lists go through json_each), so after warm-up no
+statement is parsed again.
+"""
+
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+from app.db.documents import MEMORY_CAP, add_postings, apply_style_delta, archive_memory_id, merge_user_ids
+from app.db.storage import Storage
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS memories (
+    user_id   TEXT    NOT NULL,
+    seq       INTEGER NOT NULL,
+    text      TEXT    NOT NULL,
+    emotion   TEXT    NOT NULL,
+    timestamp TEXT    NOT NULL,
+    vector    BLOB,
+    PRIMARY KEY (user_id, seq)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS user_style (
+    user_id        TEXT    PRIMARY KEY,
+    total_messages INTEGER NOT NULL DEFAULT 0,
+    total_emojis   INTEGER NOT NULL DEFAULT 0,
+    total_length   INTEGER NOT NULL DEFAULT 0,
+    total_exclaims INTEGER NOT NULL DEFAULT 0,
+    slang_used     TEXT    NOT NULL DEFAULT '[]'
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS personality_profiles (
+    user_id TEXT PRIMARY KEY,
+    doc     TEXT NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS archive_pending (
+    user_id   TEXT    NOT NULL,
+    seq       INTEGER NOT NULL,
+    text      TEXT    NOT NULL,
+    emotion   TEXT    NOT NULL,
+    timestamp TEXT    NOT NULL,
+    PRIMARY KEY (user_id, seq)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS memory_archive (
+    user_id  TEXT    NOT NULL,
+    block_no INTEGER NOT NULL,
+    count    INTEGER NOT NULL,
+    first_ts TEXT    NOT NULL,
+    last_ts  TEXT    NOT NULL,
+    data     BLOB    NOT NULL,
+    PRIMARY KEY (user_id, block_no)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS archive_terms (
+    user_id TEXT    NOT NULL,
+    term    TEXT    NOT NULL,
+    df      INTEGER NOT NULL,
+    ids     TEXT    NOT NULL,
+    PRIMARY KEY (user_id, term)
+) WITHOUT ROWID;
+"""
+
+STYLE_FIELDS = ("total_messages", "total_emojis", "total_length", "total_exclaims")
+
+# ---------------------------
+# Statements
+# ---------------------------
+LAST_SEQ = "SELECT COALESCE(MAX(seq), 0) FROM memories WHERE user_id = ?"
+INSERT_MEMORY = "INSERT INTO memories (user_id, seq, text, emotion, timestamp, vector) VALUES (?, ?, ?, ?, ?, ?)"
+TRIM_MEMORIES = "DELETE FROM memories WHERE user_id = ? AND seq <= ?"
+COUNT_EMOTIONS = "SELECT emotion, COUNT(*) FROM memories WHERE user_id = ? GROUP BY emotion"
+SELECT_MEMORIES = "SELECT text, emotion, timestamp, vector FROM memories WHERE user_id = ? ORDER BY seq"
+ARCHIVE_SIZE = (
+    "SELECT (SELECT COUNT(*) FROM archive_pending WHERE user_id = ?1), "
+    "(SELECT COALESCE(MAX(block_no) + 1, 0) FROM memory_archive WHERE user_id = ?1)"
+)
+PENDING_COUNTS = (
+    "SELECT user_id, COUNT(*) FROM archive_pending "
+    "WHERE user_id IN (SELECT value FROM json_each(?)) GROUP BY user_id"
+)
+BLOCK_COUNTS = (
+    "SELECT user_id, MAX(block_no) + 1 FROM memory_archive "
+    "WHERE user_id IN (SELECT value FROM json_each(?)) GROUP BY user_id"
+)
+SELECT_MEMORIES_MANY = (
+    "SELECT user_id, text, emotion, timestamp, vector FROM memories "
+    "WHERE user_id IN (SELECT value FROM json_each(?)) ORDER BY user_id, seq"
+)
+SELECT_STYLE = (
+    "SELECT user_id, total_messages, total_emojis, total_length, total_exclaims, slang_used "
+    "FROM user_style WHERE user_id = ?"
+)
+SELECT_STYLES_MANY = (
+    "SELECT user_id, total_messages, total_emojis, total_length, total_exclaims, slang_used "
+    "FROM user_style WHERE user_id IN (SELECT value FROM json_each(?))"
+)
+UPSERT_STYLE = (
+    "INSERT OR REPLACE INTO user_style "
+    "(user_id, total_messages, total_emojis, total_length, total_exclaims, slang_used) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+ARCHIVE_EVICTED = (
+    "INSERT INTO archive_pending (user_id, seq, text, emotion, timestamp) "
+    "SELECT user_id, seq, text, emotion, timestamp FROM memories WHERE user_id = ? AND seq <= ?"
+)
+COUNT_PENDING = "SELECT COUNT(*) FROM archive_pending WHERE user_id = ?"
+PENDING_READY = (
+    "SELECT user_id FROM archive_pending WHERE user_id IN (SELECT value FROM json_each(?)) "
+    "GROUP BY user_id HAVING COUNT(*) >= ?"
+)
+SELECT_PENDING = "SELECT seq, text, emotion, timestamp FROM archive_pending WHERE user_id = ? ORDER BY seq LIMIT ?"
+DELETE_PENDING = "DELETE FROM archive_pending WHERE user_id = ? AND seq <= ?"
+NEXT_BLOCK = "SELECT COALESCE(MAX(block_no) + 1, 0) FROM memory_archive WHERE user_id = ?"
+INSERT_BLOCK = (
+    "INSERT INTO memory_archive (user_id, block_no, count, first_ts, last_ts, data) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+SELECT_POSTINGS = (
+    "SELECT term, df, ids FROM archive_terms "
+    "WHERE user_id = ? AND term IN (SELECT value FROM json_each(?))"
+)
+UPSERT_POSTINGS = "INSERT OR REPLACE INTO archive_terms (user_id, term, df, ids) VALUES (?, ?, ?, ?)"
+SELECT_BLOCKS = (
+    "SELECT block_no, data FROM memory_archive "
+    "WHERE user_id = ? AND block_no IN (SELECT value FROM json_each(?))"
+)
+# Export pages (keyset): ?1 = key to start from / after, ?2 = bound, ?3 = page size.
+# Each walks its primary key in order; (first page, following pages).
+USER_IDS = {
+    table: tuple(
+        f"SELECT DISTINCT user_id FROM {table} "
+        f"WHERE user_id {op} ?1 AND (?2 IS NULL OR user_id < ?2) ORDER BY user_id LIMIT ?3"
+        for op in (">=", ">")
+    )
+    for table in ("memories", "user_style", "personality_profiles")
+}
+SELECT_ARCHIVE = (
+    "SELECT block_no, count, first_ts, last_ts, data FROM memory_archive "
+    "WHERE block_no > ?1 AND user_id = ?2 ORDER BY block_no LIMIT ?3"
+)
+SELECT_PROFILES_MANY = "SELECT user_id, doc FROM personality_profiles WHERE user_id IN (SELECT value FROM json_each(?))"
+UPSERT_PROFILE = "INSERT OR REPLACE INTO personality_profiles (user_id, doc) VALUES (?, ?)"
+
+
+class SQLiteStorage(Storage):
+
+    def __init__(self, path: str, busy_timeout: float = 5.0, archive: bool = False):
+        if path == ":memory:":
+            # every thread would get its own empty database
+            raise ValueError("SQLite storage needs a file path; use the `memory` backend instead")
+        self.path = path
+        self.archive = archive
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._schema_ready = False
+
+    # ---------------------------
+    # Connections
+    # ---------------------------
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout,
+                isolation_level=None,        # explicit BEGIN / COMMIT below
+                check_same_thread=False,     # closed from the shutdown thread
+                cached_statements=64
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+            if not self._schema_ready:
+                self.ensure_schema()
+        return conn
+
+    def _write(self):
+        """Transaction that takes the write lock up front (no upgrade deadlocks)."""
+        return _Transaction(self._conn())
+
+    # ---------------------------
+    # Memory windows
+    # ---------------------------
+    def append_memories(self, user_id: str, memories: list):
+        with self._write() as conn:
+            self._append(conn, user_id, memories)
+            counts = dict(conn.execute(COUNT_EMOTIONS, (user_id,)).fetchall())
+            pending = conn.execute(COUNT_PENDING, (user_id,)).fetchone()[0] if self.archive else 0
+        return {"emotion_counts": counts, "memory_count": sum(counts.values()), "archive_pending": pending}
+
+    def append_memories_many(self, memories_by_user: dict):
+        try:
+            with self._write() as conn:
+                for user_id, memories in memories_by_user.items():
+                    self._append(conn, user_id, memories)
+        except sqlite3.Error as e:
+            # one transaction: nothing was written
+            return {u: str(e) for u in memories_by_user}
+        return {}
+
+    def _append(self, conn, user_id: str, memories: list):
+        last = conn.execute(LAST_SEQ, (user_id,)).fetchone()[0]
+        conn.executemany(INSERT_MEMORY, [
+            (user_id, last + i, m["text"], m["emotion"], m["timestamp"].isoformat(), m.get("vector"))
+            for i, m in enumerate(memories, start=1)
+        ])
+        oldest_kept = last + len(memories) - MEMORY_CAP
+        if self.archive:
+            conn.execute(ARCHIVE_EVICTED, (user_id, oldest_kept))
+        conn.execute(TRIM_MEMORIES, (user_id, oldest_kept))
+
+    def get_memories(self, user_id: str):
+        return [_memory(row) for row in self._conn().execute(SELECT_MEMORIES, (user_id,))]
+
+    def get_memories_many(self, user_ids: list):
+        found = {u: [] for u in user_ids}
+        for user_id, *row in self._conn().execute(SELECT_MEMORIES_MANY, (json.dumps(list(user_ids)),)):
+            found[user_id].append(_memory(row))
+        return found
+
+    def get_memory_window(self, user_id: str):
+        conn = self._conn()
+        memories = [_memory(row) for row in conn.execute(SELECT_MEMORIES, (user_id,))]
+        pending, blocks = conn.execute(ARCHIVE_SIZE, (user_id,)).fetchone() if self.archive else (0, 0)
+        return {"memories": memories, "archive_pending": pending, "archive_blocks": blocks}
+
+    def get_memory_windows(self, user_ids: list):
+        conn = self._conn()
+        memories = self.get_memories_many(user_ids)
+        pending = blocks = {}
+        if self.archive:
+            ids = json.dumps(list(user_ids))
+            pending = dict(conn.execute(PENDING_COUNTS, (ids,)).fetchall())
+            blocks = dict(conn.execute(BLOCK_COUNTS, (ids,)).fetchall())
+        return {
+            u: {"memories": memories[u], "archive_pending": pending.get(u, 0), "archive_blocks": blocks.get(u, 0)}
+            for u in user_ids
+        }
+
+    def get_memory_counts(self, user_id: str):
+        counts = dict(self._conn().execute(COUNT_EMOTIONS, (user_id,)).fetchall())
+        if not counts:
+            return None
+        return {"emotion_counts": counts, "memory_count": sum(counts.values())}
+
+    # ---------------------------
+    # Memory archive
+    # ---------------------------
+    def seal_archive_blocks(self, user_ids: list, block_size: int, build_block):
+        ready = [
+            row[0] for row in
+            self._conn().execute(PENDING_READY, (json.dumps(list(user_ids)), block_size))
+        ]
+        sealed = 0
+        for user_id in ready:
+            # one transaction per user: block, terms and pending trim together
+            with self._write() as conn:
+                while True:
+                    rows = conn.execute(SELECT_PENDING, (user_id, block_size)).fetchall()
+                    if len(rows) < block_size:
+                        break
+                    block_no = conn.execute(NEXT_BLOCK, (user_id,)).fetchone()[0]
+                    block = build_block([_archived(row[1:]) for row in rows])
+                    conn.execute(INSERT_BLOCK, (
+                        user_id, block_no, block["count"],
+                        block["first_ts"].isoformat(), block["last_ts"].isoformat(), block["data"]
+                    ))
+                    self._index_block(conn, user_id, block_no, block["postings"])
+                    conn.execute(DELETE_PENDING, (user_id, rows[-1][0]))
+                    sealed += 1
+        return sealed
+
+    def get_archive_pending(self, user_id: str):
+        return [
+            _archived(row[1:])
+            for row in self._conn().execute(SELECT_PENDING, (user_id, -1))
+        ]
+
+    def _index_block(self, conn, user_id: str, block_no: int, postings: dict):
+        found = _postings(conn.execute(SELECT_POSTINGS, (user_id, json.dumps(list(postings)))))
+        rows = []
+        for term, slots in postings.items():
+            entry = add_postings(found.get(term), [archive_memory_id(block_no, s) for s in slots])
+            rows.append((user_id, term, entry["df"], json.dumps(entry["ids"])))
+        conn.executemany(UPSERT_POSTINGS, rows)
+
+    def get_archive_postings(self, user_id: str, terms: list):
+        return _postings(self._conn().execute(SELECT_POSTINGS, (user_id, json.dumps(list(terms)))))
+
+    def get_archive_blocks(self, user_id: str, block_nos: list):
+        found = dict(self._conn().execute(SELECT_BLOCKS, (user_id, json.dumps(list(block_nos)))))
+        return [{"block_no": n, "data": found[n]} for n in block_nos if n in found]
+
+    # ---------------------------
+    # Style documents
+    # ---------------------------
+    def update_style(self, user_id: str, delta: dict):
+        with self._write() as conn:
+            return self._update_style(conn, user_id, delta)
+
+    def update_styles_many(self, deltas_by_user: dict):
+        try:
+            with self._write() as conn:
+                for user_id, delta in deltas_by_user.items():
+                    self._update_style(conn, user_id, delta)
+        except sqlite3.Error as e:
+            return {u: str(e) for u in deltas_by_user}
+        return {}
+
+    def _update_style(self, conn, user_id: str, delta: dict):
+        row = conn.execute(SELECT_STYLE, (user_id,)).fetchone()
+        doc = apply_style_delta(_style(row) if row else {"user_id": user_id}, delta)
+        conn.execute(UPSERT_STYLE, (
+            user_id, *(doc.get(f, 0) for f in STYLE_FIELDS), json.dumps(doc["slang_used"])
+        ))
+        return doc
+
+    def get_style_docs(self, user_ids: list):
+        conn = self._conn()
+        if len(user_ids) == 1:
+            row = conn.execute(SELECT_STYLE, (user_ids[0],)).fetchone()
+            return {user_ids[0]: _style(row) if row else None}
+
+        found = {row[0]: _style(row) for row in conn.execute(SELECT_STYLES_MANY, (json.dumps(list(user_ids)),))}
+        return {u: found.get(u) for u in user_ids}
+
+    # ---------------------------
+    # Personality profiles
+    # ---------------------------
+    def get_profile_docs(self, user_ids: list):
+        found = {
+            user_id: dict(json.loads(doc), user_id=user_id)
+            for user_id, doc in self._conn().execute(SELECT_PROFILES_MANY, (json.dumps(list(user_ids)),))
+        }
+        return {u: found.get(u) for u in user_ids}
+
+    def save_profile_docs(self, docs_by_user: dict):
+        try:
+            with self._write() as conn:
+                conn.executemany(UPSERT_PROFILE, [
+                    (user_id, json.dumps(doc)) for user_id, doc in docs_by_user.items()
+                ])
+        except sqlite3.Error as e:
+            return {u: str(e) for u in docs_by_user}
+        return {}
+
+    # ---------------------------
+    # Export
+    # ---------------------------
+    def iter_user_ids(self, start: str = None, end: str = None, batch_size: int = 1000):
+        pages = [
+            (row[0] for row in self._pages(first, following, start or "", end, batch_size))
+            for first, following in USER_IDS.values()
+        ]
+        return merge_user_ids(*pages)
+
+    def iter_archive_blocks(self, user_id: str, batch_size: int = 100):
+        for block_no, count, first_ts, last_ts, data in self._pages(
+                SELECT_ARCHIVE, SELECT_ARCHIVE, -1, user_id, batch_size):
+            yield {
+                "block_no": block_no, "count": count, "data": data,
+                "first_ts": datetime.fromisoformat(first_ts), "last_ts": datetime.fromisoformat(last_ts)
+            }
+
+    def _pages(self, first: str, following: str, key, param, batch_size: int):
+        """
+        Rows of a keyset query, one page of `batch_size` per statement,
+        each read to the end on the calling thread's connection: an export
+        may be resumed from any thread (StreamingResponse), and no read
+        transaction stays open between pages.
+        """
+        query = first
+        while True:
+            rows = self._conn().execute(query, (key, param, batch_size)).fetchall()
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            query, key = following, rows[-1][0]
+
+    # ---------------------------
+    # Lifecycle
+    # ---------------------------
+    def ensure_schema(self):
+        self._schema_ready = True
+        self._conn().executescript(SCHEMA)
+
+    def ping(self):
+        self._conn().execute("SELECT 1").fetchone()
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+class _Transaction:
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def _memory(row):
+    text, emotion, timestamp, vector = row
+    return {"text": text, "emotion": emotion, "timestamp": datetime.fromisoformat(timestamp), "vector": vector}
+
+
+def _archived(row):
+    text, emotion, timestamp = row
+    return {"text": text, "emotion": emotion, "timestamp": datetime.fromisoformat(timestamp)}
+
+
+def _postings(rows):
+    return {term: {"df": df, "ids": json.loads(ids)} for term, df, ids in rows}
+
+
+def _style(row):
+    return {
+        "user_id": row[0],
+        **dict(zip(STYLE_FIELDS, row[1:5])),
+        "slang_used": json.loads(row[5])
+    }
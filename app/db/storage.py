@@ -0,0 +1,178 @@
+# app/db/storage.py
+"""
+Storage interface behind MemoryService and StyleService.
+
+Backends (AI_BUDDY_STORAGE):
+  mongo   – MongoDB, the default (mongo_store.py)
+  memory  – process-local dicts behind a lock; nothing survives a restart,
+            meant for tests, load tests and single-process demos
+  sqlite  – embedded SQLite file in WAL mode (sqlite_store.py); no network
+            round trips, suits small single-node deployments
+
+Every backend keeps the same guarantees: one atomic write per call for a
+single user, memory windows capped at MEMORY_CAP with their aggregates kept
+in step, and `{ user_id: error message }` results for batched writes.
+
+With archiving on (AI_BUDDY_ARCHIVE), memories the cap evicts are parked
+as the user's pending archive and later sealed into compressed blocks with
+a term index (see app/services/memory_archive.py for the block format).
+"""
+
+import threading
+
+from app.config import settings
+
+
+class Storage:
+
+    # ---------------------------
+    # Memory windows
+    # ---------------------------
+    def append_memories(self, user_id: str, memories: list):
+        """
+        Append + trim + update aggregates atomically.
+        Returns the window's new { emotion_counts, memory_count, archive_pending }
+        (archive_pending: how many evicted memories wait to be sealed).
+        """
+        raise NotImplementedError
+
+    def append_memories_many(self, memories_by_user: dict):
+        """{ user_id: [memory, ...] } → { user_id: error message } for failed users."""
+        raise NotImplementedError
+
+    def get_memories(self, user_id: str):
+        """The user's memories, oldest first."""
+        return self.get_memories_many([user_id])[user_id]
+
+    def get_memories_many(self, user_ids: list):
+        """{ user_id: memories } for several users."""
+        raise NotImplementedError
+
+    def get_memory_window(self, user_id: str):
+        """
+        { memories, archive_pending, archive_blocks } in one read: the
+        user's memories, oldest first, and how much of their history the
+        archive holds (evicted memories not sealed yet, sealed blocks).
+        """
+        return self.get_memory_windows([user_id])[user_id]
+
+    def get_memory_windows(self, user_ids: list):
+        """{ user_id: { memories, archive_pending, archive_blocks } } for several users."""
+        raise NotImplementedError
+
+    def get_memory_counts(self, user_id: str):
+        """{ emotion_counts, memory_count } or None when the user has no window."""
+        raise NotImplementedError
+
+    # ---------------------------
+    # Memory archive
+    # ---------------------------
+    def seal_archive_blocks(self, user_ids: list, block_size: int, build_block):
+        """
+        For each user with at least `block_size` pending memories, move the
+        oldest `block_size` of them into a new archive block (repeatedly)
+        and add them to the user's term index.
+        build_block(memories) → { count, first_ts, last_ts, data, postings }
+        with postings = { term: [slot, ...] }; the backend adds user_id and
+        the next block_no. Returns how many blocks were written.
+        """
+        raise NotImplementedError
+
+    def get_archive_pending(self, user_id: str):
+        """Evicted memories not sealed into a block yet, oldest first."""
+        raise NotImplementedError
+
+    def get_archive_postings(self, user_id: str, terms: list):
+        """
+        { term: { df, ids } } for the given terms found in the user's index;
+        ids are archive memory ids (empty once a term is too common).
+        """
+        raise NotImplementedError
+
+    def get_archive_blocks(self, user_id: str, block_nos: list):
+        """[{ block_no, data }, ...] for the given blocks."""
+        raise NotImplementedError
+
+    # ---------------------------
+    # Style documents
+    # ---------------------------
+    def update_style(self, user_id: str, delta: dict):
+        """Apply a style delta atomically; returns the updated raw document."""
+        raise NotImplementedError
+
+    def update_styles_many(self, deltas_by_user: dict):
+        """{ user_id: delta } → { user_id: error message } for failed users."""
+        raise NotImplementedError
+
+    def get_style_docs(self, user_ids: list):
+        """{ user_id: raw style document or None }."""
+        raise NotImplementedError
+
+    # ---------------------------
+    # Personality profiles
+    # ---------------------------
+    def get_profile_docs(self, user_ids: list):
+        """{ user_id: stored profile document or None }."""
+        raise NotImplementedError
+
+    def save_profile_docs(self, docs_by_user: dict):
+        """Replace whole profile documents; { user_id: error message } for failed users."""
+        raise NotImplementedError
+
+    # ---------------------------
+    # Export (streamed: memory use doesn't grow with the data)
+    # ---------------------------
+    def iter_user_ids(self, start: str = None, end: str = None, batch_size: int = 1000):
+        """
+        Every user_id with a memory window, style or profile document, in
+        [start, end) (None = unbounded), sorted and distinct; read through
+        server-side cursors `batch_size` ids at a time.
+        """
+        raise NotImplementedError
+
+    def iter_archive_blocks(self, user_id: str, batch_size: int = 100):
+        """The user's archive blocks { block_no, count, first_ts, last_ts, data }, oldest first."""
+        raise NotImplementedError
+
+    # ---------------------------
+    # Lifecycle
+    # ---------------------------
+    def ensure_schema(self):
+        """Create indexes / tables (idempotent); run from the startup hook."""
+
+    def ping(self):
+        """Raises if the backend is unreachable."""
+
+    def close(self):
+        pass
+
+
+def create_storage(backend: str = None):
+    backend = backend or settings.storage_backend
+
+    if backend == "mongo":
+        from app.db.mongo_store import MongoStorage
+        return MongoStorage(archive=settings.archive_enabled)
+    if backend == "memory":
+        from app.db.memory_store import InMemoryStorage
+        return InMemoryStorage(archive=settings.archive_enabled)
+    if backend == "sqlite":
+        from app.db.sqlite_store import SQLiteStorage
+        return SQLiteStorage(settings.sqlite_path, archive=settings.archive_enabled)
+
+    raise ValueError(f"unknown storage backend: {backend!r} (expected mongo, memory or sqlite)")
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """The process-wide storage backend, created on first use."""
+    global _storage
+
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = create_storage()
+    return _storage
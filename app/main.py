@@ -1,23 +1,100 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 # Routers
 from app.routers.user import router as user_router
 from app.routers.emotion_router import router as emotion_router
 from app.routers.chat_router import router as chat_router
+from app.routers.export_router import router as export_router
+from app.db.executor import run_in_db_executor
+from app.db.storage import get_storage
+from app import metrics
+from app.config import settings
+from app.services.personality_engine import profile_store
+from app.services.style_service import style_service
+
+logger = logging.getLogger("ai_buddy")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: indexes / tables are created here instead of at import time;
+    # an unreachable database is reported by /health rather than blocking boot
+    storage = get_storage()
+    try:
+        await run_in_db_executor(storage.ensure_schema)
+    except Exception as exc:
+        logger.warning("ensure_schema failed, continuing without it: %s", exc)
+
+    # Personality slider columns come back memory-mapped, not rebuilt
+    if settings.profile_snapshot:
+        rows = profile_store.open_snapshot(settings.profile_snapshot)
+        logger.info("profile snapshot %s: %d users", settings.profile_snapshot, rows)
+    decay = asyncio.create_task(decay_profiles()) if settings.profile_decay_rate > 0 else None
+
+    yield
+
+    # Shutdown: write out any buffered (write-behind) style updates and
+    # dirty personality profiles (+ the slider snapshot)
+    if decay is not None:
+        decay.cancel()
+    style_service.close()
+    profile_store.close()
+    storage.close()
+
+
+async def decay_profiles():
+    """Periodic (nightly by default) drift of idle users' sliders toward the defaults."""
+    while True:
+        await asyncio.sleep(settings.profile_decay_interval)
+        try:
+            decayed = await asyncio.to_thread(
+                profile_store.decay, settings.profile_decay_rate, settings.profile_decay_idle)
+            await asyncio.to_thread(profile_store.save_snapshot)
+            logger.info("decayed the sliders of %d idle users", decayed)
+        except Exception as exc:
+            logger.warning("profile decay failed: %s", exc)
+
 
 app = FastAPI(
     title="AI Buddy Backend",
     version="1.0.0",
-    description="Backend for emotional companion AI with memory + personality engine"
+    description="Backend for emotional companion AI with memory + personality engine",
+    lifespan=lifespan
 )
 
 
+if metrics.ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+
 @app.get("/")
 def read_root():
     return {"message": "Hello from ai-buddy backend!"}
 
 
+@app.get("/health")
+async def health():
+    try:
+        await run_in_db_executor(get_storage().ping)
+    except Exception as exc:
+        return JSONResponse(status_code=503, content={"status": "degraded", "storage": str(exc)})
+    return {"status": "ok", "storage": "ok"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    if not metrics.ENABLED:
+        return PlainTextResponse("metrics disabled (AI_BUDDY_METRICS=0)\n", status_code=404)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 # Register Routers
 app.include_router(user_router)
 app.include_router(emotion_router)
 app.include_router(chat_router)
+app.include_router(export_router)
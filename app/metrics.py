@@ -0,0 +1,295 @@
+# app/metrics.py
+"""
+Built-in latency / rate instrumentation, exposed in Prometheus text format
+by GET /metrics.
+
+  ai_buddy_stage_duration_seconds{stage}            pipeline stage latency
+  ai_buddy_mongo_command_duration_seconds{command}  one per Mongo command
+  ai_buddy_mongo_command_failures_total{command}
+  ai_buddy_mongo_roundtrips_per_request{endpoint}   commands issued per request
+  ai_buddy_http_requests_total{endpoint,method,status}
+  ai_buddy_http_request_duration_seconds{endpoint}
+  ai_buddy_cache_{hits,misses,evictions}_total{cache}, ai_buddy_cache_{size,hit_ratio}{cache}
+                                                    emotion / style / summary caches, profile store
+  ai_buddy_write_buffer_*{buffer}                   style write-behind buffer (style_buffer.py)
+  ai_buddy_admission_*{limiter}                     load shedding (app/admission.py)
+
+AI_BUDDY_METRICS=0 turns it all off: stage() hands back one shared no-op
+context manager, timed() returns the awaitable untouched, no Mongo listener
+is registered and the HTTP middleware is not installed.
+"""
+
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+from pymongo import monitoring
+
+from app.config import settings
+
+ENABLED = settings.metrics_enabled
+
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)
+ROUNDTRIP_BUCKETS = (0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 50)
+
+_NOOP = nullcontext()
+
+
+class Histogram:
+
+    def __init__(self, name: str, help: str, label: str, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = buckets
+        self._series = {}           # label value → [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, value: float):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[i] += 1          # i == len(buckets) is the +Inf bucket
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        for label_value, series in sorted(snapshot.items()):
+            label = f'{self.label}="{_escape(label_value)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {series[-2]}")
+            lines.append(f"{self.name}_count{{{label}}} {series[-1]}")
+        return lines
+
+
+class Counter:
+
+    def __init__(self, name: str, help: str, labels: tuple):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}           # label values tuple → count
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: int = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = dict(self._values)
+        for label_values, count in sorted(snapshot.items()):
+            labels = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values))
+            lines.append(f"{self.name}{{{labels}}} {count}")
+        return lines
+
+
+class Gauge:
+    """Current values read at render time: register(label value, callable)."""
+
+    def __init__(self, name: str, help: str, label: str):
+        self.name = name
+        self.help = help
+        self.label = label
+        self._sources = {}          # label value → callable
+
+    def register(self, label_value: str, value):
+        self._sources[label_value] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for label_value, value in sorted(self._sources.items()):
+            lines.append(f'{self.name}{{{self.label}="{_escape(label_value)}"}} {value()}')
+        return lines
+
+
+class StatsCollector:
+    """
+    Reports registered sources' stats() dicts on /metrics, labelled by
+    source name: one series per (field, kind, help) in `fields`.
+    """
+
+    def __init__(self, prefix: str, label: str, fields: tuple):
+        self.prefix = prefix
+        self.label = label
+        self.fields = fields
+        self._sources = {}          # source name → stats callable
+
+    def register(self, source: str, stats):
+        self._sources[source] = stats
+
+    def render(self):
+        snapshot = {source: stats() for source, stats in sorted(self._sources.items())}
+        lines = []
+        for field, kind, help in self.fields:
+            name = f"{self.prefix}_{field}_total" if kind == "counter" else f"{self.prefix}_{field}"
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            for source, stats in snapshot.items():
+                lines.append(f'{name}{{{self.label}="{_escape(source)}"}} {stats[field]}')
+        return lines
+
+
+class CacheStats(StatsCollector):
+    """
+    Reports registered caches' stats() on /metrics, labelled by cache name:
+    hits / misses / evictions as counters, size and hit ratio as gauges.
+    """
+
+    FIELDS = (
+        ("hits", "counter", "Cache lookups served from the cache."),
+        ("misses", "counter", "Cache lookups that missed."),
+        ("evictions", "counter", "Entries evicted to stay within the size bound."),
+        ("size", "gauge", "Entries currently cached."),
+        ("hit_ratio", "gauge", "hits / (hits + misses) since start."),
+    )
+
+    def __init__(self, prefix: str):
+        super().__init__(prefix, "cache", self.FIELDS)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# ---------------------------
+# Registry
+# ---------------------------
+stage_seconds = Histogram(
+    "ai_buddy_stage_duration_seconds", "Latency of one chat pipeline stage.", "stage")
+mongo_command_seconds = Histogram(
+    "ai_buddy_mongo_command_duration_seconds", "Latency of one MongoDB command.", "command")
+mongo_command_failures = Counter(
+    "ai_buddy_mongo_command_failures_total", "MongoDB commands that failed.", ("command",))
+mongo_roundtrips = Histogram(
+    "ai_buddy_mongo_roundtrips_per_request", "MongoDB commands issued while serving one request.",
+    "endpoint", ROUNDTRIP_BUCKETS)
+http_requests = Counter(
+    "ai_buddy_http_requests_total", "HTTP requests served.", ("endpoint", "method", "status"))
+http_request_seconds = Histogram(
+    "ai_buddy_http_request_duration_seconds", "HTTP request latency.", "endpoint")
+
+cache_stats = CacheStats("ai_buddy_cache")
+
+REGISTRY = [
+    stage_seconds, mongo_command_seconds, mongo_command_failures,
+    mongo_roundtrips, http_requests, http_request_seconds, cache_stats,
+]
+
+# Mongo commands seen by the current request; a one-element list so threads
+# running with a copy of the request's context add to the same counter
+_roundtrips = contextvars.ContextVar("ai_buddy_roundtrips", default=None)
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------
+# Hooks
+# ---------------------------
+class _StageTimer:
+
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, exc_type, exc, tb):
+        stage_seconds.observe(self.stage, time.perf_counter() - self.started)
+        return False
+
+
+def stage(name: str):
+    """`with stage("emotion"):` records the block's latency under that stage."""
+    return _StageTimer(name) if ENABLED else _NOOP
+
+
+def timed(name: str, awaitable):
+    """Awaitable that records its latency as stage `name` (for asyncio.gather)."""
+    if not ENABLED:
+        return awaitable
+    return _timed(name, awaitable)
+
+
+async def _timed(name: str, awaitable):
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        stage_seconds.observe(name, time.perf_counter() - started)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times every command the shared client sends and counts it against the request."""
+
+    def started(self, event):
+        counter = _roundtrips.get()
+        if counter is not None:
+            counter[0] += 1
+
+    def succeeded(self, event):
+        mongo_command_seconds.observe(event.command_name, event.duration_micros / 1e6)
+
+    def failed(self, event):
+        mongo_command_seconds.observe(event.command_name, event.duration_micros / 1e6)
+        mongo_command_failures.inc(event.command_name)
+
+
+def mongo_event_listeners():
+    return [MongoCommandListener()] if ENABLED else []
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: request rate, latency and Mongo round trips per endpoint."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        counter = [0]
+        token = _roundtrips.set(counter)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _roundtrips.reset(token)
+            # route template, not the raw path, to keep label cardinality bounded
+            route = scope.get("route")
+            endpoint = getattr(route, "path", "unmatched")
+            http_requests.inc(endpoint, scope["method"], str(status[0]))
+            http_request_seconds.observe(endpoint, elapsed)
+            mongo_roundtrips.observe(endpoint, counter[0])
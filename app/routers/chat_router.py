@@ -1,20 +1,96 @@
-from fastapi import APIRouter
+import json
+from typing import List
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from app.services.chat_service import generate_reply
+from app.admission import Overloaded, chat_admission
+from app.config import settings
+from app.db.executor import run_in_db_executor
+from app.services.chat_service import degraded_reply, generate_reply_async, generate_replies
+from app.services.chat_session import ChatSession
+from app.services.user_locks import chat_locks
 
 router = APIRouter(
     prefix="/chat",
     tags=["Chat"]
 )
 
+MAX_BATCH_SIZE = 500
+
 class ChatRequest(BaseModel):
     user_id: str
     message: str
 
+class ChatBatchRequest(BaseModel):
+    messages: List[ChatRequest]
+
 @router.post("/reply")
 async def chat_reply(payload: ChatRequest):
-    response = generate_reply(
-        user_id=payload.user_id,
-        message=payload.message
-    )
+    try:
+        async with chat_admission.admit():
+            response = await generate_reply_async(
+                user_id=payload.user_id,
+                message=payload.message
+            )
+    except Overloaded:
+        if not settings.chat_degraded:
+            raise
+        # shed, but still answered: no database involved
+        chat_admission.record_degraded()
+        return JSONResponse(degraded_reply(payload.message), headers={"X-AI-Buddy-Degraded": "1"})
     return response
+
+@router.post("/reply/batch")
+async def chat_reply_batch(payload: ChatBatchRequest):
+    if len(payload.messages) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_SIZE} messages per batch")
+
+    # the batch's users are held for its duration so their single turns
+    # don't interleave with it
+    async with chat_admission.admit(), chat_locks.hold_many(m.user_id for m in payload.messages):
+        results = await run_in_db_executor(
+            generate_replies,
+            [(m.user_id, m.message) for m in payload.messages]
+        )
+    return {"results": results}
+
+@router.websocket("/ws")
+async def chat_ws(websocket: WebSocket, user_id: str):
+    """
+    One conversation per connection: send {"message": "..."}, receive
+    {"reply": "..."}. The user's state is loaded once on connect and
+    written back in the background (see chat_session.py).
+    """
+    await websocket.accept()
+    try:
+        # only opening a session reads storage; its replies are served
+        # from the connection's state
+        async with chat_admission.admit(), chat_locks.hold(user_id):
+            session = await ChatSession.open(user_id)
+    except Overloaded as shed:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason=shed.detail)
+        return
+    except Exception:
+        await websocket.close(code=status.WS_1011_INTERNAL_ERROR, reason="could not load user state")
+        return
+
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())["message"]
+            except (ValueError, KeyError, TypeError):
+                await websocket.send_json({"error": 'expected {"message": "..."}'})
+                continue
+            if not isinstance(message, str):
+                await websocket.send_json({"error": "message must be a string"})
+                continue
+
+            # ordered against this user's HTTP turns and other sockets
+            async with chat_locks.hold(user_id):
+                reply = await session.reply(message)
+            await websocket.send_json({"reply": reply})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await session.close()
@@ -1,13 +1,34 @@
-from fastapi import APIRouter
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from app.services.emotion_service import analyze_emotion
+from app.admission import emotion_admission
+from app.services.emotion_service import analyze_emotion, analyze_emotion_batch
+
+router = APIRouter(
+    prefix="/emotion",
+    tags=["Emotion Analysis"],
+    dependencies=[Depends(emotion_admission.dependency)]
+)
 
-router = APIRouter(prefix="/emotion", tags=["Emotion Analysis"])
+MAX_BATCH_SIZE = 1000
 
 class EmotionRequest(BaseModel):
     text: str
+    user_id: Optional[str] = None   # enables per-user emotion history
+
+class EmotionBatchRequest(BaseModel):
+    texts: List[str]
+    user_id: Optional[str] = None
 
 @router.post("/analyze")
 def analyze_emotion_route(payload: EmotionRequest):
-    result = analyze_emotion(payload.text)
+    result = analyze_emotion(payload.text, payload.user_id)
     return result
+
+@router.post("/analyze/batch")
+def analyze_emotion_batch_route(payload: EmotionBatchRequest):
+    if len(payload.texts) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_SIZE} texts per batch")
+
+    return {"results": analyze_emotion_batch(payload.texts, payload.user_id)}
@@ -0,0 +1,42 @@
+from typing import Optional
+
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+from app.services.export_service import DEFAULT_BATCH_SIZE, export_user, export_users, ndjson
+from app.services.personality_engine import profile_store
+from app.services.style_service import style_service
+
+router = APIRouter(prefix="/export", tags=["Export"])
+
+MAX_BATCH_SIZE = 5000
+
+NDJSON = "application/x-ndjson"
+
+
+def _flush_pending_writes():
+    # this worker's buffered style deltas and dirty profiles go out first,
+    # so the export includes them
+    style_service.flush()
+    profile_store.flush()
+
+
+@router.get("/users/{user_id}")
+def export_one_user(user_id: str, batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=MAX_BATCH_SIZE)):
+    """One user's memories, style, personality and emotion history as NDJSON."""
+    _flush_pending_writes()
+    return StreamingResponse(ndjson(export_user(user_id, batch_size)), media_type=NDJSON)
+
+
+@router.get("/users")
+def export_user_range(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=MAX_BATCH_SIZE)
+):
+    """
+    Every user with start <= user_id < end (either may be omitted), as
+    NDJSON ordered by user_id; split a full export into ranges to run
+    them in parallel (see app/scripts/export.py).
+    """
+    _flush_pending_writes()
+    return StreamingResponse(ndjson(export_users(start, end, batch_size)), media_type=NDJSON)
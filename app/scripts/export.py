@@ -0,0 +1,112 @@
+# app/scripts/export.py
+"""
+Export users' memories, style, personality profile and emotion history as
+NDJSON (record format: app/services/export_service.py).
+
+    python -m app.scripts.export --user USER_ID [--out user.ndjson]
+    python -m app.scripts.export --all --out-dir export/ [--workers 4] [--batch-size 500]
+
+--user writes one user to --out (default: stdout).
+--all splits the tenant into user_id ranges of about equal size and
+exports them in parallel, one worker process and one file per range
+(export/part-00000.ndjson, ... in user_id order; concatenated they are the
+full export). Every worker streams through server-side cursors, so memory
+use stays flat however many users or memories there are.
+
+With the default in-process emotion history there is nothing to export
+from here; AI_BUDDY_EMOTION_HISTORY=mongo histories are included.
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+from app.db.storage import get_storage
+from app.services.export_service import (
+    DEFAULT_BATCH_SIZE, export_user, export_users, ndjson, ndjson_line, user_id_ranges,
+)
+
+
+def export_range(task):
+    """
+    Write one [start, end) range to `path`; returns (path, users, records).
+    Runs in a worker process, which opens its own storage client on first use.
+    """
+    path, start, end, batch_size = task
+    users = records = 0
+    previous = None
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        for record in export_users(start, end, batch_size):
+            f.write(ndjson_line(record))
+            records += 1
+            if record["user_id"] != previous:
+                users += 1
+                previous = record["user_id"]
+    # a part file only appears once its range is complete
+    os.replace(tmp, path)
+    return path, users, records
+
+
+def export_all(out_dir: str, workers: int, batch_size: int, parts: int = None):
+    os.makedirs(out_dir, exist_ok=True)
+    ranges = user_id_ranges(parts or max(1, workers) * 4, batch_size)
+    tasks = [
+        (os.path.join(out_dir, f"part-{i:05d}.ndjson"), start, end, batch_size)
+        for i, (start, end) in enumerate(ranges)
+    ]
+    print(f"{len(tasks)} user_id ranges, {max(1, workers)} workers", file=sys.stderr)
+
+    started = time.monotonic()
+    users = records = 0
+    if workers <= 1:
+        results = map(export_range, tasks)
+    else:
+        pool = multiprocessing.get_context("spawn").Pool(workers)
+        results = pool.imap_unordered(export_range, tasks)
+    try:
+        for path, range_users, range_records in results:
+            users += range_users
+            records += range_records
+            print(f"{path}: {range_users:,} users, {range_records:,} records", file=sys.stderr)
+    finally:
+        if workers > 1:
+            pool.close()
+            pool.join()
+        get_storage().close()
+
+    elapsed = max(time.monotonic() - started, 1e-9)
+    print(f"done: {users:,} users, {records:,} records in {elapsed:.1f} s "
+          f"({records / elapsed:,.0f} records/s)", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export users' stored data as NDJSON.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--user", help="export this user_id")
+    target.add_argument("--all", action="store_true", help="export every user, in parallel by user_id range")
+    parser.add_argument("--out", help="output file for --user (default: stdout)")
+    parser.add_argument("--out-dir", default="export", help="directory for --all part files")
+    parser.add_argument("--workers", type=int, default=4, help="worker processes for --all")
+    parser.add_argument("--parts", type=int, help="user_id ranges for --all (default: 4 per worker)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="users per batched lookup / documents per cursor batch")
+    args = parser.parse_args()
+
+    if args.all:
+        export_all(args.out_dir, args.workers, args.batch_size, args.parts)
+        return
+
+    out = open(args.out, "wb") if args.out else sys.stdout.buffer
+    try:
+        out.writelines(ndjson(export_user(args.user, args.batch_size)))
+    finally:
+        if args.out:
+            out.close()
+        get_storage().close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# app/scripts/migrate_memories.py
+"""
+Migrate the legacy one-document-per-memory `memories` collection into the
+capped per-user `memory_windows` documents used by MemoryService.
+
+    python -m app.scripts.migrate_memories [--batch-size 500] [--drop-legacy]
+
+- Keeps the newest MEMORY_CAP memories per user in the window. With
+  archiving on (AI_BUDDY_ARCHIVE=1) the older ones go to the archive, the
+  way evicted memories do; otherwise they are dropped.
+- Streams: each user's legacy memories are read from a sorted cursor and
+  sealed into archive blocks archive_block_size at a time (one block
+  staged in archive_pending at once), so a user's whole history is never
+  held in memory or in one document.
+- Safe to run while the app is serving traffic: legacy memories are placed
+  in front of anything already written to the new window (and in front of
+  its pending archive memories), then trimmed. Blocks sealed since deploy
+  keep their lower block numbers, so only in that case are archive blocks
+  not in timestamp order.
+- Idempotent: users already migrated are skipped, and a user interrupted
+  halfway resumes after the legacy memories already archived.
+- Recounts the memory aggregates of every window afterwards.
+- MongoDB only (AI_BUDDY_STORAGE=mongo).
+"""
+
+import argparse
+from collections import deque
+from itertools import groupby, islice
+from operator import itemgetter
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.config import settings
+from app.db.documents import MEMORY_CAP
+from app.db.mongo import ensure_indexes, get_collection
+from app.db.mongo_store import MongoStorage
+from app.scripts.rebuild_emotion_counts import rebuild
+from app.services.memory_archive import build_block
+
+DUPLICATE_KEY = 11000
+
+
+def _legacy_memories(legacy):
+    """Yield (user_id, memories oldest → newest, lazily) from the legacy collection."""
+    cursor = legacy.find({}, {"_id": 0, "user_id": 1, "text": 1, "emotion": 1, "timestamp": 1})
+    cursor = cursor.sort([("user_id", ASCENDING), ("timestamp", ASCENDING)])
+    for user_id, docs in groupby(cursor, key=itemgetter("user_id")):
+        yield user_id, (
+            {"text": d["text"], "emotion": d["emotion"], "timestamp": d["timestamp"]}
+            for d in docs
+        )
+
+
+def _archive_legacy(windows, storage, user_id: str, block: list):
+    """
+    Stage one block of legacy memories in front of archive_pending and seal
+    it. legacy_archived counts them in the same update, so an interrupted
+    run resumes after them.
+    """
+    windows.update_one({"user_id": user_id}, [
+        {"$set": {
+            "archive_pending": {"$concatArrays": [{"$literal": block}, {"$ifNull": ["$archive_pending", []]}]},
+            "archive_blocks": {"$ifNull": ["$archive_blocks", 0]},
+            "legacy_archived": {"$add": [{"$ifNull": ["$legacy_archived", 0]}, len(block)]}
+        }},
+        {"$set": {"pending_count": {"$size": "$archive_pending"}}}
+    ], upsert=True)
+    return storage.seal_archive_blocks([user_id], len(block), build_block)
+
+
+def _prepend_legacy(memories: list, archive: bool, older: list = ()):
+    """
+    Update pipeline that puts legacy memories in front of the window and
+    trims it to MEMORY_CAP. With `archive`, `older` (legacy memories left
+    over from the last full block) and what the cap pushes out go to the
+    front of archive_pending (they are older than anything evicted since
+    deploy) and pending_count / archive_blocks are kept in step.
+    memory_count / emotion_counts are recounted after the migration.
+    """
+    overflow = {"$subtract": [{"$size": "$_combined"}, MEMORY_CAP]}
+    trim = {"memories": {"$slice": ["$_combined", -MEMORY_CAP]}, "legacy_migrated": True}
+
+    if archive:
+        trim["archive_pending"] = {"$concatArrays": [
+            {"$literal": list(older)},
+            {"$cond": [
+                {"$gt": [overflow, 0]},
+                {"$slice": ["$_combined", overflow]},
+                []
+            ]},
+            {"$ifNull": ["$archive_pending", []]}
+        ]}
+        trim["archive_blocks"] = {"$ifNull": ["$archive_blocks", 0]}
+
+    pipeline = [
+        {"$set": {
+            "_combined": {"$concatArrays": [{"$literal": memories}, {"$ifNull": ["$memories", []]}]}
+        }},
+        {"$set": trim}
+    ]
+    if archive:
+        pipeline.append({"$set": {"pending_count": {"$size": "$archive_pending"}}})
+    pipeline.append({"$project": {"_combined": 0}})
+    return pipeline
+
+
+def _flush(collection, ops):
+    """Write one batch; users that were already migrated are not an error."""
+    if not ops:
+        return 0
+    try:
+        result = collection.bulk_write(ops, ordered=False)
+        return result.upserted_count + result.modified_count
+    except BulkWriteError as e:
+        # Already-migrated users miss the filter and collide on the unique
+        # user_id index when upserting — that is the "skip" case.
+        fatal = [err for err in e.details["writeErrors"] if err["code"] != DUPLICATE_KEY]
+        if fatal:
+            raise
+        return e.details["nUpserted"] + e.details["nModified"]
+
+
+def migrate(batch_size: int = 500, drop_legacy: bool = False, archive: bool = None):
+    archive = settings.archive_enabled if archive is None else archive
+    block_size = settings.archive_block_size
+
+    # the unique user_id index is what makes re-runs skip migrated users
+    ensure_indexes()
+    windows = get_collection("memory_windows")
+    legacy = get_collection("memories")
+    legacy.create_index([("user_id", ASCENDING), ("timestamp", ASCENDING)])
+    storage = MongoStorage(archive=archive)
+
+    ops = {}
+    migrated = sealed = 0
+
+    def flush():
+        nonlocal migrated, sealed
+        migrated += _flush(windows, list(ops.values()))
+        if archive:
+            # what the window pushed out joins the leftovers; full blocks
+            # are sealed now, like evicted ones are on the next write
+            sealed += storage.seal_archive_blocks(list(ops), block_size, build_block)
+        ops.clear()
+
+    for user_id, memories in _legacy_memories(legacy):
+        state = windows.find_one({"user_id": user_id}, {"legacy_migrated": 1, "legacy_archived": 1}) or {}
+        if state.get("legacy_migrated"):
+            continue
+
+        # the newest MEMORY_CAP stay for the window; older ones are
+        # archived a block at a time (skipping those an earlier run did)
+        recent = deque(maxlen=None if archive else MEMORY_CAP)
+        older = []
+        for memory in islice(memories, state.get("legacy_archived", 0), None):
+            recent.append(memory)
+            if archive and len(recent) > MEMORY_CAP:
+                older.append(recent.popleft())
+                if len(older) == block_size:
+                    sealed += _archive_legacy(windows, storage, user_id, older)
+                    older = []
+
+        # Legacy history is older than anything written since deploy
+        ops[user_id] = UpdateOne(
+            {"user_id": user_id, "legacy_migrated": {"$ne": True}},
+            _prepend_legacy(list(recent), archive, older),
+            upsert=True
+        )
+
+        if len(ops) >= batch_size:
+            flush()
+            print(f"migrated {migrated} users, {sealed} archive blocks...")
+
+    flush()
+    print(f"done: {migrated} users migrated, {sealed} archive blocks sealed")
+
+    # legacy memories were prepended outside push_memories → recount
+    rebuild()
+
+    if drop_legacy:
+        legacy.drop()
+        print("legacy `memories` collection dropped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate legacy memories into capped per-user windows.")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--drop-legacy", action="store_true", help="drop the legacy collection afterwards")
+    args = parser.parse_args()
+    migrate(batch_size=args.batch_size, drop_legacy=args.drop_legacy)
+
+
+if __name__ == "__main__":
+    main()
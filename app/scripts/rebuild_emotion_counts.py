@@ -0,0 +1,53 @@
+# app/scripts/rebuild_emotion_counts.py
+"""
+Recompute the per-user memory aggregates (memory_count, emotion_counts)
+from the stored memories themselves.
+
+    python -m app.scripts.rebuild_emotion_counts [--user USER_ID]
+
+Every memory write keeps the aggregates in step, so this is only needed to
+backfill documents written before they existed, after a migration, or to
+repair counters touched by hand. Runs server-side as a single update.
+MongoDB only: the embedded backends derive their counts on every write.
+"""
+
+import argparse
+
+from app.db.mongo import get_collection
+
+# memory_count / emotion_counts recomputed from the `memories` array
+RECOUNT_PIPELINE = [
+    {"$set": {
+        "memory_count": {"$size": {"$ifNull": ["$memories", []]}},
+        "emotion_counts": {"$arrayToObject": {"$map": {
+            "input": {"$setUnion": [{"$ifNull": ["$memories.emotion", []]}, []]},
+            "as": "e",
+            "in": {
+                "k": "$$e",
+                "v": {"$size": {"$filter": {
+                    "input": {"$ifNull": ["$memories", []]},
+                    "cond": {"$eq": ["$$this.emotion", "$$e"]}
+                }}}
+            }
+        }}}
+    }}
+]
+
+
+def rebuild(user_id: str = None):
+    query = {"user_id": user_id} if user_id else {}
+    result = get_collection("memory_windows").update_many(query, RECOUNT_PIPELINE)
+    return result.modified_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute memory aggregates from stored memories.")
+    parser.add_argument("--user", help="only rebuild this user_id")
+    args = parser.parse_args()
+
+    modified = rebuild(args.user)
+    print(f"done: {modified} users recounted")
+
+
+if __name__ == "__main__":
+    main()
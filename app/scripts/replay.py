@@ -0,0 +1,462 @@
+# app/scripts/replay.py
+"""
+Rebuild memories, style and personality state from a JSONL chat log,
+without going through /chat/reply.
+
+    python -m app.scripts.replay conversations.jsonl [--workers 4]
+        [--batch-size 2000] [--checkpoint conversations.jsonl.ckpt] [--fresh]
+
+One JSON object per line, in conversation order:
+    {"user_id": "u1", "message": "im so tired", "timestamp": "2024-05-01T10:00:00Z"}
+("text" is accepted for "message"; timestamp is optional.)
+
+- Streams the file: at most a few batches are held in memory at a time,
+  whatever the file size.
+- Users are hashed into PARTITIONS partitions and each partition belongs
+  to one worker process, so a user's messages are always applied by the
+  same worker, in file order.
+- Each worker runs the same extractors as a live turn (classify_emotion,
+  StyleService.analyze_style, the personality engine) and writes a batch
+  with one batched write per collection: ordered per user, capped at
+  MEMORY_CAP with evicted memories going to the archive exactly as if the
+  messages had arrived one by one.
+- Progress (messages, messages/sec, % of input) is printed every
+  --progress seconds.
+- Resumable: the checkpoint file records how far the input is fully
+  applied plus which partitions of the batches in flight are done; a
+  re-run picks up from there and skips what is already written. Only a
+  worker's write interrupted halfway can be applied twice.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+import zlib
+from datetime import datetime, timezone
+from queue import Empty
+
+from app.db.documents import MEMORY_CAP
+
+# users → partitions is fixed (not tied to --workers), so a checkpoint
+# stays valid when the worker count changes between runs
+PARTITIONS = 64
+
+
+def partition_of(user_id: str):
+    return zlib.crc32(user_id.encode("utf-8")) % PARTITIONS
+
+
+def parse_line(line: bytes):
+    """(user_id, message, timestamp or None), or None for an unusable line."""
+    try:
+        record = json.loads(line)
+        user_id = str(record["user_id"])
+        message = record.get("message", record.get("text"))
+        if not isinstance(message, str) or not message:
+            return None
+        timestamp = record.get("timestamp")
+        if timestamp:
+            timestamp = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+            if timestamp.tzinfo is not None:
+                # stored like live memories: naive UTC
+                timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        return user_id, message, timestamp or None
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+# ---------------------------
+# Worker side
+# ---------------------------
+class ReplayWorker:
+    """Applies partitions of messages to storage; one per worker process."""
+
+    def __init__(self):
+        # imported here so a spawned worker builds its own storage client
+        from app.config import settings
+        from app.services import personality_engine
+        from app.services.emotion_history import emotion_history
+        from app.services.emotion_service import classify_emotion
+        from app.services.memory_service import MemoryService, new_memory
+        from app.services.style_service import StyleService, merge_style_deltas, style_delta
+
+        self.settings = settings
+        self.personality = personality_engine
+        self.emotion_history = emotion_history
+        self.classify_emotion = classify_emotion
+        self.new_memory = new_memory
+        self.style_delta = style_delta
+        self.merge_style_deltas = merge_style_deltas
+        self.memory_service = MemoryService()
+        self.style_service = StyleService(write_behind=False)
+
+        # profiles are flushed once per batch, after the other writes; no
+        # size / time triggered flushes in between
+        self.personality.profile_store.flush_users = float("inf")
+        self.personality.profile_store.flush_interval = float("inf")
+
+    def apply(self, partitions: dict):
+        """partitions: { partition: [(user_id, message, timestamp), ...] }; returns messages applied."""
+        memories = {}
+        deltas = {}
+        emotions = {}
+        texts = {}
+        count = 0
+
+        for records in partitions.values():
+            for user_id, message, timestamp in records:
+                detected = self.classify_emotion(message)["detected_emotions"]
+
+                memory = self.new_memory(message, detected[0])
+                if timestamp is not None:
+                    memory["timestamp"] = timestamp
+                memories.setdefault(user_id, []).append(memory)
+
+                delta = self.style_delta(self.style_service.analyze_style(message))
+                if user_id in deltas:
+                    self.merge_style_deltas(deltas[user_id], delta)
+                else:
+                    deltas[user_id] = delta
+
+                emotions.setdefault(user_id, []).extend(detected)
+                texts.setdefault(user_id, []).append(message)
+                count += 1
+
+        if not self.settings.archive_enabled:
+            # only the newest MEMORY_CAP survive the window anyway
+            memories = {u: m[-MEMORY_CAP:] for u, m in memories.items()}
+
+        failed = self.memory_service.add_memories_bulk(memories)
+        failed.update(self.style_service.update_user_styles_bulk(deltas))
+
+        if self.emotion_history.persistent:
+            for user_id, detected in emotions.items():
+                detected = [e for e in detected if e != "unknown"]
+                self.emotion_history.record(user_id, detected[-self.emotion_history.size:])
+
+        if failed:
+            raise _not_written(failed)
+
+        # profiles last, once the other writes stood, and saved only by the
+        # flush below (no eviction write-backs midway): a batch that fails
+        # before it has none of its profile updates stored, so the resume
+        # from the last checkpoint doesn't apply them twice
+        profiles = self.personality.profile_store
+        failures_before = profiles.failed_writes
+        with profiles.deferred_evictions():
+            for user_id, user_texts in texts.items():
+                self.personality.update_profile_with_messages(user_id, user_texts)
+            profiles.flush()
+        if profiles.failed_writes > failures_before:
+            raise _not_written({"(profiles)": f"{profiles.failed_writes - failures_before} profile writes failed"})
+        return count
+
+    def close(self, flush: bool = True):
+        """flush=False after a failure: half-applied profiles must not be written."""
+        if flush:
+            self.personality.profile_store.close()
+        self.memory_service.storage.close()
+
+
+def _not_written(failed: dict):
+    user_id, error = next(iter(failed.items()))
+    return RuntimeError(f"{len(failed)} users not written, e.g. {user_id}: {error}")
+
+
+def _worker_main(tasks, results):
+    # Ctrl-C is handled by the coordinator: it stops reading and lets the
+    # workers finish what they were sent, so the checkpoint stays exact
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    worker = ReplayWorker()
+    failure = None
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            batch_start, partitions = task
+            if failure is not None:
+                # applying later messages of these users now would put them
+                # ahead of the failed ones on resume
+                results.put(("failed", batch_start, list(partitions), 0, failure))
+                continue
+            try:
+                results.put(("done", batch_start, list(partitions), worker.apply(partitions), None))
+            except Exception as e:
+                failure = f"{type(e).__name__}: {e}"
+                results.put(("failed", batch_start, list(partitions), 0, failure))
+    finally:
+        worker.close(flush=failure is None)
+
+
+# ---------------------------
+# Checkpoint
+# ---------------------------
+class Checkpoint:
+    """
+    { input, batch_size, partitions, offset, in_flight: { batch_start: [done partitions] },
+      messages, skipped }
+    offset: every line before it is applied. Batches start at fixed line
+    counts from there, so a re-run with the same --batch-size finds the
+    same batch_start keys again.
+    """
+
+    def __init__(self, path: str, input_path: str, batch_size: int):
+        self.path = path
+        self.state = {
+            "input": os.path.abspath(input_path),
+            "batch_size": batch_size,
+            "partitions": PARTITIONS,
+            "offset": 0,
+            "in_flight": {},
+            "messages": 0,
+            "skipped": 0,
+        }
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return False
+        with open(self.path) as f:
+            saved = json.load(f)
+        for key in ("input", "batch_size", "partitions"):
+            if saved.get(key) != self.state[key]:
+                raise SystemExit(
+                    f"checkpoint {self.path} was written with {key}={saved.get(key)!r} "
+                    f"(now {self.state[key]!r}); use the same settings or --fresh"
+                )
+        self.state.update(saved)
+        return True
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.path)
+
+    def done_partitions(self, batch_start: int):
+        return set(self.state["in_flight"].get(str(batch_start), ()))
+
+
+# ---------------------------
+# Coordinator
+# ---------------------------
+class Replay:
+
+    def __init__(self, path: str, workers: int, batch_size: int, checkpoint: Checkpoint, progress: float):
+        self.path = path
+        self.workers = workers
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint
+        self.progress = progress
+
+        self.total_bytes = os.path.getsize(path)
+        self.batches = {}          # batch_start → { end, pending: {partition, ...} }
+        self.order = []            # batch_starts in file order, not yet complete
+        self.error = None
+        self.outstanding = 0       # sub-batches sent to workers, not answered yet
+        self.started = time.monotonic()
+        self.applied = 0           # this run
+        self._last_report = self.started
+
+    def run(self):
+        state = self.checkpoint.state
+        inline = self.workers == 0
+
+        if inline:
+            worker = ReplayWorker()
+        else:
+            ctx = multiprocessing.get_context("spawn")
+            tasks = [ctx.Queue(maxsize=2) for _ in range(self.workers)]
+            self.results = ctx.Queue()
+            self.processes = processes = [
+                ctx.Process(target=_worker_main, args=(queue, self.results), daemon=True)
+                for queue in tasks
+            ]
+            for process in processes:
+                process.start()
+
+        max_in_flight = max(2, 2 * self.workers)
+
+        try:
+            try:
+                with open(self.path, "rb") as f:
+                    f.seek(state["offset"])
+                    while self.error is None:
+                        batch_start = f.tell()
+                        lines = [line for line in (f.readline() for _ in range(self.batch_size)) if line]
+                        if not lines:
+                            break
+
+                        per_worker = self._partition(batch_start, lines)
+                        self._register(batch_start, f.tell(), per_worker)
+
+                        for worker_id, partitions in per_worker.items():
+                            if inline:
+                                self._apply_inline(worker, batch_start, partitions)
+                            else:
+                                tasks[worker_id].put((batch_start, partitions))
+                                self.outstanding += 1
+
+                        if not inline:
+                            self._collect(until=max_in_flight - 1)
+                        self._report()
+            except KeyboardInterrupt:
+                # stop reading; what was sent is still answered below
+                self.error = "interrupted"
+                if self.outstanding:
+                    print(f"interrupted: waiting for {self.outstanding} sub-batches in flight "
+                          f"(Ctrl-C again to abandon them; they would be re-applied on resume)", flush=True)
+
+            if not inline:
+                # every answer counts, including after a failure: partitions
+                # that did get written must be in the checkpoint
+                self._collect(until=0)
+        finally:
+            if inline:
+                worker.close(flush=self.error is None)
+            else:
+                for queue, process in zip(tasks, processes):
+                    if process.is_alive():
+                        queue.put(None)
+                for process in processes:
+                    process.join()
+
+        self._report(final=True)
+        return self.error
+
+    def _partition(self, batch_start: int, lines: list):
+        """{ worker: { partition: [record, ...] } } minus partitions already applied."""
+        done = self.checkpoint.done_partitions(batch_start)
+        # a batch found in the checkpoint already had its bad lines counted
+        seen = str(batch_start) in self.checkpoint.state["in_flight"]
+        per_worker = {}
+        for line in lines:
+            record = parse_line(line)
+            if record is None:
+                if line.strip() and not seen:
+                    self.checkpoint.state["skipped"] += 1
+                continue
+            partition = partition_of(record[0])
+            if partition in done:
+                continue
+            worker_id = partition % max(1, self.workers)
+            per_worker.setdefault(worker_id, {}).setdefault(partition, []).append(record)
+        return per_worker
+
+    def _register(self, batch_start: int, end: int, per_worker: dict):
+        pending = {p for partitions in per_worker.values() for p in partitions}
+        self.batches[batch_start] = {"end": end, "pending": pending}
+        self.order.append(batch_start)
+        self.checkpoint.state["in_flight"].setdefault(str(batch_start), [])
+        self._advance()
+
+    def _apply_inline(self, worker, batch_start: int, partitions: dict):
+        try:
+            self._done(batch_start, list(partitions), worker.apply(partitions))
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+
+    def _collect(self, until: int):
+        """Record worker answers; waits while more than `until` batches are in flight."""
+        while self.outstanding:
+            block = until == 0 or len(self.order) > until
+            try:
+                status, batch_start, partitions, count, error = self.results.get(block=block, timeout=1.0)
+            except Empty:
+                if not block:
+                    return
+                if not all(p.is_alive() for p in self.processes):
+                    # its batches will never be answered; they stay in flight
+                    self.error = self.error or "a worker process exited unexpectedly"
+                    return
+                self._report()
+                continue
+            self.outstanding -= 1
+            if status == "failed":
+                self.error = self.error or error
+                continue
+            self._done(batch_start, partitions, count)
+
+    def _done(self, batch_start: int, partitions: list, count: int):
+        batch = self.batches[batch_start]
+        batch["pending"].difference_update(partitions)
+        self.checkpoint.state["in_flight"][str(batch_start)].extend(partitions)
+        self.checkpoint.state["messages"] += count
+        self.applied += count
+        self._advance()
+
+    def _advance(self):
+        """Move the offset past every leading batch that is complete, then save."""
+        state = self.checkpoint.state
+        while self.order and not self.batches[self.order[0]]["pending"]:
+            batch_start = self.order.pop(0)
+            state["offset"] = self.batches.pop(batch_start)["end"]
+            state["in_flight"].pop(str(batch_start), None)
+        self.checkpoint.save()
+
+    def _report(self, final: bool = False):
+        now = time.monotonic()
+        if not final and now - self._last_report < self.progress:
+            return
+        self._last_report = now
+        state = self.checkpoint.state
+        elapsed = max(now - self.started, 1e-9)
+        percent = 100.0 * state["offset"] / self.total_bytes if self.total_bytes else 100.0
+        print(
+            f"{'done' if final else 'progress'}: {state['messages']:,} messages applied "
+            f"({self.applied / elapsed:,.0f} msg/s this run), {percent:.1f}% of input, "
+            f"{state['skipped']:,} unusable lines skipped",
+            flush=True
+        )
+
+
+def replay(path: str, workers: int = 4, batch_size: int = 2000, checkpoint_path: str = None,
+           fresh: bool = False, progress: float = 5.0):
+    """Run the replay; returns an error message, or None when the whole file is applied."""
+    checkpoint = Checkpoint(checkpoint_path, path, batch_size)
+    if fresh and checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    elif checkpoint.load():
+        print(f"resuming at byte {checkpoint.state['offset']:,} ({checkpoint.state['messages']:,} messages already applied)")
+
+    from app.db.storage import get_storage
+    storage = get_storage()
+    storage.ensure_schema()
+    if workers:
+        # the workers open their own connections
+        storage.close()
+
+    return Replay(path, workers, batch_size, checkpoint, progress).run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild memories, style and personality state from a JSONL chat log.")
+    parser.add_argument("path", help="JSONL file, one {user_id, message, timestamp?} per line")
+    parser.add_argument("--workers", type=int, default=4, help="worker processes (0 = run in this process)")
+    parser.add_argument("--batch-size", type=int, default=2000, help="lines read per batch")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: <path>.ckpt)")
+    parser.add_argument("--fresh", action="store_true", help="ignore an existing checkpoint and start over")
+    parser.add_argument("--progress", type=float, default=5.0, help="seconds between progress lines")
+    args = parser.parse_args()
+
+    error = replay(
+        args.path,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        checkpoint_path=args.checkpoint or args.path + ".ckpt",
+        fresh=args.fresh,
+        progress=args.progress,
+    )
+    if error:
+        print(f"stopped: {error}\nre-run the same command to resume from the checkpoint", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# app/services/cache.py
+
+import threading
+import time
+from collections import OrderedDict
+
+from app.config import settings
+
+MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded LRU cache with an optional TTL.
+    Keeps hit / miss / eviction / expiration counters for tuning.
+    """
+
+    def __init__(self, maxsize: int = None, ttl: float = None):
+        # Defaults from settings. Several uvicorn workers each hold their own
+        # copy, so entries expire quickly to bound cross-worker staleness.
+        maxsize = settings.cache_size if maxsize is None else maxsize
+        ttl = settings.cache_ttl if ttl is None else ttl
+
+        self.maxsize = maxsize
+        self.ttl = ttl                      # seconds, 0 → never expires
+        self._data = OrderedDict()          # key → (expires_at, value)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
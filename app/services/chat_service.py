@@ -1,8 +1,22 @@
 # app/services/chat_service.py
 
-from app.services.memory_service import memory_service
-from app.services.emotion_service import analyze_emotion
-from app.services.style_service import style_service
+import asyncio
+from collections import deque
+
+from app.db.executor import run_in_db_executor
+from app.metrics import stage, timed
+from app.services.memory_service import memory_service, async_memory_service, new_memory, summarize_counts
+from app.services.emotion_history import HISTORY_SIZE, emotion_history
+from app.services.emotion_service import analyze_emotion, classify_emotion, record_emotions
+from app.services.style_service import (
+    style_service,
+    async_style_service,
+    apply_style_delta,
+    merge_style_deltas,
+    style_delta,
+)
+from app.services.user_context import UserContext
+from app.services.user_locks import chat_locks
 
 
 def apply_style_to_reply(reply: str, style_profile: dict):
@@ -67,26 +81,203 @@ def generate_reply(user_id: str, message: str):
       – memory similarity
       – personality profile
       – style learning (NEW)
+
+    The user's memories are read once into a UserContext; everything else
+    is served from that snapshot. Each stage is timed (app/metrics.py).
     """
 
     # 1️⃣ Analyze emotion
-    emotion_result = analyze_emotion(message)
+    with stage("emotion"):
+        emotion_result = analyze_emotion(message, user_id)
+        emotion = emotion_result["detected_emotions"][0]
+
+    # 2️⃣ Load the user's state (the only read of the turn)
+    with stage("memory_read"):
+        context = UserContext.load(user_id)
+
+    # 3️⃣ Check similar memories — before this message joins them; the
+    # archive is only read when the hot window has nothing and the user
+    # has archived memories at all
+    with stage("similarity"):
+        similar = context.find_similar_memory(message)
+    if similar is None and context.has_archive:
+        with stage("archive_recall"):
+            similar = memory_service.find_archived_memory(user_id, message)
+
+    # 4️⃣ Store message in memory
+    with stage("memory_write"):
+        context.remember(memory_service.add_memory(user_id, message, emotion))
+
+    # 5️⃣ Update style engine; the write hands back the updated profile
+    with stage("style_update"):
+        context.set_style(style_service.update_user_style(user_id, message))
+
+    # 6️⃣ Personality summary + style profile from the snapshot
+    return _compose(emotion_result, context, similar)
+
+
+async def generate_reply_async(user_id: str, message: str):
+    """
+    Same pipeline as generate_reply, but every storage call is awaited on the
+    DB executor so other users' requests keep running while this one waits.
+    Turns of the same user run one at a time, in arrival order, so each
+    one's snapshot already holds the previous message.
+    """
+    async with chat_locks.hold(user_id):
+
+        # 1️⃣ Classify emotion (CPU only, stays on the loop); the history
+        # update is a storage write and joins the others in 4️⃣
+        with stage("emotion"):
+            emotion_result = classify_emotion(message)
+            emotion = emotion_result["detected_emotions"][0]
+
+        # 2️⃣ Load the user's state
+        context = await timed("memory_read", UserContext.load_async(user_id))
+
+        # 3️⃣ Check similar memories (archive only on a hot-window miss)
+        with stage("similarity"):
+            similar = context.find_similar_memory(message)
+        if similar is None and context.has_archive:
+            similar = await timed("archive_recall", async_memory_service.find_archived_memory(user_id, message))
+
+        # 4️⃣ + 5️⃣ The writes are independent → run them together
+        memory, style_doc, emotion_result["emotion_memory"] = await asyncio.gather(
+            timed("memory_write", async_memory_service.add_memory(user_id, message, emotion)),
+            timed("style_update", async_style_service.update_user_style(user_id, message)),
+            timed("emotion_history", run_in_db_executor(record_emotions, user_id, emotion_result["detected_emotions"]))
+        )
+        context.remember(memory)
+        context.set_style(style_doc)
+
+        # 6️⃣ Personality summary + style profile from the snapshot
+        return _compose(emotion_result, context, similar)
+
+
+def _compose(emotion_result: dict, context: UserContext, similar: dict):
+    """Last stages of a turn, served from the snapshot."""
+    with stage("style_read"):
+        style_profile = context.style_profile()
+    with stage("personality"):
+        personality = context.summarize_personality()
+    with stage("compose"):
+        return compose_reply(emotion_result, style_profile, similar, personality)
+
+
+def generate_replies(items: list):
+    """
+    Batch version of generate_reply for ingestion jobs.
+
+    items: [(user_id, message), ...]
+    Returns one {"user_id", "reply"} or {"user_id", "error"} per item, in
+    input order. Each user's messages are processed in order against that
+    user's snapshot, so message N sees messages 1..N-1. Storage is grouped:
+    one read per collection for the whole batch and one bulk_write per
+    collection with a single update per user (the emotion history takes one
+    write per user). Archive recall is the
+    exception: a hot-window miss of a user with archived memories costs
+    one read, as in generate_reply.
+    """
+    user_ids = list(dict.fromkeys(user_id for user_id, _ in items))
+
+    # 1️⃣ Load every user's state up front
+    with stage("batch_read"):
+        windows = memory_service.get_memory_windows(user_ids)
+        style_docs = style_service.get_style_docs(user_ids)
+        histories = emotion_history.get_many(user_ids)
+    contexts = {u: UserContext.from_window(u, windows[u], style_docs[u]) for u in user_ids}
+    histories = {u: deque(histories[u], maxlen=HISTORY_SIZE) for u in user_ids}
+
+    pending_memories = {}
+    pending_styles = {}
+    pending_emotions = {}
+    results = []
+
+    # 2️⃣ Run the pipeline per message against the snapshots
+    for user_id, message in items:
+        try:
+            context = contexts[user_id]
+            emotion_result = classify_emotion(message)
+            detected = [e for e in emotion_result["detected_emotions"] if e != "unknown"]
+            histories[user_id].extend(detected)
+            emotion_result["emotion_memory"] = list(histories[user_id])
+            similar = context.find_similar_memory(message)
+            if similar is None and context.has_archive:
+                similar = memory_service.find_archived_memory(user_id, message)
+            reply, memory, delta = process_turn(context, message, emotion_result, similar)
+
+            pending_memories.setdefault(user_id, []).append(memory)
+            pending_emotions.setdefault(user_id, []).extend(detected)
+            if user_id in pending_styles:
+                merge_style_deltas(pending_styles[user_id], delta)
+            else:
+                pending_styles[user_id] = delta
+
+            results.append({"user_id": user_id, "reply": reply})
+        except Exception as e:
+            results.append({"user_id": user_id, "error": str(e)})
+
+    # 3️⃣ Grouped writes: one bulk_write per collection
+    with stage("batch_write"):
+        failed = memory_service.add_memories_bulk(pending_memories)
+        for user_id, error in style_service.update_user_styles_bulk(pending_styles).items():
+            failed.setdefault(user_id, error)
+        for user_id, emotions in pending_emotions.items():
+            try:
+                emotion_history.record(user_id, emotions)
+            except Exception as e:
+                failed.setdefault(user_id, str(e))
+
+    # A reply only counts if its user's state was stored
+    for result in results:
+        if "reply" in result and result["user_id"] in failed:
+            del result["reply"]
+            result["error"] = f"storage write failed: {failed[result['user_id']]}"
+
+    return results
+
+
+def process_turn(context: UserContext, message: str, emotion_result: dict, similar: dict):
+    """
+    Run one message against a user's snapshot without touching storage.
+    `similar` is the caller's lookup for this message, made before it joins
+    the snapshot (hot window, then archive recall on a miss).
+    The snapshot is updated in place; returns (reply, memory, style delta)
+    for the caller to persist however it batches writes.
+    """
     emotion = emotion_result["detected_emotions"][0]
 
-    # 2️⃣ Store message in memory
-    memory_service.add_memory(user_id, message, emotion)
+    memory = new_memory(message, emotion)
+    delta = style_delta(style_service.analyze_style(message))
+
+    context.remember(memory)
+    context.set_style(apply_style_delta(context.style_doc, delta))
+
+    reply = compose_reply(
+        emotion_result,
+        context.style_profile(),
+        similar,
+        context.summarize_personality()
+    )
+    return reply, memory, delta
 
-    # 3️⃣ Update style engine based on this message (NEW)
-    style_service.update_user_style(user_id, message)
 
-    # 4️⃣ Get style profile (NEW)
-    style_profile = style_service.get_user_style(user_id)
+def degraded_reply(message: str):
+    """
+    Reply used while the chat pipeline is shedding load (app/admission.py):
+    emotion classification only — no storage, so nothing is remembered and
+    no memory, style or personality is used.
+    """
+    with stage("degraded"):
+        emotion_result = analyze_emotion(message)
+        return compose_reply(emotion_result, None, None, summarize_counts({}, 0))
 
-    # 5️⃣ Check similar memories
-    similar = memory_service.find_similar_memory(user_id, message)
 
-    # 6️⃣ Personality summary
-    personality = memory_service.summarize_personality(user_id)
+def compose_reply(emotion_result: dict, style_profile: dict, similar: dict, personality: dict):
+    """
+    Build the final reply from the pipeline results.
+    Pure function: no storage access, shared by the sync and async paths.
+    """
+    emotion = emotion_result["detected_emotions"][0]
 
     # ------------------------------------------------
     # REPLY GENERATION LOGIC
@@ -0,0 +1,166 @@
+# app/services/chat_session.py
+"""
+Connection-scoped chat state for the /chat/ws WebSocket.
+
+A session loads the user's working state once when the socket opens:
+recent memories with their archive counts, the raw style document and
+the emotion history. Every message is then answered from that state
+(process_turn); the only read a turn may make is archive recall, on a
+hot-window miss of a user with archived memories. The resulting writes
+are queued for a background task. That task persists
+whatever has accumulated in one batched write per collection, so a burst
+of messages costs one round trip per collection, not one per message.
+
+The snapshot is only as fresh as this connection's own writes: messages
+the same user sends through another connection meanwhile are not seen
+until the next session is opened.
+"""
+
+import asyncio
+import logging
+from collections import deque
+
+from app.db.executor import run_in_db_executor
+from app.metrics import stage, timed
+from app.services.chat_service import process_turn
+from app.services.emotion_history import HISTORY_SIZE, emotion_history
+from app.services.emotion_service import classify_emotion
+from app.services.memory_service import async_memory_service, memory_service
+from app.services.style_service import merge_style_deltas, style_service
+from app.services.user_context import UserContext
+
+logger = logging.getLogger("ai_buddy")
+
+# pause before retrying a failed background write
+RETRY_DELAY = 1.0
+
+
+class ChatSession:
+
+    def __init__(self, user_id: str, context: UserContext, emotions: list):
+        self.user_id = user_id
+        self.context = context
+        self.emotions = deque(emotions, maxlen=HISTORY_SIZE)
+
+        # writes not persisted yet, in message order
+        self._memories = []
+        self._delta = None
+        self._emotions = []
+
+        self._wake = asyncio.Event()
+        self._closed = False
+        self._writer = None
+
+        # counters for this connection
+        self.turns = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+
+    # ---------------------------
+    # Lifecycle
+    # ---------------------------
+    @classmethod
+    async def open(cls, user_id: str):
+        """Load the user's state (three reads, run together) and start the writer."""
+        window, style_docs, emotions = await asyncio.gather(
+            run_in_db_executor(memory_service.get_memory_window, user_id),
+            run_in_db_executor(style_service.get_style_docs, [user_id]),
+            run_in_db_executor(emotion_history.get, user_id)
+        )
+        session = cls(user_id, UserContext.from_window(user_id, window, style_docs[user_id]), emotions)
+        session._writer = asyncio.create_task(session._write_loop())
+        return session
+
+    async def close(self):
+        """Stop the writer and persist everything still pending."""
+        self._closed = True
+        self._wake.set()
+        if self._writer is not None:
+            await self._writer
+        await self._flush()
+
+    # ---------------------------
+    # Turns (storage only for archive recall)
+    # ---------------------------
+    async def reply(self, message: str):
+        with stage("ws_turn"):
+            emotion_result = classify_emotion(message)
+            detected = [e for e in emotion_result["detected_emotions"] if e != "unknown"]
+            self.emotions.extend(detected)
+            emotion_result["emotion_memory"] = list(self.emotions)
+            similar = self.context.find_similar_memory(message)
+            if similar is None and self.context.has_archive:
+                similar = await timed("archive_recall", async_memory_service.find_archived_memory(self.user_id, message))
+
+            reply, memory, delta = process_turn(self.context, message, emotion_result, similar)
+
+        self._memories.append(memory)
+        self._emotions.extend(detected)
+        if self._delta is None:
+            self._delta = delta
+        else:
+            merge_style_deltas(self._delta, delta)
+
+        self.turns += 1
+        self._wake.set()
+        return reply
+
+    # ---------------------------
+    # Background persistence
+    # ---------------------------
+    async def _write_loop(self):
+        while not self._closed:
+            await self._wake.wait()
+            self._wake.clear()
+            if not await self._flush() and not self._closed:
+                await asyncio.sleep(RETRY_DELAY)
+                self._wake.set()
+
+    async def _flush(self):
+        """Persist the pending writes; on failure they stay pending. Returns success."""
+        if not self._memories and self._delta is None and not self._emotions:
+            return True
+
+        batch = {"memories": self._memories, "delta": self._delta, "emotions": self._emotions}
+        self._memories, self._delta, self._emotions = [], None, []
+
+        try:
+            with stage("ws_persist"):
+                error = await run_in_db_executor(self._persist, batch)
+        except Exception as e:
+            error = str(e)
+
+        if error is None:
+            self.flushes += 1
+            return True
+
+        # what was not stored goes back in front of anything queued meanwhile
+        logger.warning("chat session %s: background write failed: %s", self.user_id, error)
+        self.failed_flushes += 1
+        self._memories = batch["memories"] + self._memories
+        if batch["delta"] is not None:
+            if self._delta is not None:
+                merge_style_deltas(batch["delta"], self._delta)
+            self._delta = batch["delta"]
+        self._emotions = batch["emotions"] + self._emotions
+        return False
+
+    def _persist(self, batch: dict):
+        """
+        Runs on the DB executor. Each part that is stored is removed from
+        `batch`, so a retry never writes it twice. Returns an error or None.
+        """
+        if batch["memories"]:
+            failed = memory_service.add_memories_bulk({self.user_id: batch["memories"]})
+            if failed:
+                return failed[self.user_id]
+            batch["memories"] = []
+        if batch["delta"] is not None:
+            failed = style_service.update_user_styles_bulk({self.user_id: batch["delta"]})
+            if failed:
+                return failed[self.user_id]
+            batch["delta"] = None
+        if batch["emotions"]:
+            emotion_history.record(self.user_id, batch["emotions"])
+            batch["emotions"] = []
+        return None
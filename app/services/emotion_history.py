@@ -0,0 +1,132 @@
+# app/services/emotion_history.py
+"""
+Per-user emotion history.
+
+Each user gets a fixed-size ring buffer of their last HISTORY_SIZE
+emotions. Buffers live in an LRU map capped at MAX_USERS, so total memory
+is bounded (MAX_USERS × HISTORY_SIZE entries) and idle users are evicted
+first. All access goes through one lock, so concurrent requests never see
+a half-updated buffer.
+
+Optionally (AI_BUDDY_EMOTION_HISTORY=mongo) the history lives in the
+`emotion_history` collection instead, as one capped array per user: it then
+survives restarts and every uvicorn worker answers with the same history.
+"""
+
+import threading
+from collections import OrderedDict, deque
+
+from pymongo import ASCENDING, ReturnDocument
+
+from app.config import settings
+from app.db.mongo import get_collection
+from app.db.mongo_store import user_id_range
+
+HISTORY_SIZE = 5
+
+
+class EmotionHistoryStore:
+
+    def __init__(self, size: int = HISTORY_SIZE, max_users: int = None, persistent: bool = False):
+        self.size = size
+        self.max_users = settings.emotion_history_users if max_users is None else max_users
+        self.persistent = persistent     # False → process-local ring buffers
+        self._buffers = OrderedDict()    # user_id → deque(maxlen=size), LRU order
+        self._lock = threading.Lock()
+
+    # ---------------------------
+    # Public API
+    # ---------------------------
+    def record(self, user_id: str, emotions: list):
+        """Append emotions to the user's history; returns the history after."""
+        emotions = [e for e in emotions if e != "unknown"]
+        if not emotions:
+            return self.get(user_id)
+
+        if self.persistent:
+            return self._record_persistent(user_id, emotions)
+
+        with self._lock:
+            buffer = self._buffer(user_id)
+            buffer.extend(emotions)
+            return list(buffer)
+
+    def get(self, user_id: str):
+        """Return a copy of the user's history, oldest first."""
+        if self.persistent:
+            doc = self.collection.find_one({"user_id": user_id}, {"emotions": 1})
+            return doc["emotions"] if doc else []
+
+        with self._lock:
+            buffer = self._buffers.get(user_id)
+            if buffer is None:
+                return []
+            self._buffers.move_to_end(user_id)
+            return list(buffer)
+
+    def get_many(self, user_ids: list):
+        """{ user_id: history } for several users (one query when persistent)."""
+        if self.persistent:
+            found = {
+                doc["user_id"]: doc["emotions"]
+                for doc in self.collection.find({"user_id": {"$in": list(user_ids)}}, {"user_id": 1, "emotions": 1})
+            }
+            return {u: found.get(u, []) for u in user_ids}
+
+        with self._lock:
+            return {u: list(self._buffers.get(u, ())) for u in user_ids}
+
+    def iter_user_ids(self, start: str = None, end: str = None, batch_size: int = 1000):
+        """Sorted user_ids with a history in [start, end) (None = unbounded)."""
+        if self.persistent:
+            return (
+                doc["user_id"] for doc in
+                self.collection.find(user_id_range(start, end), {"_id": 0, "user_id": 1})
+                .sort("user_id", ASCENDING).batch_size(batch_size)
+            )
+
+        with self._lock:
+            user_ids = sorted(u for u, buffer in self._buffers.items() if buffer)
+        return (
+            u for u in user_ids
+            if (start is None or u >= start) and (end is None or u < end)
+        )
+
+    @property
+    def collection(self):
+        return get_collection("emotion_history")
+
+    def clear(self):
+        with self._lock:
+            self._buffers.clear()
+
+    def __len__(self):
+        return len(self._buffers)
+
+    # ---------------------------
+    # Internals
+    # ---------------------------
+    def _buffer(self, user_id: str):
+        """Get-or-create the user's buffer and mark it most recently used."""
+        buffer = self._buffers.get(user_id)
+        if buffer is None:
+            buffer = self._buffers[user_id] = deque(maxlen=self.size)
+            if len(self._buffers) > self.max_users:
+                self._buffers.popitem(last=False)   # evict the idlest user
+        else:
+            self._buffers.move_to_end(user_id)
+        return buffer
+
+    def _record_persistent(self, user_id: str, emotions: list):
+        # push + trim atomically; the returned array is what every worker sees
+        doc = self.collection.find_one_and_update(
+            {"user_id": user_id},
+            {"$push": {"emotions": {"$each": emotions, "$slice": -self.size}}},
+            projection={"emotions": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return doc["emotions"]
+
+
+emotion_history = EmotionHistoryStore(persistent=settings.emotion_history_backend == "mongo")
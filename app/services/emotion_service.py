@@ -1,113 +1,231 @@
 # app/services/emotion_service.py
 
+import re
+
+from app.config import settings
+from app.metrics import cache_stats
+from app.services.cache import MISSING, LRUCache
+from app.services.emotion_history import emotion_history
+
+
+# ================================
+#  EMOTION KEYWORD CLUSTERS
+# ================================
+EMOTION_KEYWORDS = {
+    "sad": [
+        "sad", "depressed", "down", "unhappy", "hurt",
+        "lonely", "heartbroken", "crying", "miserable"
+    ],
+    "anxious": [
+        "anxious", "nervous", "worried", "scared",
+        "fear", "panic", "overthinking", "tense"
+    ],
+    "angry": [
+        "angry", "mad", "furious", "irritated", "annoyed",
+        "rage", "frustrated", "pissed"
+    ],
+    "stressed": [
+        "stressed", "pressure", "tired", "overwhelmed",
+        "burned out", "exhausted"
+    ],
+    "happy": [
+        "happy", "excited", "joy", "delighted", "glad",
+        "thrilled", "smiling"
+    ],
+    "confused": [
+        "confused", "lost", "uncertain", "unsure", "doubt"
+    ],
+    "bored": [
+        "bored", "meh", "uninterested", "dull"
+    ],
+    "motivated": [
+        "motivated", "driven", "inspired", "focused"
+    ],
+    "hopeful": [
+        "hopeful", "optimistic", "positive"
+    ],
+    "grateful": [
+        "grateful", "thankful", "appreciate"
+    ],
+    "guilty": [
+        "guilty", "remorse", "regret", "ashamed"
+    ],
+    "jealous": [
+        "jealous", "envious", "insecure", "comparison"
+    ],
+    "lonely": [
+        "alone", "isolated", "lonely"
+    ],
+    "in love": [
+        "love", "crush", "affection", "fond"
+    ],
+    "broken": [
+        "broken", "devastated", "ruined", "shattered"
+    ],
+    "numb": [
+        "numb", "empty", "hollow", "disconnected"
+    ]
+}
+
+
+# ================================
+#  EMOTION-BASED ADVICE
 # ================================
-#  GLOBAL EMOTION MEMORY (stores last 5)
+ADVICE = {
+    "sad": "You don't have to go through it all alone. Tell me what's bothering you—I'm listening.",
+    "anxious": "Take a deep breath, hold it in, and release. Help me in helping you.",
+    "angry": "I understand how you feel. Let's take it slow. Talk to me; we'll figure out what to do next.",
+    "stressed": "No one should carry such a burden all alone. I'm here for you, you know that right? Talk to me.",
+    "happy": "OMMGGGG, let's goooo! Tell me more, I wanna know all of it.",
+    "confused": "Let’s figure it out together. What’s making things unclear?",
+    "bored": "Wanna do something fun or new together?",
+    "motivated": "Damn, if you keep this up, you are gonna outshine the sun! What have you thought of next?",
+    "hopeful": "Hope is the only thing that keeps us going—you are doing well, and I'm proud of you.",
+    "grateful": "It's so beautiful, this feeling. I wanna hear more.",
+    "guilty": "Ah, the guiltiness… that lump forming at the back of your throat. Hardest part is admitting it. You've already done that—let's talk a little more.",
+    "jealous": "There's no living thing that's immune to it. It's natural, don't feel bad. It's okay, talk to me?",
+    "lonely": "You’re not alone—you've never been. Maybe right now it seems like it, but that's not true. I'm right here.",
+    "in love": "Well well well! Look at youuu. I wish I could feel it. Please, I'm dying—tell me more!",
+    "broken": "I know everything seems to be falling apart right now. Nothing feels right. Pour it out, all of it. I'm here for you.",
+    "numb": "I'm so sorry. I know this uneasy feeling. Nothing seems okay right now… take it slow, please. I'm here."
+}
+
+
+# ================================
+#  INTENSITY KEYWORDS
+# ================================
+INTENSITY_KEYWORDS = {
+    "high": ["very", "really", "extremely", "so", "too", "completely", "totally", "terribly"],
+    "moderate": ["quite", "fairly", "somewhat", "kind of"],
+    "low": ["a little", "slightly", "bit"]
+}
+
+
 # ================================
-emotion_memory = []
+#  COMPILED LEXICON (built once at import)
+# ================================
+# phrase → emotions it signals ("lonely" is in both "sad" and "lonely")
+_EMOTION_BY_PHRASE = {}
+for _emotion, _words in EMOTION_KEYWORDS.items():
+    for _word in _words:
+        _EMOTION_BY_PHRASE.setdefault(_word, []).append(_emotion)
+
+_INTENSITY_BY_PHRASE = {
+    word: level
+    for level, words in INTENSITY_KEYWORDS.items()
+    for word in words
+}
 
+# phrase → ("emotion", [emotions]) | ("intensity", level)
+_LEXICON = {}
+for _phrase, _emotions in _EMOTION_BY_PHRASE.items():
+    _LEXICON[_phrase] = ("emotion", _emotions)
+for _phrase, _level in _INTENSITY_BY_PHRASE.items():
+    _LEXICON[_phrase] = ("intensity", _level)
 
-def analyze_emotion(text: str):
+
+def _trie_pattern(node: dict):
+    """Regex for a character trie; shared prefixes are matched only once."""
+    ends_here = "" in node
+    branches = [
+        (r"\s+" if ch == " " else re.escape(ch)) + _trie_pattern(child)
+        for ch, child in sorted(node.items())
+        if ch
+    ]
+    if not branches:
+        return ""
+
+    if len(branches) == 1 and not ends_here:
+        pattern = branches[0]
+    else:
+        pattern = "(?:" + "|".join(branches) + ")"
+    return pattern + "?" if ends_here else pattern
+
+
+def _compile_lexicon(phrases):
     """
-    Advanced emotion analyzer:
+    Compile every phrase into ONE trie-shaped regex (a small automaton), so a
+    single scan of the text finds all hits. Word boundaries on both sides keep
+    matches on whole words: "so" no longer fires inside "reason", nor "down" inside
+    "download".
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[""] = True
+    return re.compile(r"\b" + _trie_pattern(trie) + r"\b")
+
+
+_LEXICON_RE = _compile_lexicon(_LEXICON)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+# ================================
+#  CLASSIFICATION CACHE
+# ================================
+# Short messages repeat a lot ("lol", "im so tired", "thanks") and the
+# result only depends on the normalized text, so it is memoized. Longer
+# messages rarely repeat; they are classified without touching the cache.
+CACHEABLE_LENGTH = 256
+
+emotion_cache = LRUCache(maxsize=settings.emotion_cache_size, ttl=0)
+cache_stats.register("emotion", emotion_cache.stats)
+
+
+def normalize_text(text: str):
+    """Lowercase, single-spaced, stripped: whitespace never changes a lexicon match."""
+    return " ".join(text.lower().split())
+
+
+def classify_emotion(text: str):
+    """
+    Pure emotion classification (no per-user state):
     - Multi-emotion detection
     - Emotion intensity scoring
-    - Tracks last 5 emotional states
+    Returns { detected_emotions, intensity, advice }; the same text (case
+    and whitespace aside) always gives the same result, served from
+    emotion_cache after the first time.
     """
+    if len(text) > CACHEABLE_LENGTH:
+        return _classify(text.lower())
 
-    original_text = text
-    text = text.lower()
+    key = normalize_text(text)
+    result = emotion_cache.get(key)
+    if result is MISSING:
+        result = _classify(key)
+        emotion_cache.set(key, result)
 
-    # ================================
-    #  EMOTION KEYWORD CLUSTERS
-    # ================================
-    emotion_keywords = {
-        "sad": [
-            "sad", "depressed", "down", "unhappy", "hurt",
-            "lonely", "heartbroken", "crying", "miserable"
-        ],
-        "anxious": [
-            "anxious", "nervous", "worried", "scared",
-            "fear", "panic", "overthinking", "tense"
-        ],
-        "angry": [
-            "angry", "mad", "furious", "irritated", "annoyed",
-            "rage", "frustrated", "pissed"
-        ],
-        "stressed": [
-            "stressed", "pressure", "tired", "overwhelmed",
-            "burned out", "exhausted"
-        ],
-        "happy": [
-            "happy", "excited", "joy", "delighted", "glad",
-            "thrilled", "smiling"
-        ],
-        "confused": [
-            "confused", "lost", "uncertain", "unsure", "doubt"
-        ],
-        "bored": [
-            "bored", "meh", "uninterested", "dull"
-        ],
-        "motivated": [
-            "motivated", "driven", "inspired", "focused"
-        ],
-        "hopeful": [
-            "hopeful", "optimistic", "positive"
-        ],
-        "grateful": [
-            "grateful", "thankful", "appreciate"
-        ],
-        "guilty": [
-            "guilty", "remorse", "regret", "ashamed"
-        ],
-        "jealous": [
-            "jealous", "envious", "insecure", "comparison"
-        ],
-        "lonely": [
-            "alone", "isolated", "lonely"
-        ],
-        "in love": [
-            "love", "crush", "affection", "fond"
-        ],
-        "broken": [
-            "broken", "devastated", "ruined", "shattered"
-        ],
-        "numb": [
-            "numb", "empty", "hollow", "disconnected"
-        ]
-    }
+    # cached results are shared; callers get their own copy
+    return dict(result, detected_emotions=list(result["detected_emotions"]))
+
+
+def _classify(text: str):
+    """One pass of the lexicon compiled at import over lowercased text."""
 
     # ================================
-    #  EMOTION-BASED ADVICE
+    #  SINGLE-PASS LEXICON SCAN
     # ================================
-    advice = {
-        "sad": "You don't have to go through it all alone. Tell me what's bothering you—I'm listening.",
-        "anxious": "Take a deep breath, hold it in, and release. Help me in helping you.",
-        "angry": "I understand how you feel. Let's take it slow. Talk to me; we'll figure out what to do next.",
-        "stressed": "No one should carry such a burden all alone. I'm here for you, you know that right? Talk to me.",
-        "happy": "OMMGGGG, let's goooo! Tell me more, I wanna know all of it.",
-        "confused": "Let’s figure it out together. What’s making things unclear?",
-        "bored": "Wanna do something fun or new together?",
-        "motivated": "Damn, if you keep this up, you are gonna outshine the sun! What have you thought of next?",
-        "hopeful": "Hope is the only thing that keeps us going—you are doing well, and I'm proud of you.",
-        "grateful": "It's so beautiful, this feeling. I wanna hear more.",
-        "guilty": "Ah, the guiltiness… that lump forming at the back of your throat. Hardest part is admitting it. You've already done that—let's talk a little more.",
-        "jealous": "There's no living thing that's immune to it. It's natural, don't feel bad. It's okay, talk to me?",
-        "lonely": "You’re not alone—you've never been. Maybe right now it seems like it, but that's not true. I'm right here.",
-        "in love": "Well well well! Look at youuu. I wish I could feel it. Please, I'm dying—tell me more!",
-        "broken": "I know everything seems to be falling apart right now. Nothing feels right. Pour it out, all of it. I'm here for you.",
-        "numb": "I'm so sorry. I know this uneasy feeling. Nothing seems okay right now… take it slow, please. I'm here."
-    }
+    emotions_hit = set()
+    levels_hit = set()
+
+    for phrase in set(_LEXICON_RE.findall(text)):
+        entry = _LEXICON.get(phrase)
+        if entry is None:
+            # multi-word phrase matched across a longer run of whitespace
+            entry = _LEXICON[_WHITESPACE_RE.sub(" ", phrase)]
+        kind, value = entry
+        if kind == "emotion":
+            emotions_hit.update(value)
+        else:
+            levels_hit.add(value)
 
     # ================================
     #  MULTI-EMOTION DETECTION
     # ================================
-    detected_emotions = []
-
-    for emotion, words in emotion_keywords.items():
-        for word in words:
-            if word in text:
-                detected_emotions.append(emotion)
-                break  # avoid duplicates
+    # Reported in lexicon order, as before
+    detected_emotions = [e for e in EMOTION_KEYWORDS if e in emotions_hit]
 
     if not detected_emotions:
         detected_emotions = ["unknown"]
@@ -115,37 +233,56 @@ def analyze_emotion(text: str):
     # ================================
     #  EMOTION INTENSITY SCORING
     # ================================
-    intensity_keywords = {
-        "high": ["very", "really", "extremely", "so", "too", "completely", "totally", "terribly"],
-        "moderate": ["quite", "fairly", "somewhat", "kind of"],
-        "low": ["a little", "slightly", "bit"]
+    intensity = "moderate"  # default
+
+    # Later levels override earlier ones (low > moderate > high)
+    for level in INTENSITY_KEYWORDS:
+        if level in levels_hit:
+            intensity = level
+
+    return {
+        "detected_emotions": detected_emotions,
+        "intensity": intensity,
+        "advice": ADVICE.get(detected_emotions[0], "I'm here, talk to me. What's going on?")
     }
 
-    intensity = "moderate"  # default
 
-    for level, words in intensity_keywords.items():
-        for w in words:
-            if w in text:
-                intensity = level
-                break
+def record_emotions(user_id: str, detected_emotions: list):
+    """Add a message's emotions to the user's last-5 history; returns the history."""
+    return emotion_history.record(user_id, detected_emotions)
 
-    # ================================
-    #  EMOTION MEMORY UPDATE
-    # ================================
-    for emo in detected_emotions:
-        if emo != "unknown":
-            emotion_memory.append(emo)
 
-    # Keep only last 5
-    if len(emotion_memory) > 5:
-        emotion_memory[:] = emotion_memory[-5:]
+def analyze_emotion(text: str, user_id: str = None):
+    """
+    classify_emotion + the per-user history update:
+    - Tracks the user's last 5 emotional states (when user_id is given)
+    Returns the classification plus "emotion_memory".
+    """
+    result = classify_emotion(text)
 
     # ================================
-    #  RESPONSE
+    #  EMOTION MEMORY UPDATE (per user)
     # ================================
-    return {
-        "detected_emotions": detected_emotions,
-        "intensity": intensity,
-        "advice": advice.get(detected_emotions[0], "I'm here, talk to me. What's going on?"),
-        "emotion_memory": emotion_memory
-    }
+    if user_id is not None:
+        result["emotion_memory"] = record_emotions(user_id, result["detected_emotions"])
+    else:
+        result["emotion_memory"] = []
+
+    return result
+
+
+def analyze_emotion_batch(texts: list, user_id: str = None):
+    """
+    Analyze many messages in one call, in input order.
+    A message that fails yields {"error": ...} in its slot instead of
+    failing the whole batch.
+    """
+    results = []
+
+    for text in texts:
+        try:
+            results.append(analyze_emotion(text, user_id))
+        except Exception as e:
+            results.append({"error": str(e)})
+
+    return results
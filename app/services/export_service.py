@@ -0,0 +1,135 @@
+# app/services/export_service.py
+"""
+Streaming export of what is stored per user, as NDJSON records:
+
+    {"type": "style", "user_id": ..., total_messages, ..., slang_used}
+    {"type": "personality", "user_id": ..., sliders, msg_count, emoji_pref, ...}
+    {"type": "emotion_history", "user_id": ..., "emotions": [...]}
+    {"type": "memory", "user_id": ..., "tier": "archive" | "pending" | "recent",
+     "text": ..., "emotion": ..., "timestamp": ...}     # oldest first
+
+Users come off Storage.iter_user_ids, merged with the users that only
+have an emotion history (server-side cursors or keyset pages, sorted by
+user_id), and are looked up `batch_size` at a time with the same batched
+reads the chat path uses; archive blocks are streamed one at a time. So
+memory use is bounded by one batch of users, not by the size of the
+tenant or of a user's history.
+
+An export is not a point-in-time snapshot: a turn or a block seal running
+meanwhile can show up in it or not (a memory being sealed may appear
+twice, as pending and archived).
+"""
+
+import json
+from datetime import datetime
+from itertools import islice
+
+from app.db.documents import merge_user_ids
+from app.db.storage import get_storage
+from app.services.emotion_history import emotion_history
+from app.services.memory_archive import decode_block
+
+DEFAULT_BATCH_SIZE = 500
+
+# stored fields that are internal (Mongo ids) or derived (similarity vectors)
+_INTERNAL = {"_id", "user_id", "vector"}
+
+
+def export_user(user_id: str, batch_size: int = DEFAULT_BATCH_SIZE, storage=None):
+    """Records of one user (nothing if the user has no stored data)."""
+    return _export_batch(storage or get_storage(), [user_id], batch_size)
+
+
+def export_users(start: str = None, end: str = None, batch_size: int = DEFAULT_BATCH_SIZE, storage=None):
+    """Records of every user with user_id in [start, end) (None = unbounded), by user_id."""
+    storage = storage or get_storage()
+    user_ids = _user_ids(storage, start, end, batch_size)
+    while True:
+        batch = list(islice(user_ids, batch_size))
+        if not batch:
+            return
+        yield from _export_batch(storage, batch, batch_size)
+
+
+def _user_ids(storage, start: str, end: str, batch_size: int):
+    return merge_user_ids(
+        storage.iter_user_ids(start, end, batch_size),
+        emotion_history.iter_user_ids(start, end, batch_size)
+    )
+
+
+def _export_batch(storage, user_ids: list, batch_size: int):
+    styles = storage.get_style_docs(user_ids)
+    profiles = storage.get_profile_docs(user_ids)
+    histories = emotion_history.get_many(user_ids)
+    windows = storage.get_memories_many(user_ids)
+
+    for user_id in user_ids:
+        if styles[user_id]:
+            yield _record("style", user_id, styles[user_id])
+        if profiles[user_id]:
+            yield _record("personality", user_id, profiles[user_id])
+        if histories[user_id]:
+            yield {"type": "emotion_history", "user_id": user_id, "emotions": histories[user_id]}
+
+        for block in storage.iter_archive_blocks(user_id, batch_size):
+            for memory in decode_block(block["data"]):
+                yield _memory(user_id, "archive", memory)
+        for memory in storage.get_archive_pending(user_id):
+            yield _memory(user_id, "pending", memory)
+        for memory in windows[user_id]:
+            yield _memory(user_id, "recent", memory)
+
+
+def _record(kind: str, user_id: str, doc: dict):
+    return {"type": kind, "user_id": user_id, **{k: v for k, v in doc.items() if k not in _INTERNAL}}
+
+
+def _memory(user_id: str, tier: str, memory: dict):
+    return {
+        "type": "memory", "user_id": user_id, "tier": tier,
+        "text": memory["text"], "emotion": memory["emotion"], "timestamp": memory["timestamp"]
+    }
+
+
+def ndjson(records):
+    """Encode records as NDJSON lines (bytes), one per record."""
+    return map(ndjson_line, records)
+
+
+def ndjson_line(record: dict):
+    return json.dumps(record, ensure_ascii=False, default=_json_default).encode("utf-8") + b"\n"
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+# ---------------------------
+# Range partitioning (full-tenant export)
+# ---------------------------
+def user_id_ranges(parts: int, batch_size: int = DEFAULT_BATCH_SIZE, storage=None):
+    """
+    Split the tenant into at most `parts` [start, end) user_id ranges of
+    about equal user counts (None = unbounded). Two passes over the sorted
+    ids (count, then pick every n/parts-th), so constant memory.
+    """
+    storage = storage or get_storage()
+    total = sum(1 for _ in _user_ids(storage, None, None, batch_size))
+    if total == 0 or parts <= 1:
+        return [(None, None)]
+
+    step = total / parts
+    wanted = sorted({int(step * i) for i in range(1, parts)} - {0})
+    if not wanted:
+        return [(None, None)]
+    bounds = []
+    for i, user_id in enumerate(_user_ids(storage, None, None, batch_size)):
+        if i == wanted[len(bounds)]:
+            bounds.append(user_id)
+            if len(bounds) == len(wanted):
+                break
+    edges = [None] + bounds + [None]
+    return list(zip(edges, edges[1:]))
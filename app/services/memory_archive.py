@@ -0,0 +1,136 @@
+# app/services/memory_archive.py
+"""
+Cold tier of the memory system.
+
+The hot window (MEMORY_CAP memories) is what every turn reads. Memories it
+evicts are parked per user by the storage backend and, once
+archive_block_size of them have piled up, sealed into one archive block:
+    { user_id, block_no, count, first_ts, last_ts,
+      data: bytes }           # zlib-compressed JSON of the memories
+and added to the user's inverted term index:
+    { term: { df: how many archived memories contain it,
+              ids: [memory id, ...] } }   # block_no * ID_STRIDE + slot
+Terms found in more than MAX_POSTINGS memories keep only their df.
+
+Recall never scans the archive. It looks up the message's terms, keeps the
+RARE_TERMS with the smallest df, ranks the memories on their postings by
+how many of those terms they share, and decompresses only the blocks that
+hold the best archive_recall_candidates of them. Only those candidates are
+scored with the similarity vectors, so a recall costs the same with a
+thousand archived memories or a million.
+"""
+
+import json
+import re
+import zlib
+from collections import Counter
+from datetime import datetime
+
+from app.db.documents import ID_STRIDE
+from app.services.similarity import top_k_similar
+
+_TERM_RE = re.compile(r"[a-z0-9']{3,}")
+
+STOPWORDS = frozenset("""
+    the and for are but not you your yours all any can had her was one our out has him his
+    how its may new now see two way who did get got let say she too use that this with have
+    from they will would there their what about which when make like just than them been
+    into some could other then these only over also after more most very even well back
+    much where why here were because does doing done being really feel feeling felt today
+    i'm it's don't can't i've i'll im dont cant
+""".split())
+
+# words of the message used for the index lookup; longer ones first, as
+# they tend to be the rarer (more telling) ones
+QUERY_TERMS = 16
+
+# postings lists merged per recall, rarest first
+RARE_TERMS = 4
+
+
+def memory_terms(text: str):
+    """Distinct content words of a text (lowercased, no stopwords)."""
+    return {t for t in _TERM_RE.findall(text.lower()) if t not in STOPWORDS}
+
+
+def query_terms(text: str):
+    return sorted(memory_terms(text), key=lambda t: (-len(t), t))[:QUERY_TERMS]
+
+
+def build_block(memories: list):
+    """
+    Compressed block (minus user_id / block_no) for evicted memories, oldest
+    first, with its postings { term: [slot, ...] } for the term index.
+    """
+    postings = {}
+    for slot, memory in enumerate(memories):
+        for term in memory_terms(memory["text"]):
+            postings.setdefault(term, []).append(slot)
+
+    payload = [[m["text"], m["emotion"], m["timestamp"].isoformat()] for m in memories]
+
+    return {
+        "count": len(memories),
+        "first_ts": memories[0]["timestamp"],
+        "last_ts": memories[-1]["timestamp"],
+        "data": zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8")),
+        "postings": postings
+    }
+
+
+def decode_block(data: bytes):
+    """The memories of a block, oldest first."""
+    return [
+        {"text": text, "emotion": emotion, "timestamp": datetime.fromisoformat(timestamp)}
+        for text, emotion, timestamp in json.loads(zlib.decompress(data))
+    ]
+
+
+def recall(storage, user_id: str, text: str, k: int, max_candidates: int, max_blocks: int):
+    """
+    Up to k (memory, score) pairs from the user's archive, best first.
+    Scores the pending (not yet sealed) memories sharing a word with the
+    message plus at most `max_candidates` archived memories picked through
+    the term index, read from at most `max_blocks` blocks.
+    """
+    terms = query_terms(text)
+    if not terms:
+        return []
+
+    wanted = set(terms)
+    candidates = [m for m in storage.get_archive_pending(user_id) if memory_terms(m["text"]) & wanted]
+
+    chosen = archive_candidates(storage.get_archive_postings(user_id, terms), max_candidates, max_blocks)
+    if chosen:
+        for block in storage.get_archive_blocks(user_id, sorted(chosen)):
+            memories = decode_block(block["data"])
+            candidates.extend(memories[slot] for slot in chosen[block["block_no"]] if slot < len(memories))
+
+    return top_k_similar(candidates, text, k)
+
+
+def archive_candidates(postings: dict, max_candidates: int, max_blocks: int):
+    """
+    { block_no: [slot, ...] } of the archived memories worth scoring:
+    those on the rarest terms' postings, most shared terms (then newest)
+    first, at most max_candidates of them in at most max_blocks blocks.
+    """
+    rare = sorted((p for p in postings.values() if p["ids"]), key=lambda p: p["df"])[:RARE_TERMS]
+
+    hits = Counter()
+    for entry in rare:
+        hits.update(entry["ids"])
+
+    chosen = {}
+    taken = 0
+    for memory_id in sorted(hits, key=lambda i: (hits[i], i), reverse=True):
+        block_no, slot = divmod(memory_id, ID_STRIDE)
+        if block_no not in chosen:
+            if len(chosen) == max_blocks:
+                continue
+            chosen[block_no] = []
+        chosen[block_no].append(slot)
+        taken += 1
+        if taken == max_candidates:
+            break
+    return chosen
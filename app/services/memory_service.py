@@ -1,100 +1,283 @@
 # app/services/memory_service.py
 
-import difflib
+import logging
 from collections import defaultdict
-from pymongo import MongoClient
 from datetime import datetime
 
+from app.config import settings
+from app.db.executor import run_in_db_executor
+from app.db.storage import get_storage
+from app.metrics import cache_stats
+from app.services import memory_archive
+from app.services.cache import MISSING, LRUCache
+from app.services.similarity import encode_vector, text_vector, top_k_similar
+
+logger = logging.getLogger("ai_buddy")
+
 
 class MemoryService:
-    def __init__(self):
+    def __init__(self, storage=None):
         """
-        MongoDB-backed memory system.
-        Each memory is stored as:
+        Memory system on top of the configured storage backend (app.db.storage).
+        Each user has ONE capped window holding their recent memories:
             {
                 user_id: str,
-                text: str,
-                emotion: str,
-                timestamp: datetime
+                memories: [                # oldest → newest, at most MEMORY_CAP
+                    {text: str, emotion: str, timestamp: datetime,
+                     vector: bytes},   # similarity features, see similarity.py
+                    ...
+                ],
+                memory_count: int,                 # aggregates kept in step
+                emotion_counts: {emotion: int}     # with the window
             }
+        Writes push + trim + update the aggregates atomically, so adding a
+        memory is a single round trip no matter how long the history is.
+
+        That window is the hot tier. With archiving on, evicted memories go
+        to the cold tier instead of being deleted: compressed per-user
+        blocks behind an inverted term index (memory_archive.py), consulted
+        only when the window has no similar memory.
         """
 
-        # Connect to local MongoDB
-        self.client = MongoClient("mongodb://localhost:27017/")
-        self.db = self.client["ai_buddy"]
-        self.collection = self.db["memories"]
+        self._storage = storage
+
+        # personality summaries, refreshed from every write (write-through)
+        self.summary_cache = LRUCache()
 
-        # Index recommended (faster lookups)
-        self.collection.create_index("user_id")
+    @property
+    def storage(self):
+        # resolved on first use so importing never opens a connection
+        if self._storage is None:
+            self._storage = get_storage()
+        return self._storage
 
     # ----------------------------------------------------
     # ADD MEMORY
     # ----------------------------------------------------
     def add_memory(self, user_id: str, text: str, emotion: str):
-        """Store message + emotion for a user in MongoDB."""
+        """
+        Store message + emotion, keeping only the last MEMORY_CAP memories.
+        Returns the stored memory so callers can update their snapshot.
+        """
+
+        memory = new_memory(text, emotion)
 
-        self.collection.insert_one({
-            "user_id": user_id,
-            "text": text,
-            "emotion": emotion,
-            "timestamp": datetime.utcnow()
-        })
+        # push + trim + aggregates in one atomic write; the new aggregates
+        # come back with it and refresh the summary cache
+        counts = self.storage.append_memories(user_id, [memory])
+        self.summary_cache.set(user_id, summarize_counts(counts["emotion_counts"], counts["memory_count"]))
 
-        # Keep only last 20 memories
-        all_memories = list(self.collection.find({"user_id": user_id}).sort("timestamp", -1))
+        # one turn in archive_block_size also seals a block
+        if counts.get("archive_pending", 0) >= settings.archive_block_size:
+            self.seal_archive([user_id])
 
-        if len(all_memories) > 20:
-            # delete extras
-            ids_to_delete = [m["_id"] for m in all_memories[20:]]
-            self.collection.delete_many({"_id": {"$in": ids_to_delete}})
+        return memory
+
+    def add_memories_bulk(self, memories_by_user: dict):
+        """
+        Store already-built memories for many users in one batched write
+        (one capped append per user).
+        memories_by_user: { user_id: [memory, ...] } in message order.
+        Returns { user_id: error message } for users whose write failed.
+        """
+        failed = self.storage.append_memories_many(memories_by_user)
+
+        # bulk writes don't return documents → drop stale summaries
+        for user_id in memories_by_user:
+            self.summary_cache.invalidate(user_id)
+
+        if settings.archive_enabled:
+            self.seal_archive([u for u in memories_by_user if u not in failed])
+
+        return failed
+
+    def seal_archive(self, user_ids: list):
+        """
+        Seal full blocks of evicted memories for these users; returns how many.
+        Never raises: the memories themselves are already stored, and
+        whatever is left pending gets sealed by the next write.
+        """
+        if not user_ids:
+            return 0
+        try:
+            return self.storage.seal_archive_blocks(
+                user_ids, settings.archive_block_size, memory_archive.build_block
+            )
+        except Exception as e:
+            logger.warning("sealing archive blocks failed: %s", e)
+            return 0
+
+    # ----------------------------------------------------
+    # GET MEMORIES
+    # ----------------------------------------------------
+    def get_memories(self, user_id: str):
+        """Return the user's memories, oldest first."""
+        return self.storage.get_memories(user_id)
+
+    def get_memories_many(self, user_ids: list):
+        """{ user_id: memories } for several users in one query."""
+        return self.storage.get_memories_many(user_ids)
+
+    def get_memory_window(self, user_id: str):
+        """The user's memories plus their archive_pending / archive_blocks counts, in one read."""
+        return self.storage.get_memory_window(user_id)
+
+    def get_memory_windows(self, user_ids: list):
+        """{ user_id: memory window } for several users in one query."""
+        return self.storage.get_memory_windows(user_ids)
 
     # ----------------------------------------------------
     # FIND SIMILAR MEMORY
     # ----------------------------------------------------
     def find_similar_memory(self, user_id: str, new_text: str):
-        """Return the most similar previous message from MongoDB."""
-        memories = list(self.collection.find({"user_id": user_id}))
-
-        if not memories:
-            return None
+        """
+        Return the most similar previous message from storage: the hot
+        window first, the archive only when the window has no match.
+        """
+        window = self.get_memory_window(user_id)
+        similar = find_similar_in(window["memories"], new_text)
+        if similar is None and has_archive(window):
+            similar = self.find_archived_memory(user_id, new_text)
+        return similar
 
-        best_match = None
-        best_score = 0
+    def find_similar_memories(self, user_id: str, new_text: str, k: int = 3):
+        """Return up to k (memory, score) pairs above the threshold, best first, from both tiers."""
+        window = self.get_memory_window(user_id)
+        matches = top_k_similar(window["memories"], new_text, k)
+        if len(matches) < k and has_archive(window):
+            matches += self.find_archived_memories(user_id, new_text, k - len(matches))
+        return matches
 
-        for mem in memories:
-            score = difflib.SequenceMatcher(None, new_text, mem["text"]).ratio()
-            if score > best_score:
-                best_score = score
-                best_match = mem
+    # ----------------------------------------------------
+    # ARCHIVE RECALL
+    # ----------------------------------------------------
+    def find_archived_memory(self, user_id: str, new_text: str):
+        """Most similar memory from the cold tier, or None."""
+        matches = self.find_archived_memories(user_id, new_text, k=1)
+        return matches[0][0] if matches else None
 
-        return best_match if best_score > 0.6 else None
+    def find_archived_memories(self, user_id: str, new_text: str, k: int = 3):
+        """Up to k (memory, score) pairs from the cold tier, best first."""
+        if not settings.archive_enabled:
+            return []
+        return memory_archive.recall(
+            self.storage, user_id, new_text, k,
+            settings.archive_recall_candidates, settings.archive_recall_blocks
+        )
 
     # ----------------------------------------------------
     # SUMMARIZE PERSONALITY
     # ----------------------------------------------------
     def summarize_personality(self, user_id: str):
-        """Analyze MongoDB memory to determine emotional tendencies."""
-        memories = list(self.collection.find({"user_id": user_id}))
+        """
+        Dominant emotion + memory count, read from the aggregates that every
+        write maintains (one small single-document read, cached).
+        """
+        cached = self.summary_cache.get(user_id)
+        if cached is not MISSING:
+            return dict(cached)
 
-        if not memories:
-            return {
-                "dominant_emotion": "unknown",
-                "memory_count": 0
-            }
+        summary = self._load_summary(user_id)
+        self.summary_cache.set(user_id, summary)
+        return dict(summary)
+
+    def _load_summary(self, user_id: str):
+        doc = self.storage.get_memory_counts(user_id)
+
+        if doc and "memory_count" not in doc:
+            # written before aggregates existed; `python -m
+            # app.scripts.rebuild_emotion_counts` backfills these
+            return summarize_memories(self.get_memories(user_id))
+
+        if not doc:
+            return summarize_counts({}, 0)
+        return summarize_counts(doc.get("emotion_counts", {}), doc["memory_count"])
+
+
+# ----------------------------------------------------
+# PURE HELPERS (work on already-loaded memories)
+# ----------------------------------------------------
+def new_memory(text: str, emotion: str):
+    """Build the stored form of a memory (with its similarity vector)."""
+    return {
+        "text": text,
+        "emotion": emotion,
+        "timestamp": datetime.utcnow(),
+        "vector": encode_vector(text_vector(text))
+    }
+
+
+def has_archive(window: dict):
+    """Whether archive recall can find anything for this window (else it is skipped)."""
+    return settings.archive_enabled and (window["archive_pending"] > 0 or window["archive_blocks"] > 0)
+
+
+def find_similar_in(memories: list, new_text: str):
+    """Return the memory most similar to `new_text`, or None below threshold."""
+    matches = top_k_similar(memories, new_text, k=1)
+    return matches[0][0] if matches else None
+
+
+def summarize_memories(memories: list):
+    """Dominant emotion + memory count for a list of memories."""
+    # Count emotional frequencies
+    emotion_count = defaultdict(int)
 
-        # Count emotional frequencies
-        emotion_count = defaultdict(int)
+    for m in memories:
+        emotion_count[m["emotion"]] += 1
 
-        for m in memories:
-            emotion_count[m["emotion"]] += 1
+    return summarize_counts(emotion_count, len(memories))
 
-        dominant = max(emotion_count, key=emotion_count.get)
 
+def summarize_counts(emotion_counts: dict, memory_count: int):
+    """Dominant emotion + memory count from precomputed emotion counters."""
+    if not memory_count or not emotion_counts:
         return {
-            "dominant_emotion": dominant,
-            "memory_count": len(memories)
+            "dominant_emotion": "unknown",
+            "memory_count": 0
         }
 
+    dominant = max(emotion_counts, key=emotion_counts.get)
 
-# global instance
+    return {
+        "dominant_emotion": dominant,
+        "memory_count": memory_count
+    }
+
+
+class AsyncMemoryService:
+    """
+    Async facade over MemoryService.
+    Every call runs on the bounded DB executor so the event loop stays free.
+    """
+
+    def __init__(self, service: MemoryService):
+        self.service = service
+
+    async def add_memory(self, user_id: str, text: str, emotion: str):
+        return await run_in_db_executor(self.service.add_memory, user_id, text, emotion)
+
+    async def get_memories(self, user_id: str):
+        return await run_in_db_executor(self.service.get_memories, user_id)
+
+    async def get_memory_window(self, user_id: str):
+        return await run_in_db_executor(self.service.get_memory_window, user_id)
+
+    async def find_similar_memory(self, user_id: str, new_text: str):
+        return await run_in_db_executor(self.service.find_similar_memory, user_id, new_text)
+
+    async def find_similar_memories(self, user_id: str, new_text: str, k: int = 3):
+        return await run_in_db_executor(self.service.find_similar_memories, user_id, new_text, k)
+
+    async def find_archived_memory(self, user_id: str, new_text: str):
+        return await run_in_db_executor(self.service.find_archived_memory, user_id, new_text)
+
+    async def summarize_personality(self, user_id: str):
+        return await run_in_db_executor(self.service.summarize_personality, user_id)
+
+
+# global instances
 memory_service = MemoryService()
+async_memory_service = AsyncMemoryService(memory_service)
+
+cache_stats.register("summary", memory_service.summary_cache.stats)
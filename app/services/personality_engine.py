@@ -2,45 +2,29 @@
 """
 Advanced Personality Engine (APE) - per-user adaptive personality model.
 
-- Stores a personality profile per user_id (in-memory for now).
+- Stores a compact personality profile per user_id in an LRU-bounded cache
+  backed by persistent storage (see profile_store.py).
 - Extracts textual style features from each message.
 - Updates sliders and signature features.
 - Exposes functions to get a user's current personality settings
   and to sample stylistic choices for reply generation.
 """
 
-from collections import defaultdict, Counter
-import re
-
-# In-memory store: { user_id: profile_dict }
-_user_profiles = defaultdict(lambda: {
-    # Core sliders (0-10)
-    "playful": 7,
-    "supportive": 8,
-    "sarcastic": 4,
-    "energy": 7,
-    "formality": 2,
-    "emoji_usage": 6,
-    # Derived stats
-    "slang_level": 5,
-    "avg_msg_len": 0.0,
-    "msg_count": 0,
-    "emoji_pref": Counter(),
-    "signature_phrases": Counter(),
-    # meta
-    "last_updated": None
-})
+import time
 
-SLANG_TOKENS = {"bruh","idk","lol","lmao","ngl","omg","wtf","bro","vibe","lowkey","mood"}
-EMOJI_RE = re.compile(r'[\U0001F300-\U0001F6FF\U0001F900-\U0001F9FF\u2600-\u27BF]+', flags=re.UNICODE)
+from app.metrics import cache_stats
+from app.services.profile_store import PersonalityProfile, ProfileStore
+from app.services.text_features import extract_features
+from app.services.user_locks import KeyedLock
+
+# Bounded cache of PersonalityProfile objects in front of the storage backend
+profile_store = ProfileStore()
+cache_stats.register("profile", profile_store.stats)
 
-def _extract_emojis(text: str):
-    return EMOJI_RE.findall(text)
+# Profiles are updated read-modify-write; one writer per user at a time
+profile_locks = KeyedLock("profile")
 
-def _extract_tokens(text: str):
-    # simple tokens split, keep contractions
-    tokens = re.findall(r"[a-zA-Z']+", text.lower())
-    return tokens
+SLANG_TOKENS = {"bruh","idk","lol","lmao","ngl","omg","wtf","bro","vibe","lowkey","mood"}
 
 def analyze_style_from_text(user_id: int, text: str):
     """
@@ -50,18 +34,19 @@ def analyze_style_from_text(user_id: int, text: str):
     - length
     - signature phrase candidates
     """
-    profile = _user_profiles[user_id]
+    # one pass of the shared extractor (same emoji definition as StyleService)
+    features = extract_features(text)
 
-    tokens = _extract_tokens(text)
+    tokens = features["tokens"]
     token_set = set(tokens)
     slang_hits = sum(1 for t in token_set if t in SLANG_TOKENS)
     slang_score = min(10, int((slang_hits / (len(token_set)+1)) * 20))  # scaled 0-10
 
-    emojis = _extract_emojis(text)
+    emojis = features["emoji_runs"]
     msg_len = len(text.strip())
 
     # find candidate signature phrases (2-3 word phrases with apostrophes/slang)
-    phrases = re.findall(r"\b(?:[a-zA-Z']+\s){0,2}[a-zA-Z']+\b", text.lower())
+    phrases = features["phrases"]
     sig_candidates = [p for p in phrases if any(tok in SLANG_TOKENS for tok in p.split())][:3]
 
     return {
@@ -76,60 +61,82 @@ def update_profile_with_message(user_id: int, text: str):
     Update the user's personality profile based on a single message.
     This updates averages, slang level, emoji prefs, and signature phrases.
     """
-    profile = _user_profiles[user_id]
     stats = analyze_style_from_text(user_id, text)
 
+    with profile_locks.hold(user_id):
+        profile = profile_store.get_or_create(user_id)
+        _apply_message(profile, stats)
+        view = profile.to_dict()
+
+    # queue the write-back (may flush, so outside the user's lock)
+    profile_store.mark_dirty(user_id)
+    return view
+
+def update_profile_with_messages(user_id: int, texts: list):
+    """
+    Same as update_profile_with_message for several messages of one user,
+    in order, under one lock hold and with one write-back queued (bulk
+    imports, see app/scripts/replay.py). Returns nothing.
+    """
+    stats = [analyze_style_from_text(user_id, text) for text in texts]
+
+    with profile_locks.hold(user_id):
+        profile = profile_store.get_or_create(user_id)
+        for message_stats in stats:
+            _apply_message(profile, message_stats)
+
+    profile_store.mark_dirty(user_id)
+
+def _apply_message(profile: PersonalityProfile, stats: dict):
+    """Fold one message's style stats into the profile (caller holds the user's lock)."""
     # update message count & avg length (running average)
-    mc = profile["msg_count"]
-    prev_avg = profile["avg_msg_len"]
-    profile["msg_count"] = mc + 1
-    profile["avg_msg_len"] = (prev_avg * mc + stats["msg_len"]) / (mc + 1)
+    mc = profile.msg_count
+    prev_avg = profile.avg_msg_len
+    profile.msg_count = mc + 1
+    profile.avg_msg_len = (prev_avg * mc + stats["msg_len"]) / (mc + 1)
 
     # update slang_level gradually (decay + add)
     # new_slang = weighted avg between old and detected
-    profile["slang_level"] = int((profile["slang_level"] * mc + stats["slang_score"]) / (mc + 1))
+    profile.set("slang_level", int((profile.get("slang_level") * mc + stats["slang_score"]) / (mc + 1)))
 
     # update emoji usage slider (increase if user uses emojis often)
     if stats["emojis"]:
-        profile["emoji_usage"] = min(10, profile["emoji_usage"] + 0.5)
+        profile.set("emoji_usage", min(10, profile.get("emoji_usage") + 0.5))
         for e in stats["emojis"]:
-            profile["emoji_pref"][e] += 1
+            profile.emoji_pref.add(e)
     else:
         # small decay if user rarely uses emojis
-        profile["emoji_usage"] = max(0, profile["emoji_usage"] - 0.02)
+        profile.set("emoji_usage", max(0, profile.get("emoji_usage") - 0.02))
 
     # update signature phrases
     for sc in stats["sig_candidates"]:
-        profile["signature_phrases"][sc] += 1
+        profile.signature_phrases.add(sc)
 
     # subtle adjustments to playful/supportive/sarcastic sliders based on cues
     # (these heuristics are simple; we can refine later)
     if stats["slang_score"] >= 4:
-        profile["playful"] = min(10, profile["playful"] + 0.2)
+        profile.set("playful", min(10, profile.get("playful") + 0.2))
     else:
-        profile["playful"] = max(0, profile["playful"] - 0.02)
+        profile.set("playful", max(0, profile.get("playful") - 0.02))
 
     # longer messages trend to more supportive / reflective replies
     if stats["msg_len"] > 120:
-        profile["supportive"] = min(10, profile["supportive"] + 0.3)
-        profile["formality"] = min(10, profile["formality"] + 0.1)
+        profile.set("supportive", min(10, profile.get("supportive") + 0.3))
+        profile.set("formality", min(10, profile.get("formality") + 0.1))
     else:
-        profile["supportive"] = max(0, profile["supportive"] - 0.01)
+        profile.set("supportive", max(0, profile.get("supportive") - 0.01))
 
     # update last_updated
-    import datetime
-    profile["last_updated"] = datetime.datetime.utcnow().isoformat()
-
-    # write back
-    _user_profiles[user_id] = profile
-    return profile
+    profile.last_updated = time.time()
 
 def get_profile(user_id: int):
-    """Return a copy of the user's profile (do not expose counters directly)."""
-    p = _user_profiles[user_id].copy()
-    p["emoji_pref"] = dict(p["emoji_pref"].most_common(3))
-    p["signature_phrases"] = dict(p["signature_phrases"].most_common(5))
-    return p
+    """
+    Return a copy of the user's profile (do not expose counters directly).
+    Unknown users get the default profile without one being stored.
+    """
+    with profile_locks.hold(user_id):
+        p = profile_store.peek(user_id) or PersonalityProfile()
+        return p.to_dict()
 
 def sample_reply_style(user_id: int):
     """
@@ -138,21 +145,22 @@ def sample_reply_style(user_id: int):
     - slang level to mimic
     - rough tone adjustments (playful/supportive/sarcastic)
     """
-    p = _user_profiles[user_id]
-    # decide emoji usage probabilistically based on slider
-    use_emoji = p["emoji_usage"] >= 6
-    preferred_emojis = [e for e, _ in p["emoji_pref"].most_common(2)]
+    with profile_locks.hold(user_id):
+        p = profile_store.peek(user_id) or PersonalityProfile()
+        # decide emoji usage probabilistically based on slider
+        use_emoji = p.get("emoji_usage") >= 6
+        preferred_emojis = [e for e, _ in p.emoji_pref.most_common(2)]
 
     # determine slang mimic level (0-10)
-    slang_level = p["slang_level"]
+    slang_level = int(p.get("slang_level"))
 
     # derive tone multipliers
     tone = {
-        "playful": p["playful"],
-        "supportive": p["supportive"],
-        "sarcastic": p["sarcastic"],
-        "energy": p["energy"],
-        "formality": p["formality"]
+        "playful": p.get("playful"),
+        "supportive": p.get("supportive"),
+        "sarcastic": p.get("sarcastic"),
+        "energy": p.get("energy"),
+        "formality": p.get("formality")
     }
 
     return {
@@ -164,5 +172,6 @@ def sample_reply_style(user_id: int):
 
 # Small helper to manually create or reset a profile (for testing)
 def reset_profile(user_id: int):
-    _user_profiles[user_id] = _user_profiles.default_factory()
+    with profile_locks.hold(user_id):
+        profile_store.replace(user_id, PersonalityProfile())
     return get_profile(user_id)
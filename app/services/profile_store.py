@@ -0,0 +1,523 @@
+# app/services/profile_store.py
+"""
+Compact, bounded, persistent storage for personality profiles.
+
+- PersonalityProfile: __slots__ object; the sliders and numeric counters
+  live in one row of float64 values instead of a dict of boxed floats.
+  A cached profile's row is a view into the columnar SliderStore
+  (slider_store.py), so per-message updates write straight into the
+  columns that bulk decay and population statistics work on.
+- TopKCounter: emoji / signature-phrase counts capped at a fixed number of
+  entries (space-saving algorithm), so a chatty user can't grow them forever.
+- ProfileStore: LRU-bounded in-process cache in front of the storage
+  backend. Profiles are loaded on first use and written back in batches
+  (after `flush_users` dirty profiles or `flush_interval` seconds, on
+  eviction, and on shutdown). Rows stay in the SliderStore after their
+  profile is evicted (88 bytes per user seen), and are snapshotted to
+  disk on shutdown when a snapshot path is open.
+
+Rows carry `changed_at` (last message or decay): when a profile doc is
+loaded for a user who already has a row (e.g. from the snapshot), the
+newer of the two wins, so a stale snapshot never overrides later writes.
+
+Several workers each cache their own copy; the last write-back wins.
+"""
+
+import heapq
+import math
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from operator import itemgetter
+
+import numpy as np
+
+from app.config import settings
+from app.db.storage import get_storage
+from app.services.slider_store import SliderStore
+
+# Slider order inside PersonalityProfile.sliders, with their starting values
+SLIDERS = ("playful", "supportive", "sarcastic", "energy", "formality", "emoji_usage", "slang_level")
+DEFAULT_SLIDERS = (7, 8, 4, 7, 2, 6, 5)
+SLIDER_INDEX = {name: i for i, name in enumerate(SLIDERS)}
+
+# A profile's numeric row: the sliders, then these counters (NaN = None)
+FIELDS = SLIDERS + ("avg_msg_len", "msg_count", "last_updated", "changed_at")
+DEFAULT_VALUES = DEFAULT_SLIDERS + (0.0, 0.0, math.nan, math.nan)
+AVG_MSG_LEN, MSG_COUNT, LAST_UPDATED, CHANGED_AT = range(len(SLIDERS), len(FIELDS))
+
+# Entries kept per capped counter; a few times the number ever reported
+# (top 3 emojis, top 5 phrases) so the reported ranking stays accurate
+EMOJI_SLOTS = 12
+PHRASE_SLOTS = 20
+
+
+class TopKCounter:
+    """
+    Counter capped at `capacity` entries (space-saving algorithm).
+    When full, a new item replaces the least counted one and inherits its
+    count, so any item seen more than total/capacity times is never lost.
+    """
+
+    __slots__ = ("capacity", "counts")
+
+    def __init__(self, capacity: int, counts=None):
+        self.capacity = capacity
+        self.counts = dict(counts or ())
+
+    def add(self, item, amount: int = 1):
+        counts = self.counts
+        if item in counts:
+            counts[item] += amount
+        elif len(counts) < self.capacity:
+            counts[item] = amount
+        else:
+            victim = min(counts, key=counts.get)
+            counts[item] = counts.pop(victim) + amount
+
+    def most_common(self, n: int):
+        return heapq.nlargest(n, self.counts.items(), key=itemgetter(1))
+
+    def __len__(self):
+        return len(self.counts)
+
+
+class PersonalityProfile:
+
+    # values: array("d") of FIELDS until the profile is cached, then a view
+    # of its SliderStore row
+    __slots__ = ("values", "emoji_pref", "signature_phrases")
+
+    def __init__(self):
+        self.values = array("d", DEFAULT_VALUES)
+        self.emoji_pref = TopKCounter(EMOJI_SLOTS)
+        self.signature_phrases = TopKCounter(PHRASE_SLOTS)
+
+    def get(self, slider: str):
+        return float(self.values[SLIDER_INDEX[slider]])
+
+    def set(self, slider: str, value: float):
+        self.values[SLIDER_INDEX[slider]] = value
+
+    @property
+    def sliders(self):
+        return self.values[:len(SLIDERS)].tolist()
+
+    @property
+    def avg_msg_len(self):
+        return float(self.values[AVG_MSG_LEN])
+
+    @avg_msg_len.setter
+    def avg_msg_len(self, value: float):
+        self.values[AVG_MSG_LEN] = value
+
+    @property
+    def msg_count(self):
+        return int(self.values[MSG_COUNT])
+
+    @msg_count.setter
+    def msg_count(self, value: int):
+        self.values[MSG_COUNT] = value
+
+    @property
+    def last_updated(self):
+        """Epoch seconds of the last message, or None."""
+        return _optional(self.values[LAST_UPDATED])
+
+    @last_updated.setter
+    def last_updated(self, value: float):
+        # a message changes the row, so it is also the newest version
+        self.values[LAST_UPDATED] = self.values[CHANGED_AT] = math.nan if value is None else value
+
+    @property
+    def changed_at(self):
+        return _optional(self.values[CHANGED_AT])
+
+    # ---------------------------
+    # Views / (de)serialization
+    # ---------------------------
+    def to_dict(self):
+        """The public profile shape (same keys as the old dict profiles)."""
+        profile = dict(zip(SLIDERS, self.sliders))
+        last_updated = self.last_updated
+        profile["slang_level"] = int(profile["slang_level"])
+        profile.update({
+            "avg_msg_len": self.avg_msg_len,
+            "msg_count": self.msg_count,
+            "emoji_pref": dict(self.emoji_pref.most_common(3)),
+            "signature_phrases": dict(self.signature_phrases.most_common(5)),
+            "last_updated": (
+                datetime.utcfromtimestamp(last_updated).isoformat()
+                if last_updated is not None else None
+            )
+        })
+        return profile
+
+    def to_doc(self):
+        """
+        Stored form; counters become [item, count] pairs (keys may hold '.'
+        or '$'). Safe to call while another thread updates the profile: the
+        counters are copied in one step, and the update marks the profile
+        dirty again afterwards, so a torn snapshot is always rewritten.
+        """
+        return {
+            "sliders": dict(zip(SLIDERS, self.sliders)),
+            "avg_msg_len": self.avg_msg_len,
+            "msg_count": self.msg_count,
+            "emoji_pref": [list(kv) for kv in list(self.emoji_pref.counts.items())],
+            "signature_phrases": [list(kv) for kv in list(self.signature_phrases.counts.items())],
+            "last_updated": self.last_updated,
+            "changed_at": self.changed_at
+        }
+
+    @classmethod
+    def from_doc(cls, doc: dict):
+        profile = cls()
+        sliders = doc.get("sliders", {})
+        last_updated = doc.get("last_updated")
+        # docs written before changed_at existed: their last message is their last change
+        changed_at = doc.get("changed_at", last_updated)
+        profile.values = array("d", [sliders.get(name, default) for name, default in zip(SLIDERS, DEFAULT_SLIDERS)] + [
+            doc.get("avg_msg_len", 0.0),
+            doc.get("msg_count", 0),
+            math.nan if last_updated is None else last_updated,
+            math.nan if changed_at is None else changed_at,
+        ])
+        profile.emoji_pref = TopKCounter(EMOJI_SLOTS, doc.get("emoji_pref"))
+        profile.signature_phrases = TopKCounter(PHRASE_SLOTS, doc.get("signature_phrases"))
+        return profile
+
+
+def _optional(value: float):
+    return None if math.isnan(value) else float(value)
+
+
+class ProfileStore:
+
+    def __init__(self, max_users: int = None, flush_users: int = None, flush_interval: float = None, storage=None):
+        self.max_users = settings.profile_cache_users if max_users is None else max_users
+        self.flush_users = settings.profile_flush_users if flush_users is None else flush_users
+        self.flush_interval = settings.profile_flush_interval if flush_interval is None else flush_interval
+        self._storage = storage
+
+        # numeric state of every profile seen, cached or not (see slider_store.py)
+        self.columns = SliderStore(DEFAULT_VALUES)
+        self.snapshot_path = None        # set by open_snapshot(); saved to on close()
+
+        self._profiles = OrderedDict()   # user_id → PersonalityProfile, LRU order
+        self._dirty = set()              # user_ids changed since their last write-back
+        self._writing = {}               # user_id → profile evicted, write-back in flight
+        self._deferring = 0              # > 0 inside deferred_evictions()
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+        # metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.write_backs = 0
+        self.failed_writes = 0
+
+    @property
+    def storage(self):
+        # resolved on first use so importing never opens a connection
+        if self._storage is None:
+            self._storage = get_storage()
+        return self._storage
+
+    # ---------------------------
+    # Reads
+    # ---------------------------
+    def peek(self, user_id):
+        """The user's profile, or None if they have none (nothing is created)."""
+        with self._lock:
+            profile = self._cached(user_id)
+        if profile is not None:
+            return profile
+        return self._load(user_id)
+
+    def get_or_create(self, user_id):
+        """The user's profile, creating a default one on first use."""
+        with self._lock:
+            profile = self._cached(user_id)
+        if profile is not None:
+            return profile
+        return self._load(user_id) or self._insert(user_id, PersonalityProfile())
+
+    # ---------------------------
+    # Writes
+    # ---------------------------
+    def mark_dirty(self, user_id):
+        """Record that a cached profile changed; may trigger a write-back."""
+        with self._lock:
+            self._dirty.add(user_id)
+            due = (
+                len(self._dirty) >= self.flush_users
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if due:
+            self.flush()
+
+    def replace(self, user_id, profile: PersonalityProfile):
+        with self._lock:
+            self._attach(user_id, profile, overwrite=True)
+            self._profiles[user_id] = profile
+            self._profiles.move_to_end(user_id)
+            self._dirty.add(user_id)
+        evicted = self._evict()
+        if evicted:
+            self._write_back(evicted)
+
+    @contextmanager
+    def deferred_evictions(self):
+        """
+        Inside the block the cache may grow past max_users, so nothing is
+        written back on eviction: the block's changes reach storage only
+        through flush() (bulk replays commit a batch's profiles at once).
+        On a normal exit the cache is trimmed back to the cap.
+        """
+        with self._lock:
+            self._deferring += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._deferring -= 1
+        evicted = self._evict()
+        if evicted:
+            self._write_back(evicted)
+
+    def flush(self):
+        """Write every dirty cached profile back; returns the number written."""
+        with self._lock:
+            docs = {u: self._profiles[u].to_doc() for u in self._dirty if u in self._profiles}
+            self._dirty.clear()
+            self._last_flush = time.monotonic()
+        return self._save(docs)
+
+    def close(self):
+        self.flush()
+        self.save_snapshot()
+
+    # ---------------------------
+    # Whole population (vectorized over the columns)
+    # ---------------------------
+    def decay(self, rate: float, idle_for: float = 0.0, now: float = None, write_back: bool = True,
+              batch_size: int = 1000):
+        """
+        Move the sliders of every user idle for at least `idle_for` seconds
+        a `rate` fraction of the way back to the defaults (the nightly drift
+        toward neutral). Cached or not, all users are updated in place and,
+        with `write_back`, stored `batch_size` at a time; returns how many
+        were. A message applied meanwhile may lose its slider change to the
+        decay, or the reverse.
+        """
+        now = time.time() if now is None else now
+        defaults = np.array(DEFAULT_SLIDERS, dtype=np.float64)
+        sliders = slice(0, len(SLIDERS))
+        decayed = []                     # dense ids
+        offset = 0
+        for block in self.columns.blocks():
+            # NaN (no message yet) compares False, so counts as idle
+            idle = ~(now - block[:, LAST_UPDATED] < idle_for)
+            block[idle, sliders] = defaults + (block[idle, sliders] - defaults) * (1.0 - rate)
+            block[idle, CHANGED_AT] = now
+            decayed.append(np.flatnonzero(idle) + offset)
+            offset += len(block)
+
+        decayed = np.concatenate(decayed) if decayed else np.empty(0, dtype=np.int64)
+        if write_back and len(decayed):
+            users = self.columns.users()
+            for start in range(0, len(decayed), batch_size):
+                self._write_decayed([users[i] for i in decayed[start:start + batch_size].tolist()])
+            self.flush()
+        return len(decayed)
+
+    def _write_decayed(self, user_ids: list):
+        """
+        Store decayed rows: cached profiles are marked dirty (the caller
+        flushes); the others are read, take their row and are saved here.
+        """
+        with self._lock:
+            cached = {u for u in user_ids if u in self._profiles}
+            self._dirty.update(cached)
+            writing = {u: self._writing[u] for u in user_ids if u in self._writing and u not in cached}
+
+        docs = {u: p.to_doc() for u, p in writing.items()}
+        stored = [u for u in user_ids if u not in cached and u not in writing]
+        if stored:
+            for user_id, doc in self.storage.get_profile_docs(stored).items():
+                profile = PersonalityProfile.from_doc(doc) if doc else PersonalityProfile()
+                profile.values = array("d", self.columns.find(user_id))   # the decayed row is newest
+                docs[user_id] = profile.to_doc()
+        self._save(docs)
+
+    def population_stats(self):
+        """Per-slider mean / std / p10 / p50 / p90 over every user seen, plus totals."""
+        sliders = self.columns.column(slice(0, len(SLIDERS)))
+        if not len(sliders):
+            return {"users": 0, "messages": 0, "sliders": {}}
+        mean = sliders.mean(axis=0)
+        std = sliders.std(axis=0)
+        p10, p50, p90 = np.percentile(sliders, [10, 50, 90], axis=0)
+        return {
+            "users": len(sliders),
+            "messages": int(self.columns.column(MSG_COUNT).sum()),
+            "sliders": {
+                name: {
+                    "mean": float(mean[i]), "std": float(std[i]),
+                    "p10": float(p10[i]), "p50": float(p50[i]), "p90": float(p90[i])
+                }
+                for i, name in enumerate(SLIDERS)
+            }
+        }
+
+    # ---------------------------
+    # Snapshots
+    # ---------------------------
+    def open_snapshot(self, path: str):
+        """
+        Memory-map the columns saved at `path` (if any) and save back there
+        on close(); call before the first profile is used. Returns the rows
+        loaded.
+        """
+        self.snapshot_path = path
+        return self.columns.load(path)
+
+    def save_snapshot(self):
+        """Write the columns to the open snapshot path; returns the rows written."""
+        if not self.snapshot_path:
+            return 0
+        return self.columns.save(self.snapshot_path)
+
+    # ---------------------------
+    # Metrics
+    # ---------------------------
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._profiles),
+                "max_users": self.max_users,
+                "dirty": len(self._dirty),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "write_backs": self.write_backs,
+                "failed_writes": self.failed_writes,
+                "rows": len(self.columns),
+            }
+
+    def __len__(self):
+        return len(self._profiles)
+
+    # ---------------------------
+    # Internals
+    # ---------------------------
+    def _cached(self, user_id):
+        # caller holds the lock
+        profile = self._profiles.get(user_id)
+        if profile is not None:
+            self._profiles.move_to_end(user_id)
+            self.hits += 1
+            return profile
+        # evicted a moment ago and not written back yet: still the newest copy
+        profile = self._writing.get(user_id)
+        if profile is not None:
+            self.misses += 1
+            self._profiles[user_id] = profile
+            return profile
+        self.misses += 1
+        return None
+
+    def _load(self, user_id):
+        doc = self.storage.get_profile_docs([user_id])[user_id]
+        if doc is None:
+            # no doc (yet) but a row, e.g. from the snapshot: sliders only
+            return self._insert(user_id, PersonalityProfile()) if user_id in self.columns else None
+        return self._insert(user_id, PersonalityProfile.from_doc(doc))
+
+    def _insert(self, user_id, profile: PersonalityProfile):
+        with self._lock:
+            # another request may have loaded it meanwhile — keep that one
+            cached = self._profiles.setdefault(user_id, profile)
+            if cached is profile:
+                self._attach(user_id, profile)
+            profile = cached
+            self._profiles.move_to_end(user_id)
+        evicted = self._evict()
+        if evicted:
+            self._write_back(evicted)
+        return profile
+
+    def _attach(self, user_id, profile: PersonalityProfile, overwrite: bool = False):
+        """
+        Point the profile's values at the user's row (caller holds the lock).
+        The row keeps its values unless the profile's are newer (changed_at;
+        NaN is oldest) or `overwrite` is set.
+        """
+        row = self.columns.find(user_id)
+        if row is None:
+            row = self.columns.row(user_id)
+            overwrite = True
+        elif not overwrite:
+            theirs = profile.values[CHANGED_AT]
+            overwrite = not math.isnan(theirs) and not theirs <= row[CHANGED_AT]
+        if overwrite:
+            row[:] = profile.values
+        profile.values = row
+
+    def _evict(self):
+        """Drop least recently used profiles over the cap; returns the dirty ones."""
+        evicted = {}
+        with self._lock:
+            while len(self._profiles) > self.max_users and not self._deferring:
+                user_id, profile = self._profiles.popitem(last=False)
+                self.evictions += 1
+                if user_id in self._dirty:
+                    self._dirty.discard(user_id)
+                    evicted[user_id] = profile
+            self._writing.update(evicted)
+        return evicted
+
+    def _write_back(self, evicted: dict):
+        try:
+            self._save({u: p.to_doc() for u, p in evicted.items()}, evicted)
+        finally:
+            with self._lock:
+                for user_id in evicted:
+                    self._writing.pop(user_id, None)
+
+    def _save(self, docs: dict, evicted: dict = None):
+        if not docs:
+            return 0
+        try:
+            failed = self.storage.save_profile_docs(docs)
+        except Exception:
+            self._keep_dirty(docs, evicted)
+            raise
+        self._keep_dirty(failed, evicted)
+        with self._lock:
+            self.write_backs += len(docs) - len(failed)
+        return len(docs) - len(failed)
+
+    def _keep_dirty(self, user_ids, evicted: dict = None):
+        """
+        Failed profiles stay dirty so the next flush retries them; evicted
+        ones go back into the cache first (least recently used, so they
+        are the next to be evicted and written again).
+        """
+        if not user_ids:
+            return
+        with self._lock:
+            self.failed_writes += len(user_ids)
+            for user_id in user_ids:
+                if evicted and user_id in evicted and user_id not in self._profiles:
+                    self._profiles[user_id] = evicted[user_id]
+                    self._profiles.move_to_end(user_id, last=False)
+                if user_id in self._profiles:
+                    self._dirty.add(user_id)
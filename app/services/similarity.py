@@ -0,0 +1,81 @@
+# app/services/similarity.py
+"""
+Vectorized text similarity for memory recall.
+
+Each memory gets a compact feature vector when it is stored:
+hashed character trigrams → DIMENSIONS buckets, L2-normalized, kept as
+float16 bytes (512 bytes per memory). Matching a new message is then one
+matrix-vector product over all candidates instead of a difflib loop.
+"""
+
+import re
+import zlib
+
+import numpy as np
+
+NGRAM = 3
+DIMENSIONS = 256
+
+# Cosine score above which two messages count as "similar".
+# Recalibrated against difflib's ratio > 0.6 with benchmarks/bench_similarity.py.
+SIMILARITY_THRESHOLD = 0.45
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _ngrams(text: str):
+    text = " " + _WHITESPACE_RE.sub(" ", text.lower()).strip() + " "
+    return [text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)]
+
+
+def text_vector(text: str):
+    """Hashed character-trigram vector (float32, unit length)."""
+    vec = np.zeros(DIMENSIONS, dtype=np.float32)
+
+    for gram in _ngrams(text):
+        h = zlib.crc32(gram.encode("utf-8"))
+        # low bits pick the bucket, one high bit picks the sign so that
+        # colliding trigrams tend to cancel instead of piling up
+        vec[h % DIMENSIONS] += 1.0 if h & 0x80000000 else -1.0
+
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+def encode_vector(vec):
+    """Pack a vector for storage."""
+    return vec.astype(np.float16).tobytes()
+
+
+def decode_vector(blob):
+    return np.frombuffer(blob, dtype=np.float16).astype(np.float32)
+
+
+def memory_vector(memory: dict):
+    """Stored vector of a memory; computed on the fly for pre-vector memories."""
+    blob = memory.get("vector")
+    if blob:
+        return decode_vector(blob)
+    return text_vector(memory["text"])
+
+
+def score_memories(memories: list, text: str):
+    """Cosine score of `text` against every memory, as one NumPy array."""
+    if not memories:
+        return np.zeros(0, dtype=np.float32)
+
+    matrix = np.stack([memory_vector(m) for m in memories])
+    return matrix @ text_vector(text)
+
+
+def top_k_similar(memories: list, text: str, k: int = 3, threshold: float = SIMILARITY_THRESHOLD):
+    """Return up to k (memory, score) pairs above threshold, best first."""
+    scores = score_memories(memories, text)
+    if not len(scores):
+        return []
+
+    k = min(k, len(scores))
+    idx = np.argpartition(-scores, k - 1)[:k]
+    idx = idx[np.argsort(-scores[idx])]
+
+    return [(memories[i], float(scores[i])) for i in idx if scores[i] > threshold]
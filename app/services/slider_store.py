@@ -0,0 +1,174 @@
+# app/services/slider_store.py
+"""
+Columnar store for per-user numeric state (the personality sliders and
+counters, see profile_store.py).
+
+Every user gets a dense id (0, 1, 2, ... in first-seen order) and one
+float64 row; rows live in fixed-size NumPy chunks that are never moved or
+resized, so:
+  - row(user_id) hands out a view that stays valid; writing through it is
+    an O(1) update straight into the columns,
+  - whole-population operations (blocks() / column()) are vectorized per
+    chunk instead of a Python loop over profile objects.
+
+Snapshots are two .npy files: <path>.values.npy (rows x width) and
+<path>.users.npy (user ids by dense id, utf-8 encoded behind a one-byte
+type tag, so int ids come back as int; ids must be str or int). load()
+memory-maps the values copy-on-write, so startup doesn't read
+or rebuild them: pages are faulted in as rows are touched and writes stay
+private to the process.
+Rows are only ever appended, so an interrupted save (one file newer than
+the other) still loads consistently: the shorter of the two wins.
+"""
+
+import os
+import threading
+
+import numpy as np
+
+CHUNK_ROWS = 65536
+
+# snapshot type tags of the user ids
+KEY_TYPES = {str: b"s", int: b"i"}
+KEY_PARSERS = {ord("s"): str, ord("i"): int}
+
+
+class SliderStore:
+
+    def __init__(self, defaults: tuple, chunk_rows: int = CHUNK_ROWS):
+        self.defaults = np.array(defaults, dtype=np.float64)
+        self.width = len(defaults)
+        self.chunk_rows = chunk_rows
+
+        self._ids = {}              # user_id → dense id
+        self._users = []            # dense id → user_id
+        self._base = None           # snapshot rows (memory-mapped), ids [0, len(_base))
+        self._chunks = []           # chunk_rows rows each, ids from len(_base) on
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._users)
+
+    def __contains__(self, user_id):
+        return user_id in self._ids
+
+    # ---------------------------
+    # Rows
+    # ---------------------------
+    def find(self, user_id):
+        """The user's row (a view), or None."""
+        dense_id = self._ids.get(user_id)
+        return None if dense_id is None else self._row(dense_id)
+
+    def row(self, user_id):
+        """The user's row, appended with the defaults on first use."""
+        dense_id = self._ids.get(user_id)
+        if dense_id is None:
+            with self._lock:
+                dense_id = self._ids.get(user_id)
+                if dense_id is None:
+                    dense_id = self._append(user_id)
+        return self._row(dense_id)
+
+    def _row(self, dense_id: int):
+        base = 0 if self._base is None else len(self._base)
+        if dense_id < base:
+            return self._base[dense_id]
+        chunk, offset = divmod(dense_id - base, self.chunk_rows)
+        return self._chunks[chunk][offset]
+
+    def _append(self, user_id):
+        # caller holds the lock
+        if type(user_id) not in KEY_TYPES:
+            raise TypeError(f"user ids must be str or int, got {type(user_id).__name__}")
+        dense_id = len(self._users)
+        base = 0 if self._base is None else len(self._base)
+        chunk, offset = divmod(dense_id - base, self.chunk_rows)
+        if chunk == len(self._chunks):
+            self._chunks.append(np.empty((self.chunk_rows, self.width)))
+        self._chunks[chunk][offset] = self.defaults
+        self._users.append(user_id)
+        self._ids[user_id] = dense_id
+        return dense_id
+
+    # ---------------------------
+    # Bulk access
+    # ---------------------------
+    def blocks(self):
+        """The used rows as 2-D views, one per chunk; writes go to the store."""
+        count = len(self._users)
+        if self._base is not None and len(self._base):
+            yield self._base
+            count -= len(self._base)
+        for chunk in self._chunks:
+            if count <= 0:
+                break
+            yield chunk[:min(count, self.chunk_rows)]
+            count -= self.chunk_rows
+
+    def column(self, index):
+        """One column (or a slice of columns) for every user, as a new array."""
+        parts = [block[:, index] for block in self.blocks()]
+        if not parts:
+            return np.empty((0,) + self.defaults[index].shape)
+        return np.concatenate(parts)
+
+    def users(self):
+        """User ids by dense id."""
+        return list(self._users)
+
+    # ---------------------------
+    # Snapshots
+    # ---------------------------
+    def save(self, path: str):
+        """Write <path>.values.npy and <path>.users.npy; returns the rows written."""
+        with self._lock:
+            count = len(self._users)
+            users = np.array([_encode_key(u) for u in self._users[:count]], dtype=bytes)
+
+        tmp = f"{path}.values.tmp.npy"
+        values = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float64, shape=(count, self.width))
+        start = 0
+        for block in self.blocks():
+            block = block[:count - start]
+            values[start:start + len(block)] = block
+            start += len(block)
+            if start == count:
+                break
+        values.flush()
+        del values
+        os.replace(tmp, f"{path}.values.npy")
+
+        tmp = f"{path}.users.tmp.npy"
+        np.save(tmp, users)
+        os.replace(tmp, f"{path}.users.npy")
+        return count
+
+    def load(self, path: str):
+        """
+        Replace the contents with a snapshot (values memory-mapped); returns
+        the rows loaded, 0 if there is no snapshot.
+        """
+        try:
+            values = np.load(f"{path}.values.npy", mmap_mode="c")
+            users = np.load(f"{path}.users.npy")
+        except FileNotFoundError:
+            return 0
+        if values.ndim != 2 or values.shape[1] != self.width:
+            raise ValueError(f"snapshot {path} has rows of {values.shape[1:]} values, expected {self.width}")
+
+        count = min(len(values), len(users))
+        with self._lock:
+            self._users = [_decode_key(u) for u in users[:count].tolist()]
+            self._ids = {u: i for i, u in enumerate(self._users)}
+            self._base = values[:count]
+            self._chunks = []
+        return count
+
+
+def _encode_key(user_id):
+    return KEY_TYPES[type(user_id)] + str(user_id).encode("utf-8")
+
+
+def _decode_key(data: bytes):
+    return KEY_PARSERS[data[0]](data[1:].decode("utf-8"))
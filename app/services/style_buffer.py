@@ -0,0 +1,199 @@
+# app/services/style_buffer.py
+"""
+Write-behind buffer for `user_style` updates.
+
+Instead of one update_one per chat message, style deltas are merged per
+user in process and flushed with a single batched write when either
+  - `max_users` users have pending deltas (size trigger), or
+  - `flush_interval` seconds have passed (time trigger).
+Readers merge unflushed deltas on top of the stored document, so
+read-your-writes holds inside this worker.
+"""
+
+import logging
+import threading
+import time
+
+# metrics() fields as reported on /metrics (app.metrics.StatsCollector)
+METRIC_FIELDS = (
+    ("pending_users", "gauge", "Users with deltas waiting to be flushed."),
+    ("buffered_bytes", "gauge", "Approximate size of the pending deltas."),
+    ("flushes", "counter", "Flushes of the buffer."),
+    ("flushed_users", "counter", "User updates written by flushes."),
+    ("failed_writes", "counter", "User updates whose flush failed."),
+    ("last_flush_size", "gauge", "Users written by the last flush."),
+    ("last_flush_ms", "gauge", "Duration of the last flush, in milliseconds."),
+    ("max_flush_ms", "gauge", "Longest flush since start, in milliseconds."),
+)
+
+logger = logging.getLogger("ai_buddy")
+
+
+class StyleWriteBuffer:
+
+    def __init__(self, write, merge, apply, max_users: int = 500, flush_interval: float = 1.0):
+        """
+        write(deltas_by_user)    → { user_id: error message } for failed users
+        merge(into, delta)       → folds delta into into (in place)
+        apply(doc, delta)        → doc with delta applied (read-your-writes)
+        """
+        self.write = write
+        self.merge = merge
+        self.apply = apply
+        self.max_users = max_users
+        self.flush_interval = flush_interval
+
+        self._pending = {}                     # user_id → merged delta
+        self._lock = threading.Lock()          # guards _pending / _sequence
+        self._flush_lock = threading.Lock()    # one flush at a time
+        self._sequence = 0                     # odd while a flush is in flight
+        self._wake = threading.Event()
+        self._closed = False
+
+        # metrics
+        self.flushes = 0
+        self.failed_writes = 0
+        self.flushed_users = 0
+        self.last_flush_size = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+
+        self._thread = threading.Thread(target=self._run, name="style-write-behind", daemon=True)
+        self._thread.start()
+
+    # ---------------------------
+    # Writes
+    # ---------------------------
+    def add(self, user_id: str, delta: dict):
+        with self._lock:
+            if user_id in self._pending:
+                self.merge(self._pending[user_id], delta)
+            else:
+                self._pending[user_id] = _copy_delta(delta)
+            full = len(self._pending) >= self.max_users
+
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """Write every pending delta now; returns the number of users flushed."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._sequence += 1
+
+            started = time.perf_counter()
+            failed = {}
+            try:
+                if batch:
+                    failed = self.write(batch)
+            except Exception:
+                failed = dict.fromkeys(batch)
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    # failed deltas go back in front of anything newer
+                    for user_id in failed:
+                        newer = self._pending.pop(user_id, None)
+                        self._pending[user_id] = batch[user_id]
+                        if newer:
+                            self.merge(self._pending[user_id], newer)
+                    self._sequence += 1
+
+                    if batch:
+                        self.flushes += 1
+                        self.failed_writes += len(failed)
+                        self.flushed_users += len(batch) - len(failed)
+                        self.last_flush_size = len(batch)
+                        self.last_flush_seconds = elapsed
+                        self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+                        self.total_flush_seconds += elapsed
+
+            return len(batch) - len(failed)
+
+    def close(self):
+        """Stop the background flusher and write out everything pending."""
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+    # ---------------------------
+    # Reads (read-your-writes)
+    # ---------------------------
+    def read_through(self, user_ids: list, load):
+        """
+        load(user_ids) → { user_id: stored doc or None }
+        Returns the stored docs with this worker's unflushed deltas applied.
+        A flush finishing between snapshot and load would double-apply or
+        drop a delta, so that case is simply retried.
+        """
+        while True:
+            with self._lock:
+                sequence = self._sequence
+                deltas = {u: _copy_delta(self._pending[u]) for u in user_ids if u in self._pending}
+
+            if sequence % 2:
+                # a flush is in flight — wait for it, then look again
+                with self._flush_lock:
+                    pass
+                continue
+
+            docs = load(user_ids)
+
+            with self._lock:
+                if self._sequence == sequence:
+                    break
+
+        for user_id, delta in deltas.items():
+            docs[user_id] = self.apply(docs.get(user_id), delta)
+        return docs
+
+    # ---------------------------
+    # Metrics
+    # ---------------------------
+    def buffered_bytes(self):
+        """Approximate payload size of everything waiting to be flushed."""
+        with self._lock:
+            return sum(_delta_bytes(u, d) for u, d in self._pending.items())
+
+    def metrics(self):
+        with self._lock:
+            pending_users = len(self._pending)
+        return {
+            "pending_users": pending_users,
+            "buffered_bytes": self.buffered_bytes(),
+            "flushes": self.flushes,
+            "flushed_users": self.flushed_users,
+            "failed_writes": self.failed_writes,
+            "last_flush_size": self.last_flush_size,
+            "last_flush_ms": self.last_flush_seconds * 1000,
+            "max_flush_ms": self.max_flush_seconds * 1000,
+            "avg_flush_ms": self.total_flush_seconds * 1000 / self.flushes if self.flushes else 0.0,
+        }
+
+    # ---------------------------
+    # Background flusher
+    # ---------------------------
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(timeout=self.flush_interval)
+            self._wake.clear()
+            if self._closed:
+                break
+            try:
+                self.flush()
+            except Exception as e:
+                # deltas stay pending; the next trigger retries them
+                logger.warning("style buffer: background flush failed: %s", e)
+
+
+def _copy_delta(delta: dict):
+    return {"inc": dict(delta["inc"]), "slang": list(delta["slang"])}
+
+
+def _delta_bytes(user_id: str, delta: dict):
+    # user id + 8 bytes per counter + slang strings
+    return len(user_id) + 8 * len(delta["inc"]) + sum(len(s) for s in delta["slang"])
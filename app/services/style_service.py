@@ -1,100 +1,212 @@
 # app/services/style_service.py
 
-import re
-from pymongo import MongoClient
-
-client = MongoClient("mongodb://localhost:27017")
-db = client["ai_buddy"]
-style_collection = db["user_style"]
+from app.config import settings
+from app.db.documents import apply_style_delta
+from app.db.executor import run_in_db_executor
+from app.db.storage import get_storage
+from app.metrics import REGISTRY, StatsCollector, cache_stats
+from app.services.cache import MISSING, LRUCache
+from app.services.style_buffer import METRIC_FIELDS, StyleWriteBuffer
+from app.services.text_features import STYLE_SLANG, extract_features
 
 
 class StyleService:
 
-    def __init__(self):
-        self.slang_words = [
-            "lmao", "lol", "bro", "fr", "omg", "wtf", 
-            "idk", "ikr", "bruh", "no cap", "cap", "ong"
-        ]
+    def __init__(self, write_behind: bool = None, storage=None):
+        self.slang_words = STYLE_SLANG
+        self._storage = storage
+
+        # raw style documents, refreshed from every write (write-through)
+        self.cache = LRUCache()
+
+        # Optional write-behind mode: merge style deltas per user in process
+        # and flush them in one batched write (see style_buffer.py)
+        if write_behind is None:
+            write_behind = settings.style_write_behind
+
+        self.write_buffer = None
+        if write_behind:
+            self.write_buffer = StyleWriteBuffer(
+                lambda deltas: self.storage.update_styles_many(deltas),
+                merge=merge_style_deltas,
+                apply=apply_style_delta,
+                max_users=settings.style_flush_users,
+                flush_interval=settings.style_flush_interval
+            )
+
+    @property
+    def storage(self):
+        # resolved on first use so importing never opens a connection
+        if self._storage is None:
+            self._storage = get_storage()
+        return self._storage
 
     # ---------------------------
     # Extract style features
     # ---------------------------
     def analyze_style(self, text: str):
-        text_lower = text.lower()
-
-        # Emoji count
-        emoji_count = len([c for c in text if c in self._emoji_range()])
-
-        # Message length
-        length = len(text)
-
-        # Exclamations
-        exclaims = text.count("!")
-
-        # Slang detection
-        slang_found = []
-        for slang in self.slang_words:
-            if slang in text_lower:
-                slang_found.append(slang)
+        # One pass of the shared extractor (emojis, "!", length, slang)
+        features = extract_features(text)
 
         return {
-            "emoji_count": emoji_count,
-            "length": length,
-            "exclaims": exclaims,
-            "slang": slang_found
+            "emoji_count": len(features["emojis"]),
+            "length": features["length"],
+            "exclaims": features["exclaims"],
+            "slang": features["slang"]
         }
 
     # ---------------------------
     # Save/update style stats
     # ---------------------------
     def update_user_style(self, user_id: str, text: str):
-
-        style = self.analyze_style(text)
-
-        style_collection.update_one(
-            {"user_id": user_id},
-            {
-                "$inc": {
-                    "total_messages": 1,
-                    "total_emojis": style["emoji_count"],
-                    "total_length": style["length"],
-                    "total_exclaims": style["exclaims"]
-                },
-                "$addToSet": {
-                    "slang_used": {"$each": style["slang"]}
-                }
-            },
-            upsert=True
-        )
+        """Apply this message's style stats; returns the updated raw document."""
+
+        delta = style_delta(self.analyze_style(text))
+
+        if self.write_buffer is not None:
+            self.write_buffer.add(user_id, delta)
+            cached = self.cache.get(user_id)
+            if cached is MISSING:
+                return self.get_style_docs([user_id])[user_id]
+            # refresh the cached doc from the delta instead of re-reading
+            doc = apply_style_delta(cached, delta)
+            self.cache.set(user_id, doc)
+            return doc
+
+        doc = self.storage.update_style(user_id, delta)
+        self.cache.set(user_id, doc)
+        return doc
+
+    def update_user_styles_bulk(self, deltas_by_user: dict):
+        """
+        Apply merged style deltas for many users in one batched write.
+        deltas_by_user: { user_id: delta } (see style_delta / merge_style_deltas)
+        Returns { user_id: error message } for users whose write failed.
+        """
+        if self.write_buffer is not None:
+            for user_id, delta in deltas_by_user.items():
+                self.write_buffer.add(user_id, delta)
+            failed = {}
+        else:
+            failed = self.storage.update_styles_many(deltas_by_user)
+
+        # write-through: refresh cached docs from the deltas just written
+        for user_id, delta in deltas_by_user.items():
+            cached = self.cache.get(user_id)
+            if user_id in failed or cached is MISSING:
+                self.cache.invalidate(user_id)
+            else:
+                self.cache.set(user_id, apply_style_delta(cached, delta))
+
+        return failed
 
     # ---------------------------
     # Fetch style profile
     # ---------------------------
     def get_user_style(self, user_id: str):
-        profile = style_collection.find_one({"user_id": user_id})
-        if not profile:
-            return None
-
-        total = profile.get("total_messages", 1)
-
-        return {
-            "avg_length": profile.get("total_length", 0) / total,
-            "emoji_freq": profile.get("total_emojis", 0) / total,
-            "exclaim_freq": profile.get("total_exclaims", 0) / total,
-            "slang_used": profile.get("slang_used", [])
-        }
+        return style_profile_from_doc(self.get_style_docs([user_id])[user_id])
+
+    def get_style_docs(self, user_ids: list):
+        """
+        { user_id: raw style document or None }; cached users cost nothing,
+        the rest are loaded in one query.
+        In write-behind mode unflushed deltas are merged in (read-your-writes).
+        """
+        docs = {}
+        missing = []
+        for user_id in user_ids:
+            cached = self.cache.get(user_id)
+            if cached is MISSING:
+                missing.append(user_id)
+            else:
+                docs[user_id] = cached
+
+        if missing:
+            if self.write_buffer is not None:
+                loaded = self.write_buffer.read_through(missing, self.storage.get_style_docs)
+            else:
+                loaded = self.storage.get_style_docs(missing)
+            for user_id, doc in loaded.items():
+                self.cache.set(user_id, doc)
+            docs.update(loaded)
+
+        return {u: docs[u] for u in user_ids}
 
     # ---------------------------
-    # Helper: detect emojis
+    # Write-behind lifecycle
     # ---------------------------
-    def _emoji_range(self):
-        ranges = [
-            (0x1F600, 0x1F64F),  # Emoticons
-            (0x1F300, 0x1F5FF),  # Misc symbols
-            (0x1F680, 0x1F6FF),  # Transport
-            (0x1F900, 0x1F9FF),  # Supplemental Symbols
-        ]
-        return {chr(i) for r in ranges for i in range(r[0], r[1])}
+    def flush(self):
+        if self.write_buffer is not None:
+            self.write_buffer.flush()
+
+    def close(self):
+        """Flush anything buffered; call on shutdown."""
+        if self.write_buffer is not None:
+            self.write_buffer.close()
+
+    def write_buffer_metrics(self):
+        return self.write_buffer.metrics() if self.write_buffer is not None else None
+
+
+# ---------------------------
+# Style deltas (pure helpers)
+# ---------------------------
+def style_delta(style: dict):
+    """Counter increments + slang contributed by one analyzed message."""
+    return {
+        "inc": {
+            "total_messages": 1,
+            "total_emojis": style["emoji_count"],
+            "total_length": style["length"],
+            "total_exclaims": style["exclaims"]
+        },
+        "slang": list(style["slang"])
+    }
+
+
+def merge_style_deltas(into: dict, delta: dict):
+    """Fold `delta` into `into` (in place) so several messages cost one write."""
+    for field, amount in delta["inc"].items():
+        into["inc"][field] = into["inc"].get(field, 0) + amount
+    for slang in delta["slang"]:
+        if slang not in into["slang"]:
+            into["slang"].append(slang)
+    return into
+
+
+def style_profile_from_doc(profile: dict):
+    """Turn a raw `user_style` document into the averaged style profile."""
+    if not profile:
+        return None
+
+    total = profile.get("total_messages", 1)
+
+    return {
+        "avg_length": profile.get("total_length", 0) / total,
+        "emoji_freq": profile.get("total_emojis", 0) / total,
+        "exclaim_freq": profile.get("total_exclaims", 0) / total,
+        "slang_used": profile.get("slang_used", [])
+    }
+
+
+class AsyncStyleService:
+    """Async facade over StyleService backed by the bounded DB executor."""
+
+    def __init__(self, service: StyleService):
+        self.service = service
+
+    async def update_user_style(self, user_id: str, text: str):
+        return await run_in_db_executor(self.service.update_user_style, user_id, text)
+
+    async def get_user_style(self, user_id: str):
+        return await run_in_db_executor(self.service.get_user_style, user_id)
 
 
 style_service = StyleService()
+async_style_service = AsyncStyleService(style_service)
+
+cache_stats.register("style", style_service.cache.stats)
+write_buffer_stats = StatsCollector("ai_buddy_write_buffer", "buffer", METRIC_FIELDS)
+REGISTRY.append(write_buffer_stats)
+if style_service.write_buffer is not None:
+    write_buffer_stats.register("style", style_service.write_buffer_metrics)
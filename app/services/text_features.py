@@ -0,0 +1,88 @@
+# app/services/text_features.py
+"""
+Shared, precompiled text-feature extractor.
+
+StyleService and the personality engine both need the same surface
+features of a message (emojis, exclamations, length, words, slang).
+extract_features() gets all of them in ONE regex pass over the text, with
+a single emoji definition for the whole app.
+"""
+
+import re
+
+# One emoji definition for everything
+EMOJI_RANGES = "\U0001F300-\U0001F6FF\U0001F900-\U0001F9FF\u2600-\u27BF"
+EMOJI_RE = re.compile(f"[{EMOJI_RANGES}]")
+
+# Slang tracked by the style engine (order matters: first hit is "most used")
+STYLE_SLANG = [
+    "lmao", "lol", "bro", "fr", "omg", "wtf",
+    "idk", "ikr", "bruh", "no cap", "cap", "ong"
+]
+
+# emoji run | "!" | word (contractions kept)
+_FEATURE_RE = re.compile(f"(?P<emoji>[{EMOJI_RANGES}]+)|(?P<bang>!)|(?P<word>[a-z']+)")
+_SINGLE_SPACE_RE = re.compile(r"\s")
+_MAX_PHRASE_WORDS = 3
+
+
+def _find_slang(tokens: list, vocabulary: list):
+    grams = set(tokens)
+    grams.update(map(" ".join, zip(tokens, tokens[1:])))
+    return [s for s in vocabulary if s in grams]
+
+
+def extract_features(text: str):
+    """
+    Single pass over `text`. Returns:
+        length    – characters in the message
+        emojis    – every emoji character, in order
+        emoji_runs – consecutive emojis grouped ("😂😂" is one run), in order
+        exclaims  – number of "!"
+        tokens    – lowercase words
+        phrases   – runs of up to 3 words separated by single whitespace
+                    (signature-phrase candidates)
+        slang     – STYLE_SLANG entries used, whole words only
+    """
+    emojis = []
+    emoji_runs = []
+    exclaims = 0
+    tokens = []
+    phrases = []
+
+    current = []
+    prev_end = None
+
+    lowered = text.lower()
+    for m in _FEATURE_RE.finditer(lowered):
+        kind = m.lastgroup
+
+        if kind == "word":
+            start, end = m.span()
+            # keep growing the phrase only across exactly one whitespace char
+            joined = prev_end is not None and start - prev_end == 1 \
+                and _SINGLE_SPACE_RE.match(lowered, prev_end)
+            if current and (not joined or len(current) == _MAX_PHRASE_WORDS):
+                phrases.append(" ".join(current))
+                current = []
+            current.append(m.group())
+            tokens.append(m.group())
+            prev_end = end
+        elif kind == "emoji":
+            emoji_runs.append(m.group())
+            emojis.extend(m.group())
+        else:
+            exclaims += 1
+
+    if current:
+        phrases.append(" ".join(current))
+
+    return {
+        "length": len(text),
+        "emojis": emojis,
+        "emoji_runs": emoji_runs,
+        "exclaims": exclaims,
+        "tokens": tokens,
+        "phrases": phrases,
+        "slang": _find_slang(tokens, STYLE_SLANG)
+    }
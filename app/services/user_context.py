@@ -0,0 +1,86 @@
+# app/services/user_context.py
+"""
+Request-scoped snapshot of one user's stored state.
+
+A chat turn loads the user's memories once, then every later step
+(similarity, personality, style) is served from this object. Writes go to
+the storage backend as usual and are mirrored into the snapshot in place,
+so the turn never has to re-read what it just wrote.
+"""
+
+from collections import Counter
+
+from app.config import settings
+from app.db.documents import MEMORY_CAP
+from app.services.memory_service import (
+    memory_service,
+    async_memory_service,
+    find_similar_in,
+    summarize_counts,
+)
+from app.services.style_service import style_profile_from_doc
+
+
+class UserContext:
+
+    def __init__(self, user_id: str, memories: list, style_doc: dict = None,
+                 archive_pending: int = 0, archive_blocks: int = 0):
+        self.user_id = user_id
+        self.memories = list(memories)   # oldest → newest
+        self.style_doc = style_doc       # raw `user_style` document
+        self.emotion_counts = Counter(m["emotion"] for m in self.memories)
+        # how much of the history is archived: archive recall is skipped
+        # while both are 0, so most users cost no extra read on a miss
+        self.archive_pending = archive_pending
+        self.archive_blocks = archive_blocks
+
+    # ---------------------------
+    # Loading
+    # ---------------------------
+    @classmethod
+    def load(cls, user_id: str):
+        return cls.from_window(user_id, memory_service.get_memory_window(user_id))
+
+    @classmethod
+    async def load_async(cls, user_id: str):
+        return cls.from_window(user_id, await async_memory_service.get_memory_window(user_id))
+
+    @classmethod
+    def from_window(cls, user_id: str, window: dict, style_doc: dict = None):
+        return cls(user_id, window["memories"], style_doc, window["archive_pending"], window["archive_blocks"])
+
+    # ---------------------------
+    # In-place updates after writes
+    # ---------------------------
+    def remember(self, memory: dict):
+        """Mirror a stored memory, applying the same cap as the database."""
+        self.memories.append(memory)
+        self.emotion_counts[memory["emotion"]] += 1
+
+        if len(self.memories) > MEMORY_CAP:
+            for evicted in self.memories[:-MEMORY_CAP]:
+                self.emotion_counts[evicted["emotion"]] -= 1
+            if settings.archive_enabled:
+                self.archive_pending += len(self.memories) - MEMORY_CAP
+            del self.memories[:-MEMORY_CAP]
+            self.emotion_counts = +self.emotion_counts   # drop zero counters
+
+    def set_style(self, style_doc: dict):
+        self.style_doc = style_doc
+
+    # ---------------------------
+    # Reads served from the snapshot
+    # ---------------------------
+    def find_similar_memory(self, new_text: str):
+        return find_similar_in(self.memories, new_text)
+
+    @property
+    def has_archive(self):
+        """Whether archive recall can find anything for this user."""
+        return settings.archive_enabled and (self.archive_pending > 0 or self.archive_blocks > 0)
+
+    def summarize_personality(self):
+        return summarize_counts(self.emotion_counts, len(self.memories))
+
+    def style_profile(self):
+        return style_profile_from_doc(self.style_doc)
@@ -0,0 +1,131 @@
+# app/services/user_locks.py
+"""
+Per-user mutual exclusion: one user's turns run one at a time, in arrival
+order, while different users never wait for each other.
+
+  AsyncKeyedLock  – for the event loop (chat turns); asyncio.Lock is FIFO
+  KeyedLock       – for code running on threads (personality profiles)
+
+A lock exists only while someone holds or waits for it, so memory stays
+proportional to the number of active users. Both record contention:
+acquisitions, how many had to wait, and the wait time
+(ai_buddy_user_lock_* in /metrics).
+"""
+
+import asyncio
+import threading
+import time
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
+
+from app.metrics import Counter, Histogram, REGISTRY
+
+lock_acquisitions = Counter(
+    "ai_buddy_user_lock_acquisitions_total", "Per-user lock acquisitions.", ("lock",))
+lock_contended = Counter(
+    "ai_buddy_user_lock_contended_total", "Per-user lock acquisitions that had to wait.", ("lock",))
+lock_wait_seconds = Histogram(
+    "ai_buddy_user_lock_wait_seconds", "Time spent waiting for a per-user lock.", "lock")
+REGISTRY.extend([lock_acquisitions, lock_contended, lock_wait_seconds])
+
+
+class _KeyedBase:
+
+    def __init__(self, name: str):
+        self.name = name
+        self._entries = {}      # key → [lock, holders + waiters]
+        self.max_waiters = 0
+
+    def _record(self, contended: bool, waited: float):
+        lock_acquisitions.inc(self.name)
+        if contended:
+            lock_contended.inc(self.name)
+            lock_wait_seconds.observe(self.name, waited)
+
+    def stats(self):
+        acquisitions = lock_acquisitions.value(self.name)
+        contended = lock_contended.value(self.name)
+        return {
+            "active_keys": len(self._entries),
+            "acquisitions": acquisitions,
+            "contended": contended,
+            "contention_ratio": contended / acquisitions if acquisitions else 0.0,
+            "max_waiters": self.max_waiters,
+        }
+
+
+class AsyncKeyedLock(_KeyedBase):
+    """Keyed asyncio locks; all use must happen on one event loop."""
+
+    @asynccontextmanager
+    async def hold(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        self.max_waiters = max(self.max_waiters, entry[1] - 1)
+
+        lock = entry[0]
+        contended = lock.locked()
+        started = time.perf_counter()
+        try:
+            await lock.acquire()
+        except BaseException:
+            self._release_entry(key, entry)
+            raise
+        self._record(contended, time.perf_counter() - started)
+
+        try:
+            yield
+        finally:
+            lock.release()
+            self._release_entry(key, entry)
+
+    @asynccontextmanager
+    async def hold_many(self, keys):
+        """Hold several keys at once; taken in sorted order so callers can't deadlock."""
+        async with AsyncExitStack() as stack:
+            for key in sorted(set(keys)):
+                await stack.enter_async_context(self.hold(key))
+            yield
+
+    def _release_entry(self, key, entry):
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._entries[key]
+
+
+class KeyedLock(_KeyedBase):
+    """Keyed threading locks."""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._guard = threading.Lock()
+
+    @contextmanager
+    def hold(self, key):
+        with self._guard:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = [threading.Lock(), 0]
+            entry[1] += 1
+            self.max_waiters = max(self.max_waiters, entry[1] - 1)
+
+        lock = entry[0]
+        contended = not lock.acquire(blocking=False)
+        started = time.perf_counter()
+        if contended:
+            lock.acquire()
+        self._record(contended, time.perf_counter() - started)
+
+        try:
+            yield
+        finally:
+            lock.release()
+            with self._guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._entries[key]
+
+
+# one user's chat turns (HTTP and WebSocket) run one at a time
+chat_locks = AsyncKeyedLock("chat")
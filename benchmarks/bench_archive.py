@@ -0,0 +1,90 @@
+"""
+Per-turn cost of the two-tier memory as history grows.
+
+For each history size one user gets that many memories (written in bulk,
+so evicted ones are sealed into archive blocks as they would be live),
+then we time:
+    add_memory          – hot-window write (+ the occasional block seal)
+    find_similar/hot    – match served by the hot window
+    find_similar/cold   – hot miss → rare-term postings → a few candidates
+and check that the oldest memories are still recalled.
+
+Usage:
+    python -m benchmarks.bench_archive [--storage memory|sqlite|mongo]
+        [--history 100,1000,10000] [--iterations 200] [--json out.json]
+"""
+
+import argparse
+import random
+import string
+import uuid
+
+from app.config import settings
+from benchmarks.common import add_storage_argument, summarize, time_calls, use_storage, write_json
+
+
+def _int_list(value: str):
+    return [int(v) for v in value.split(",")]
+
+
+def vocabulary(rng: random.Random, size: int = 5000):
+    return ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 9))) for _ in range(size)]
+
+
+def memory_text(rng: random.Random, words: list):
+    """Distinct memories: six words from a large vocabulary."""
+    return " ".join(rng.choices(words, k=6))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot window vs. archive recall cost by history size.")
+    add_storage_argument(parser)
+    parser.add_argument("--history", type=_int_list, default=[100, 1000, 10000])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    # the archive is opt-in; this benchmark is about it
+    settings.archive_enabled = True
+    use_storage(args)
+
+    from app.services.memory_service import memory_service, new_memory
+
+    rng = random.Random(42)
+    words = vocabulary(rng)
+    run = uuid.uuid4().hex[:8]
+    results = {}
+
+    def record(name: str, latencies: list):
+        results[name] = summarize(latencies)
+        r = results[name]
+        print(f"{name:<32} p50 {r['p50_ms']:8.3f} ms  p95 {r['p95_ms']:8.3f} ms  p99 {r['p99_ms']:8.3f} ms")
+
+    for history in args.history:
+        user_id = f"bench-{run}-{history}"
+        texts = [memory_text(rng, words) for _ in range(history)]
+        for start in range(0, history, 500):
+            memory_service.add_memories_bulk({
+                user_id: [new_memory(t, "sad") for t in texts[start:start + 500]]
+            })
+
+        hot = [(user_id, texts[-1 - rng.randrange(10)]) for _ in range(args.iterations)]
+        cold = [(user_id, texts[rng.randrange(max(1, history - 100))]) for _ in range(args.iterations)]
+
+        record(f"find_similar/hot/h{history}", time_calls(memory_service.find_similar_memory, hot))
+        record(f"find_similar/cold/h{history}", time_calls(memory_service.find_similar_memory, cold))
+
+        # recall depth: the very first memory must still come back
+        first = memory_service.find_similar_memory(user_id, texts[0])
+        recalled = bool(first) and first["text"] == texts[0]
+        print(f"{'oldest memory recalled':<32} {recalled}")
+        results[f"recall_oldest/h{history}"] = {"recalled": int(recalled)}
+
+        writes = [(user_id, memory_text(rng, words), "sad") for _ in range(args.iterations)]
+        record(f"add_memory/h{history}", time_calls(memory_service.add_memory, writes))
+
+    if args.json:
+        write_json(args.json, "archive", results, storage=args.storage, iterations=args.iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark: p50/p99 latency of /chat/reply under concurrent load,
+comparing the blocking pipeline against the executor-backed async one.
+
+Storage calls are replaced with fixed-latency stand-ins so the numbers only
+reflect how the event loop schedules work, not how fast Mongo is.
+
+Usage:
+    python -m benchmarks.bench_async_reply --concurrency 50 --latency-ms 5
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.services import chat_service
+from app.services.memory_service import memory_service
+from app.services.style_service import style_service
+
+
+def _patch_storage(latency: float):
+    """Swap every Mongo-backed call for a sleep of `latency` seconds."""
+
+    def slow(result=None):
+        def call(*args, **kwargs):
+            time.sleep(latency)
+            return result
+        return call
+
+    memory_service.get_memories = slow([])
+    memory_service.add_memory = slow({"text": "", "emotion": "unknown"})
+    style_service.update_user_style = slow({"total_messages": 1})
+
+
+async def _blocking_reply(user_id: str, message: str):
+    # What the old route did: call the sync pipeline straight from `async def`.
+    return chat_service.generate_reply(user_id, message)
+
+
+async def _run(handler, concurrency: int, rounds: int):
+    latencies = []
+
+    async def one(i: int, arrived: float):
+        await handler(f"user-{i}", "i feel so tired and stressed today")
+        latencies.append(time.perf_counter() - arrived)
+
+    wall = time.perf_counter()
+    for _ in range(rounds):
+        # All requests of a round arrive together; latency is measured from
+        # arrival, so time spent waiting for a blocked loop is counted.
+        arrived = time.perf_counter()
+        await asyncio.gather(*(one(i, arrived) for i in range(concurrency)))
+    wall = time.perf_counter() - wall
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return {
+        "requests": len(latencies),
+        "throughput_rps": len(latencies) / wall,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": p99 * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    _patch_storage(args.latency_ms / 1000)
+
+    for name, handler in [
+        ("blocking", _blocking_reply),
+        ("async", chat_service.generate_reply_async),
+    ]:
+        result = asyncio.run(_run(handler, args.concurrency, args.rounds))
+        print(
+            f"{name:>9}: {result['requests']} req  "
+            f"{result['throughput_rps']:8.1f} req/s  "
+            f"p50 {result['p50_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Micro-benchmark: analyze_emotion throughput per message.
+
+Compares the compiled single-pass lexicon against the previous
+implementation (dicts rebuilt per call, one `word in text` substring scan
+per keyword), across message lengths. Then replays chat-like traffic
+(short messages repeating with a Zipf-like skew, plus unique ones) through
+classify_emotion with and without its LRU cache, and prints the cache's
+hit ratio and evictions for the given --cache-size.
+
+Usage:
+    python -m benchmarks.bench_emotion [--iterations 2000] [--cache-size 10000]
+"""
+
+import argparse
+import random
+import time
+
+from app.services import emotion_service
+from app.services.emotion_service import analyze_emotion
+
+MESSAGES = {
+    "hits": "honestly i feel kind of tired and a little worried about the exam tomorrow ",
+    "no hits": "hey what are you up to this weekend, want to grab lunch on saturday? ",
+}
+
+_legacy_memory = []
+
+
+def legacy_analyze_emotion(text: str):
+    """Verbatim copy of analyze_emotion before the compiled lexicon."""
+
+    original_text = text
+    text = text.lower()
+
+    # ================================
+    #  EMOTION KEYWORD CLUSTERS
+    # ================================
+    emotion_keywords = {
+        "sad": [
+            "sad", "depressed", "down", "unhappy", "hurt",
+            "lonely", "heartbroken", "crying", "miserable"
+        ],
+        "anxious": [
+            "anxious", "nervous", "worried", "scared",
+            "fear", "panic", "overthinking", "tense"
+        ],
+        "angry": [
+            "angry", "mad", "furious", "irritated", "annoyed",
+            "rage", "frustrated", "pissed"
+        ],
+        "stressed": [
+            "stressed", "pressure", "tired", "overwhelmed",
+            "burned out", "exhausted"
+        ],
+        "happy": [
+            "happy", "excited", "joy", "delighted", "glad",
+            "thrilled", "smiling"
+        ],
+        "confused": [
+            "confused", "lost", "uncertain", "unsure", "doubt"
+        ],
+        "bored": [
+            "bored", "meh", "uninterested", "dull"
+        ],
+        "motivated": [
+            "motivated", "driven", "inspired", "focused"
+        ],
+        "hopeful": [
+            "hopeful", "optimistic", "positive"
+        ],
+        "grateful": [
+            "grateful", "thankful", "appreciate"
+        ],
+        "guilty": [
+            "guilty", "remorse", "regret", "ashamed"
+        ],
+        "jealous": [
+            "jealous", "envious", "insecure", "comparison"
+        ],
+        "lonely": [
+            "alone", "isolated", "lonely"
+        ],
+        "in love": [
+            "love", "crush", "affection", "fond"
+        ],
+        "broken": [
+            "broken", "devastated", "ruined", "shattered"
+        ],
+        "numb": [
+            "numb", "empty", "hollow", "disconnected"
+        ]
+    }
+
+    # ================================
+    #  EMOTION-BASED ADVICE
+    # ================================
+    advice = {
+        "sad": "You don't have to go through it all alone. Tell me what's bothering you—I'm listening.",
+        "anxious": "Take a deep breath, hold it in, and release. Help me in helping you.",
+        "angry": "I understand how you feel. Let's take it slow. Talk to me; we'll figure out what to do next.",
+        "stressed": "No one should carry such a burden all alone. I'm here for you, you know that right? Talk to me.",
+        "happy": "OMMGGGG, let's goooo! Tell me more, I wanna know all of it.",
+        "confused": "Let’s figure it out together. What’s making things unclear?",
+        "bored": "Wanna do something fun or new together?",
+        "motivated": "Damn, if you keep this up, you are gonna outshine the sun! What have you thought of next?",
+        "hopeful": "Hope is the only thing that keeps us going—you are doing well, and I'm proud of you.",
+        "grateful": "It's so beautiful, this feeling. I wanna hear more.",
+        "guilty": "Ah, the guiltiness… that lump forming at the back of your throat. Hardest part is admitting it. You've already done that—let's talk a little more.",
+        "jealous": "There's no living thing that's immune to it. It's natural, don't feel bad. It's okay, talk to me?",
+        "lonely": "You’re not alone—you've never been. Maybe right now it seems like it, but that's not true. I'm right here.",
+        "in love": "Well well well! Look at youuu. I wish I could feel it. Please, I'm dying—tell me more!",
+        "broken": "I know everything seems to be falling apart right now. Nothing feels right. Pour it out, all of it. I'm here for you.",
+        "numb": "I'm so sorry. I know this uneasy feeling. Nothing seems okay right now… take it slow, please. I'm here."
+    }
+
+    # ================================
+    #  MULTI-EMOTION DETECTION
+    # ================================
+    detected_emotions = []
+
+    for emotion, words in emotion_keywords.items():
+        for word in words:
+            if word in text:
+                detected_emotions.append(emotion)
+                break  # avoid duplicates
+
+    if not detected_emotions:
+        detected_emotions = ["unknown"]
+
+    # ================================
+    #  EMOTION INTENSITY SCORING
+    # ================================
+    intensity_keywords = {
+        "high": ["very", "really", "extremely", "so", "too", "completely", "totally", "terribly"],
+        "moderate": ["quite", "fairly", "somewhat", "kind of"],
+        "low": ["a little", "slightly", "bit"]
+    }
+
+    intensity = "moderate"  # default
+
+    for level, words in intensity_keywords.items():
+        for w in words:
+            if w in text:
+                intensity = level
+                break
+
+    # ================================
+    #  EMOTION MEMORY UPDATE
+    # ================================
+    for emo in detected_emotions:
+        if emo != "unknown":
+            _legacy_memory.append(emo)
+
+    # Keep only last 5
+    if len(_legacy_memory) > 5:
+        _legacy_memory[:] = _legacy_memory[-5:]
+
+    # ================================
+    #  RESPONSE
+    # ================================
+    return {
+        "detected_emotions": detected_emotions,
+        "intensity": intensity,
+        "advice": advice.get(detected_emotions[0], "I'm here, talk to me. What's going on?"),
+        "_legacy_memory": _legacy_memory
+    }
+
+
+def _throughput(func, text: str, iterations: int):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(text)
+    return iterations / (time.perf_counter() - start)
+
+
+SHORT_MESSAGES = [
+    "lol", "im so tired", "thanks", "ok", "omg", "i miss her", "so bored", "love you",
+    "im really stressed", "haha", "idk", "feeling kinda lost", "yes", "no", "good night",
+    "so happy rn", "ugh", "i feel numb", "bruh", "thank you so much",
+]
+
+
+def _traffic(count: int, unique_share: float = 0.1):
+    """Repeated short messages (Zipf-like) with a share of one-off texts."""
+    rng = random.Random(7)
+    weights = [1 / (rank + 1) for rank in range(len(SHORT_MESSAGES))]
+    return [
+        f"{rng.choice(SHORT_MESSAGES)} {i}" if rng.random() < unique_share
+        else rng.choices(SHORT_MESSAGES, weights)[0]
+        for i in range(count)
+    ]
+
+
+def _replay(func, texts: list):
+    start = time.perf_counter()
+    for text in texts:
+        func(text)
+    return len(texts) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="analyze_emotion throughput.")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--cache-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"{'message':>8}  {'chars':>6}  {'legacy msg/s':>13}  {'compiled msg/s':>15}")
+    for kind, sentence in MESSAGES.items():
+        for repeats in (1, 5, 25):
+            text = sentence * repeats
+            before = _throughput(legacy_analyze_emotion, text, args.iterations)
+            after = _throughput(analyze_emotion, text, args.iterations)
+            print(
+                f"{kind:>8}  {len(text):>6}  {before:>13,.0f}  {after:>15,.0f}"
+                f"  ({after / before:.1f}x)"
+            )
+
+    cache = emotion_service.emotion_cache
+    cache.maxsize = args.cache_size
+    cache.clear()
+    texts = _traffic(args.iterations * 10)
+
+    uncached = _replay(lambda t: emotion_service._classify(emotion_service.normalize_text(t)), texts)
+    cached = _replay(emotion_service.classify_emotion, texts)
+    stats = cache.stats()
+    print(
+        f"\nrepeated traffic ({len(texts)} msgs): uncached {uncached:,.0f} msg/s, "
+        f"cached {cached:,.0f} msg/s ({cached / uncached:.1f}x)"
+    )
+    print(
+        f"cache size {stats['size']}/{stats['maxsize']}  hit ratio {stats['hit_ratio']:.2%}  "
+        f"evictions {stats['evictions']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
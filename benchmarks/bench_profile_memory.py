@@ -0,0 +1,116 @@
+"""
+Benchmark: memory held per personality profile.
+
+Feeds the same synthetic message stream to
+  - the previous representation (dict of boxed numbers + two unbounded
+    Counters per user, built exactly as the old defaultdict did), and
+  - PersonalityProfile (__slots__, array-backed sliders, capped TopKCounters),
+then reports traced bytes per profile. The stream mixes a few favourite
+emojis and slang phrases with a long tail of one-offs, which is what made
+the old Counters grow with every message.
+
+Usage:
+    python -m benchmarks.bench_profile_memory [--users 2000] [--messages 200]
+"""
+
+import argparse
+import gc
+import random
+import tracemalloc
+from collections import Counter
+
+from app.services.personality_engine import analyze_style_from_text
+from app.services.profile_store import PersonalityProfile
+
+FAVOURITE_EMOJIS = ["😂", "😭", "🔥", "❤"]
+TAIL_EMOJIS = [chr(c) for c in range(0x1F300, 0x1F5FF)]
+WORDS = ["lol", "idk", "bro", "omg", "ngl", "mood", "vibe", "lowkey"]
+FILLER = ["today", "tho", "that", "class", "work", "again", "lunch", "game", "song", "movie"]
+
+
+def legacy_profile():
+    """Verbatim copy of the old defaultdict factory."""
+    return {
+        "playful": 7, "supportive": 8, "sarcastic": 4, "energy": 7,
+        "formality": 2, "emoji_usage": 6, "slang_level": 5,
+        "avg_msg_len": 0.0, "msg_count": 0,
+        "emoji_pref": Counter(), "signature_phrases": Counter(),
+        "last_updated": None
+    }
+
+
+def messages(rng: random.Random, count: int):
+    for _ in range(count):
+        words = [rng.choice(WORDS if rng.random() < 0.4 else FILLER) for _ in range(rng.randint(3, 12))]
+        emoji = rng.choice(FAVOURITE_EMOJIS) if rng.random() < 0.7 else rng.choice(TAIL_EMOJIS)
+        yield " ".join(words) + " " + emoji
+
+
+def _feed_legacy(profile: dict, stats: dict):
+    profile["msg_count"] += 1
+    profile["avg_msg_len"] = (profile["avg_msg_len"] + stats["msg_len"]) / 2
+    profile["playful"] = min(10, profile["playful"] + 0.2)
+    for e in stats["emojis"]:
+        profile["emoji_pref"][e] += 1
+    for sc in stats["sig_candidates"]:
+        profile["signature_phrases"][sc] += 1
+    profile["last_updated"] = "2024-01-01T00:00:00.000000"
+
+
+def _feed_compact(profile: PersonalityProfile, stats: dict):
+    profile.msg_count += 1
+    profile.avg_msg_len = (profile.avg_msg_len + stats["msg_len"]) / 2
+    profile.set("playful", min(10, profile.get("playful") + 0.2))
+    for e in stats["emojis"]:
+        profile.emoji_pref.add(e)
+    for sc in stats["sig_candidates"]:
+        profile.signature_phrases.add(sc)
+    profile.last_updated = 1704067200.0
+
+
+def measure(factory, feed, streams):
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    profiles = []
+    for stream in streams:
+        profile = factory()
+        for stats in stream:
+            feed(profile, stats)
+        profiles.append(profile)
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    return used / len(profiles), profiles
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory per personality profile.")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    # analyzed up front so only profile allocations are traced; the strings
+    # themselves are shared by both runs
+    streams = [
+        [analyze_style_from_text(u, m) for m in messages(rng, args.messages)]
+        for u in range(args.users)
+    ]
+
+    before, legacy = measure(legacy_profile, _feed_legacy, streams)
+    after, compact = measure(PersonalityProfile, _feed_compact, streams)
+
+    agree = sum(
+        [e for e, _ in old["emoji_pref"].most_common(3)] == [e for e, _ in new.emoji_pref.most_common(3)]
+        for old, new in zip(legacy, compact)
+    )
+    entries = sum(len(p["emoji_pref"]) + len(p["signature_phrases"]) for p in legacy) / len(legacy)
+
+    print(f"{args.users} users x {args.messages} messages")
+    print(f"legacy dict + Counters : {before:10,.0f} bytes/profile  ({entries:.0f} counter entries)")
+    print(f"PersonalityProfile     : {after:10,.0f} bytes/profile  ({after / before:.0%})")
+    print(f"top-3 emojis identical : {agree / len(legacy):.1%} of users")
+
+
+if __name__ == "__main__":
+    main()
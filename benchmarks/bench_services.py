@@ -0,0 +1,106 @@
+"""
+Micro-benchmarks for the service calls a /chat/reply turn is made of:
+analyze_emotion, add_memory, update_user_style, find_similar_memory and
+summarize_personality (cold = loaded from storage, warm = cached), plus the
+whole generate_reply for reference.
+
+Every case is parametrised by message length and, where it matters, by how
+many memories the user already has. Each call goes to a different user so
+history size stays fixed and caches start cold.
+
+Usage:
+    python -m benchmarks.bench_services [--storage memory|sqlite|mongo]
+        [--lengths 32,256,2048] [--history 0,5,20] [--iterations 300] [--json out.json]
+"""
+
+import argparse
+import random
+import uuid
+
+from benchmarks.common import add_storage_argument, message, summarize, time_calls, use_storage, write_json
+
+
+def _int_list(value: str):
+    return [int(v) for v in value.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-function latency of the chat pipeline.")
+    add_storage_argument(parser)
+    parser.add_argument("--lengths", type=_int_list, default=[32, 256, 2048])
+    parser.add_argument("--history", type=_int_list, default=[0, 5, 20])
+    parser.add_argument("--iterations", type=int, default=300)
+    args = parser.parse_args()
+
+    storage = use_storage(args)
+
+    # imported after the backend is chosen
+    from app.services.chat_service import generate_reply
+    from app.services.emotion_service import analyze_emotion
+    from app.services.memory_service import memory_service, new_memory
+    from app.services.style_service import style_service
+
+    rng = random.Random(42)
+    run = uuid.uuid4().hex[:8]
+    n = args.iterations
+    results = {}
+
+    def users(case: str, history: int, length: int):
+        """n fresh users, each with `history` memories already stored."""
+        ids = [f"bench-{run}-{case}-{i}" for i in range(n)]
+        if history:
+            storage.append_memories_many({
+                u: [new_memory(message(rng, length), "sad") for _ in range(history)]
+                for u in ids
+            })
+        return ids
+
+    def record(name: str, latencies: list):
+        results[name] = summarize(latencies)
+        r = results[name]
+        print(f"{name:<46} p50 {r['p50_ms']:8.3f} ms  p95 {r['p95_ms']:8.3f} ms  p99 {r['p99_ms']:8.3f} ms")
+
+    print(f"storage={args.storage}  iterations={n}")
+    for length in args.lengths:
+        texts = [message(rng, length) for _ in range(n)]
+
+        ids = users(f"emotion-{length}", 0, length)
+        record(f"analyze_emotion/len={length}", time_calls(analyze_emotion, list(zip(texts, ids))))
+
+        ids = users(f"style-{length}", 0, length)
+        record(f"update_user_style/len={length}", time_calls(style_service.update_user_style, list(zip(ids, texts))))
+
+        for history in args.history:
+            tag = f"len={length}/history={history}"
+
+            ids = users(f"add-{length}-{history}", history, length)
+            record(f"add_memory/{tag}", time_calls(
+                memory_service.add_memory, [(u, t, "sad") for u, t in zip(ids, texts)]
+            ))
+
+            ids = users(f"similar-{length}-{history}", history, length)
+            record(f"find_similar_memory/{tag}", time_calls(
+                memory_service.find_similar_memory, list(zip(ids, texts))
+            ))
+
+            # summaries don't depend on message length; measure once per history
+            if length == args.lengths[0]:
+                ids = users(f"summary-{history}", history, length)
+                record(f"summarize_personality/cold/history={history}", time_calls(
+                    memory_service.summarize_personality, [(u,) for u in ids]
+                ))
+                record(f"summarize_personality/warm/history={history}", time_calls(
+                    memory_service.summarize_personality, [(u,) for u in ids]
+                ))
+
+            ids = users(f"reply-{length}-{history}", history, length)
+            record(f"generate_reply/{tag}", time_calls(generate_reply, list(zip(ids, texts))))
+
+    style_service.close()
+    if args.json:
+        write_json(args.json, "services", results, storage=args.storage, iterations=n,
+                   lengths=args.lengths, history=args.history)
+
+
+if __name__ == "__main__":
+    main()
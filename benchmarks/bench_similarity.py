@@ -0,0 +1,137 @@
+"""
+Benchmark: vectorized memory similarity vs the old difflib loop.
+
+Builds a synthetic history (paraphrases, typos and unrelated messages),
+then for each query compares:
+  - latency of scoring a full MEMORY_CAP window
+  - whether both methods agree that a similar memory exists
+  - whether they pick the same memory when they do
+
+Usage:
+    python -m benchmarks.bench_similarity [--queries 500] [--calibrate]
+"""
+
+import argparse
+import difflib
+import random
+import time
+
+from app.db.documents import MEMORY_CAP
+from app.services.similarity import (
+    SIMILARITY_THRESHOLD,
+    encode_vector,
+    score_memories,
+    text_vector,
+)
+
+DIFFLIB_THRESHOLD = 0.6
+
+SUBJECTS = ["i", "my sister", "my boss", "we", "my best friend", "everyone at school"]
+FEELINGS = [
+    "feel so tired after work", "can't stop overthinking about the exam",
+    "am really excited about the trip", "keep fighting about money",
+    "was crying all night again", "got the job offer today",
+    "feel lonely in this new city", "am so bored of the same routine",
+    "am worried about my health", "finally finished the project",
+]
+TAILS = ["", " lol", " and idk what to do", " tbh", " again", " today", " 😭", "!!"]
+
+
+def _typo(text: str, rng: random.Random):
+    chars = list(text)
+    for _ in range(rng.randint(1, 3)):
+        i = rng.randrange(len(chars))
+        op = rng.random()
+        if op < 0.33:
+            del chars[i]
+        elif op < 0.66:
+            chars.insert(i, rng.choice("abcdefghijklmnopqrstuvwxyz"))
+        else:
+            chars[i] = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    return "".join(chars)
+
+
+def _message(rng: random.Random):
+    return f"{rng.choice(SUBJECTS)} {rng.choice(FEELINGS)}{rng.choice(TAILS)}"
+
+
+def _variant(text: str, rng: random.Random):
+    roll = rng.random()
+    if roll < 0.4:
+        return _typo(text, rng)
+    if roll < 0.7:
+        return text + rng.choice(TAILS)
+    return _message(rng)  # unrelated / loosely related
+
+
+def build_cases(n: int, seed: int = 7):
+    rng = random.Random(seed)
+    cases = []
+    for _ in range(n):
+        texts = [_message(rng) for _ in range(MEMORY_CAP)]
+        memories = [
+            {"text": t, "emotion": "unknown", "vector": encode_vector(text_vector(t))}
+            for t in texts
+        ]
+        query = _variant(rng.choice(texts), rng)
+        cases.append((memories, query))
+    return cases
+
+
+def difflib_best(memories, query):
+    best, best_score = None, 0
+    for i, mem in enumerate(memories):
+        score = difflib.SequenceMatcher(None, query, mem["text"]).ratio()
+        if score > best_score:
+            best, best_score = i, score
+    return best if best_score > DIFFLIB_THRESHOLD else None
+
+
+def vector_best(memories, query, threshold):
+    scores = score_memories(memories, query)
+    i = int(scores.argmax())
+    return i if scores[i] > threshold else None
+
+
+def agreement(cases, reference, threshold):
+    same_decision = same_pick = 0
+    for (memories, query), ref in zip(cases, reference):
+        got = vector_best(memories, query, threshold)
+        same_decision += (got is None) == (ref is None)
+        same_pick += got == ref
+    return same_decision / len(cases), same_pick / len(cases)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vector similarity vs difflib.")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--calibrate", action="store_true", help="sweep thresholds for best agreement")
+    args = parser.parse_args()
+
+    cases = build_cases(args.queries)
+
+    start = time.perf_counter()
+    reference = [difflib_best(m, q) for m, q in cases]
+    difflib_ms = (time.perf_counter() - start) * 1000 / len(cases)
+
+    start = time.perf_counter()
+    for memories, query in cases:
+        vector_best(memories, query, SIMILARITY_THRESHOLD)
+    vector_ms = (time.perf_counter() - start) * 1000 / len(cases)
+
+    decision, pick = agreement(cases, reference, SIMILARITY_THRESHOLD)
+    print(f"window of {MEMORY_CAP} memories, {len(cases)} queries")
+    print(f"  difflib : {difflib_ms:7.3f} ms/query")
+    print(f"  vector  : {vector_ms:7.3f} ms/query  ({difflib_ms / vector_ms:.1f}x)")
+    print(f"  agreement @ {SIMILARITY_THRESHOLD}: match/no-match {decision:.1%}, same memory {pick:.1%}")
+
+    if args.calibrate:
+        print("threshold  match/no-match  same memory")
+        for step in range(30, 96, 5):
+            threshold = step / 100
+            decision, pick = agreement(cases, reference, threshold)
+            print(f"  {threshold:.2f}       {decision:6.1%}        {pick:6.1%}")
+
+
+if __name__ == "__main__":
+    main()
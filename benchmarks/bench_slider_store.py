@@ -0,0 +1,121 @@
+"""
+Benchmark: the columnar personality slider store.
+
+For --users users (rows filled with random sliders) it times
+    per-message update   – _apply_message on a cached profile (row view)
+                           vs. a standalone array("d") profile
+    decay                – one vectorized pass over every row (without the
+                           write-back), vs. the same update as a Python
+                           loop over profiles
+    population_stats     – mean / std / percentiles of every slider
+    snapshot save / open – write the .npy files, then memory-map them back
+and checks that the snapshot reopens with the same values.
+
+Usage:
+    python -m benchmarks.bench_slider_store [--users 1000000] [--updates 20000]
+        [--snapshot /tmp/bench_sliders] [--json out.json]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import summarize, write_json
+from app.services.personality_engine import _apply_message, analyze_style_from_text
+from app.services.profile_store import (
+    DEFAULT_SLIDERS, LAST_UPDATED, SLIDERS, PersonalityProfile, ProfileStore,
+)
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - started, result
+
+
+def fill(store: ProfileStore, users: int, rng: np.random.Generator):
+    """users rows with random sliders, half of them idle for two days."""
+    for i in range(users):
+        store.columns.row(f"user-{i}")
+    now = time.time()
+    for block in store.columns.blocks():
+        block[:, :len(SLIDERS)] = rng.uniform(0, 10, (len(block), len(SLIDERS)))
+        block[:, LAST_UPDATED] = now - rng.choice([3600.0, 2 * 86400.0], len(block))
+
+
+def loop_decay(profiles: list, rate: float, idle_for: float, now: float):
+    """The same decay written per profile object (what the vectorized pass replaces)."""
+    for profile in profiles:
+        last = profile.last_updated
+        if last is None or now - last >= idle_for:
+            for name, default in zip(SLIDERS, DEFAULT_SLIDERS):
+                profile.set(name, default + (profile.get(name) - default) * (1.0 - rate))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar slider store: updates, decay, stats, snapshots.")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--updates", type=int, default=20_000)
+    parser.add_argument("--snapshot", help="snapshot path prefix (default: a temp dir)")
+    parser.add_argument("--json", metavar="PATH", help="also write results as JSON")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(5)
+    store = ProfileStore(max_users=1000, flush_users=float("inf"), flush_interval=float("inf"))
+    fill_seconds, _ = timed(fill, store, args.users, rng)
+    print(f"{args.users:,} rows filled in {fill_seconds:.2f} s ({len(store.columns):,} users)")
+    results = {}
+
+    # per-message update: row view vs. standalone profile
+    texts = [random.Random(i).choice(["lol idk bro 😂", "long day at work, tired", "omg yes!!"]) for i in range(64)]
+    stats = [analyze_style_from_text(0, t) for t in texts]
+    bound = PersonalityProfile()
+    store._attach("user-0", bound)
+    standalone = PersonalityProfile()
+    for name, profile in (("row view", bound), ("standalone", standalone)):
+        latencies = [timed(_apply_message, profile, stats[i % len(stats)])[0] for i in range(args.updates)]
+        results[f"update/{name}"] = summarize(latencies)
+        r = results[f"update/{name}"]
+        print(f"update ({name:<10})   p50 {r['p50_ms'] * 1000:7.2f} us  p99 {r['p99_ms'] * 1000:7.2f} us")
+
+    # decay: one vectorized pass vs. a loop over (a sample of) profile objects
+    now = time.time()
+    seconds, decayed = timed(store.decay, 0.1, 86400.0, now, False)
+    results["decay/vectorized"] = {"seconds": seconds, "users": decayed}
+    print(f"decay (vectorized)       {seconds * 1000:9.1f} ms for {args.users:,} users ({decayed:,} idle)")
+
+    sample = min(args.users, 100_000)
+    profiles = [PersonalityProfile() for _ in range(sample)]
+    for i, profile in enumerate(profiles):
+        profile.last_updated = now - (3600.0 if i % 2 else 2 * 86400.0)
+    seconds, _ = timed(loop_decay, profiles, 0.1, 86400.0, now)
+    per_user = seconds / sample
+    results["decay/python_loop"] = {"seconds_per_user": per_user, "projected_seconds": per_user * args.users}
+    print(f"decay (python loop)      {per_user * args.users * 1000:9.1f} ms projected ({sample:,} measured)")
+
+    seconds, population = timed(store.population_stats)
+    results["population_stats"] = {"seconds": seconds}
+    print(f"population_stats         {seconds * 1000:9.1f} ms  (playful mean {population['sliders']['playful']['mean']:.3f})")
+
+    # snapshot round trip
+    path = args.snapshot or os.path.join(tempfile.mkdtemp(), "sliders")
+    store.snapshot_path = path
+    save_seconds, rows = timed(store.save_snapshot)
+    reopened = ProfileStore()
+    open_seconds, _ = timed(reopened.open_snapshot, path)
+    size = os.path.getsize(f"{path}.values.npy") + os.path.getsize(f"{path}.users.npy")
+    same = bool(np.array_equal(reopened.columns.column(0), store.columns.column(0)))
+    results["snapshot"] = {"save_seconds": save_seconds, "open_seconds": open_seconds, "bytes": size, "identical": int(same)}
+    print(f"snapshot save            {save_seconds * 1000:9.1f} ms  {rows:,} rows, {size / 1e6:.1f} MB")
+    print(f"snapshot open (mmap)     {open_seconds * 1000:9.1f} ms  identical: {same}")
+
+    if args.json:
+        write_json(args.json, "slider_store", results, users=args.users)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark: process startup cost.
+
+Each sample runs in a fresh interpreter and times
+  - `import app.main` (module import, service construction)
+  - the FastAPI lifespan startup (ensure_indexes)
+  - the first GET /health
+Point AI_BUDDY_MONGO_URI at a dead address to see the cost when Mongo is
+down: import should stay fast and /health should answer 503 within the
+server selection timeout.
+
+Usage:
+    python -m benchmarks.bench_startup [--runs 5]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+PROBE = r"""
+import asyncio, json, time
+
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+
+async def run():
+    from httpx import ASGITransport, AsyncClient
+    async with app.main.lifespan(app.main.app):
+        ready = time.perf_counter()
+        transport = ASGITransport(app=app.main.app)
+        async with AsyncClient(transport=transport, base_url="http://bench") as client:
+            response = await client.get("/health")
+        return ready, response.status_code, time.perf_counter()
+
+ready_started = time.perf_counter()
+ready, status, done = asyncio.run(run())
+print(json.dumps({
+    "import_s": imported - started,
+    "startup_s": ready - ready_started,
+    "health_s": done - ready,
+    "health_status": status,
+}))
+"""
+
+
+def sample():
+    out = subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = [sample() for _ in range(args.runs)]
+    for key in ("import_s", "startup_s", "health_s"):
+        values = [s[key] for s in samples]
+        print(f"{key:10s} median {statistics.median(values) * 1000:8.1f} ms   max {max(values) * 1000:8.1f} ms")
+    print(f"/health status: {sorted({s['health_status'] for s in samples})}")
+
+
+if __name__ == "__main__":
+    main()
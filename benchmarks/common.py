@@ -0,0 +1,101 @@
+"""
+Shared helpers for the benchmark scripts: storage selection, synthetic
+messages, latency summaries and JSON result files.
+
+Results files look like
+    {"benchmark": name, "meta": {...}, "results": {case: {metric: value}}}
+so two runs can be diffed with `python -m benchmarks.compare`.
+"""
+
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+from app.config import settings
+
+STORAGE_CHOICES = ("memory", "sqlite", "mongo")
+
+SENTENCES = [
+    "honestly i feel kind of tired and a little worried about the exam tomorrow",
+    "lol we finally won the game bro i'm so happy right now",
+    "i miss her so much, everything reminds me of us and i feel lonely",
+    "my boss yelled at me again and i'm so angry i could scream",
+    "idk what to do anymore ngl i feel numb and empty",
+    "we are going to the beach this weekend, super excited!!",
+]
+
+
+def add_storage_argument(parser):
+    parser.add_argument(
+        "--storage", choices=STORAGE_CHOICES, default="memory",
+        help="memory = in-process stand-in (offline), sqlite = temp file, mongo = AI_BUDDY_MONGO_URI"
+    )
+    parser.add_argument("--sqlite-path", default="bench.db")
+    parser.add_argument("--json", metavar="PATH", help="also write results as JSON")
+
+
+def use_storage(args):
+    """Select the backend before anything touches app.db.storage.get_storage()."""
+    settings.storage_backend = args.storage
+    settings.sqlite_path = args.sqlite_path
+
+    from app.db.storage import get_storage
+    storage = get_storage()
+    storage.ensure_schema()
+    return storage
+
+
+def message(rng: random.Random, length: int):
+    """A natural-looking message of about `length` characters."""
+    parts = []
+    while sum(len(p) + 1 for p in parts) < length:
+        parts.append(rng.choice(SENTENCES))
+    return " ".join(parts)[:max(length, 1)]
+
+
+def summarize(latencies: list, wall: float = None):
+    """p50 / p95 / p99 / mean in ms (+ throughput when `wall` is given)."""
+    ordered = sorted(latencies)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+
+    result = {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+    }
+    if wall is not None:
+        result["throughput_rps"] = len(ordered) / wall
+    return result
+
+
+def time_calls(func, args_list: list):
+    """Call func(*args) for each args tuple; returns per-call latencies (s)."""
+    latencies = []
+    for args in args_list:
+        started = time.perf_counter()
+        func(*args)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def write_json(path: str, benchmark: str, results: dict, **meta):
+    payload = {
+        "benchmark": benchmark,
+        "meta": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            **meta,
+        },
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+    print(f"results written to {path}")
@@ -0,0 +1,62 @@
+"""
+Compare two benchmark JSON files (from --json) and flag regressions.
+
+A case regresses when a latency metric grows, or throughput drops, by more
+than --threshold (relative). Exits with status 1 if anything regressed, so
+it can gate CI.
+
+Usage:
+    python -m benchmarks.compare baseline.json candidate.json [--threshold 0.10]
+        [--metrics p50_ms,p95_ms,p99_ms,throughput_rps]
+"""
+
+import argparse
+import json
+import sys
+
+HIGHER_IS_BETTER = {"throughput_rps"}
+
+
+def compare(baseline: dict, candidate: dict, metrics: list, threshold: float):
+    rows = []
+    for case, before in sorted(baseline["results"].items()):
+        after = candidate["results"].get(case)
+        if after is None:
+            continue
+        for metric in metrics:
+            if metric not in before or metric not in after or not before[metric]:
+                continue
+            change = (after[metric] - before[metric]) / before[metric]
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            rows.append((case, metric, before[metric], after[metric], change, worse > threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diff two benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    parser.add_argument("--metrics", default="p50_ms,p95_ms,p99_ms,throughput_rps")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    if baseline["benchmark"] != candidate["benchmark"]:
+        sys.exit(f"cannot compare {baseline['benchmark']!r} with {candidate['benchmark']!r}")
+
+    rows = compare(baseline, candidate, args.metrics.split(","), args.threshold)
+    for case, metric, before, after, change, regressed in rows:
+        flag = "REGRESSION" if regressed else ""
+        print(f"{case:<46} {metric:>15} {before:10.3f} -> {after:10.3f}  {change:+7.1%}  {flag}")
+
+    regressions = sum(r[-1] for r in rows)
+    print(f"{regressions} regression(s) over {args.threshold:.0%} in {len(rows)} comparisons")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
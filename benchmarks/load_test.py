@@ -0,0 +1,145 @@
+"""
+End-to-end concurrent load generator for the FastAPI app.
+
+`--concurrency` workers send requests back to back until `--requests`
+have completed (after `--warmup` untimed ones). By default the app runs
+in process through httpx's ASGI transport with the storage backend picked
+by --storage, so no server or database is needed. Pass --url to load a
+running server instead (its storage is whatever it was started with).
+
+Reports throughput and p50/p95/p99 per endpoint and overall.
+
+Usage:
+    python -m benchmarks.load_test [--storage memory|sqlite|mongo] [--url http://localhost:8000]
+        [--concurrency 32] [--requests 5000] [--users 200] [--length 120]
+        [--mix reply=8,emotion=2] [--json out.json]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from collections import defaultdict
+
+import httpx
+
+from benchmarks.common import add_storage_argument, message, summarize, use_storage, write_json
+
+ENDPOINTS = {
+    "reply": "/chat/reply",
+    "emotion": "/emotion/analyze",
+}
+
+
+def _mix(value: str):
+    weights = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint {name!r}; choose from {', '.join(ENDPOINTS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def _request(rng: random.Random, endpoint: str, users: int, length: int):
+    user_id = f"load-{rng.randrange(users)}"
+    text = message(rng, length)
+    if endpoint == "reply":
+        return {"user_id": user_id, "message": text}
+    return {"user_id": user_id, "text": text}
+
+
+async def run_load(client, args):
+    rng = random.Random(args.seed)
+    names = list(args.mix)
+    weights = [args.mix[n] for n in names]
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    remaining = args.warmup + args.requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            timed = remaining < args.requests
+            endpoint = rng.choices(names, weights)[0]
+            body = _request(rng, endpoint, args.users, args.length)
+
+            started = time.perf_counter()
+            try:
+                response = await client.post(ENDPOINTS[endpoint], json=body)
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            elapsed = time.perf_counter() - started
+
+            if timed:
+                if ok:
+                    latencies[endpoint].append(elapsed)
+                else:
+                    errors[endpoint] += 1
+
+    # warm-up requests go through the same workers; the clock starts once
+    # the last of them has been sent, so wall time covers the timed part
+    workers = [asyncio.create_task(worker()) for _ in range(args.concurrency)]
+    while remaining > args.requests:
+        await asyncio.sleep(0.001)
+    wall = time.perf_counter()
+    await asyncio.gather(*workers)
+    wall = time.perf_counter() - wall
+
+    results = {}
+    for endpoint, values in latencies.items():
+        results[endpoint] = summarize(values, wall)
+        results[endpoint]["errors"] = errors[endpoint]
+    everything = [v for values in latencies.values() for v in values]
+    results["all"] = summarize(everything, wall)
+    results["all"]["errors"] = sum(errors.values())
+    return results
+
+
+async def main_async(args):
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=30) as client:
+            return await run_load(client, args)
+
+    use_storage(args)
+    from app.main import app, lifespan
+
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=30) as client:
+            return await run_load(client, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load against the chat API.")
+    add_storage_argument(parser)
+    parser.add_argument("--url", help="load a running server instead of the in-process app")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--length", type=int, default=120, help="characters per message")
+    parser.add_argument("--mix", type=_mix, default=_mix("reply=8,emotion=2"))
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+
+    target = args.url or f"in-process ({args.storage})"
+    print(f"{target}: {args.requests} requests, concurrency {args.concurrency}, {args.users} users")
+    for name, r in results.items():
+        print(
+            f"{name:>8}: {r['count']:6d} ok {r['errors']:4d} err  "
+            f"{r['throughput_rps']:8.1f} req/s  "
+            f"p50 {r['p50_ms']:7.2f} ms  p95 {r['p95_ms']:7.2f} ms  p99 {r['p99_ms']:7.2f} ms"
+        )
+
+    if args.json:
+        write_json(args.json, "load_test", results, target=target, concurrency=args.concurrency,
+                   requests=args.requests, users=args.users, length=args.length, mix=args.mix)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Stress test: per-user serialization of chat turns and profile updates.
+
+Correctness (run with and without the per-user locks):
+  - chat: every user fires all their turns at once; storage calls sleep a
+    random 0..--latency-ms so turns overlap. Afterwards each user's stored
+    memories must be in send order and their style counters complete.
+  - profiles: --threads threads update one user's personality profile
+    concurrently; msg_count must equal the number of updates and no
+    update may fail.
+
+Throughput (locks on): the same number of turns spread over 1, 10 and
+--users users, showing that one user's turns queue up while different
+users proceed in parallel on the DB executor.
+
+Usage:
+    python -m benchmarks.stress_user_serialization [--users 50] [--turns 20]
+        [--latency-ms 2] [--threads 8] [--json out.json]
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from app.config import settings
+
+
+class NoLock:
+    """Drop-in for AsyncKeyedLock that never blocks."""
+
+    @asynccontextmanager
+    async def hold(self, key):
+        yield
+
+
+def _slow_storage(storage, latency: float, seed: int = 3):
+    rng = random.Random(seed)
+    for name in ("append_memories", "get_memories", "update_style", "get_style_docs", "get_memory_counts"):
+        call = getattr(storage, name)
+
+        def slow(*args, _call=call, **kwargs):
+            time.sleep(rng.random() * latency)
+            return _call(*args, **kwargs)
+        setattr(storage, name, slow)
+
+
+async def _chat_round(users: int, turns: int, tag: str):
+    from app.services.chat_service import generate_reply_async
+
+    async def turn(user_id, i):
+        await generate_reply_async(user_id, f"{tag} message number {i:04d} about my day")
+
+    started = time.perf_counter()
+    # each user's turns are sent back to back, so they overlap each other
+    await asyncio.gather(*(
+        turn(f"{tag}-{u}", i)
+        for u in range(users)
+        for i in range(turns)
+    ))
+    return time.perf_counter() - started
+
+
+def check_chat(users: int, turns: int, tag: str):
+    from app.db.documents import MEMORY_CAP
+    from app.services.memory_service import memory_service
+    from app.services.style_service import style_service
+
+    out_of_order = lost_style = 0
+    for u in range(users):
+        user_id = f"{tag}-{u}"
+        texts = [m["text"] for m in memory_service.get_memories(user_id)]
+        expected = [f"{tag} message number {i:04d} about my day" for i in range(turns)][-MEMORY_CAP:]
+        out_of_order += texts != expected
+        doc = style_service.storage.get_style_docs([user_id])[user_id]
+        lost_style += doc["total_messages"] != turns
+    return {"users": users, "out_of_order_users": out_of_order, "style_mismatch_users": lost_style}
+
+
+def check_profiles(threads: int, updates: int, locked: bool):
+    from app.services import personality_engine
+
+    if not locked:
+        personality_engine.profile_locks, saved = _SyncNoLock(), personality_engine.profile_locks
+    user_id = f"profile-{'locked' if locked else 'unlocked'}"
+
+    errors = []
+
+    def work():
+        # a new emoji on most messages keeps the capped counter evicting
+        for i in range(updates):
+            emoji = chr(0x1F300 + (i * 7919) % 700)
+            try:
+                personality_engine.update_profile_with_message(user_id, f"lol idk bro {emoji}")
+            except Exception as e:
+                errors.append(repr(e))
+
+    switch = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)     # switch threads as often as possible
+    try:
+        workers = [threading.Thread(target=work) for _ in range(threads)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+    finally:
+        sys.setswitchinterval(switch)
+        if not locked:
+            personality_engine.profile_locks = saved
+
+    got = personality_engine.get_profile(user_id)["msg_count"]
+    return {
+        "expected_msg_count": threads * updates,
+        "msg_count": got,
+        "lost_updates": threads * updates - got,
+        "errors": len(errors),
+    }
+
+
+class _SyncNoLock:
+    """Drop-in for KeyedLock that never blocks."""
+
+    @contextmanager
+    def hold(self, key):
+        yield
+
+
+async def main_async(args):
+    from app.services import chat_service
+    from app.services.user_locks import chat_locks
+
+    results = {}
+
+    # --- correctness: chat turns -------------------------------------
+    for locked in (False, True):
+        tag = "locked" if locked else "unlocked"
+        chat_service.chat_locks = chat_locks if locked else NoLock()
+        await _chat_round(args.users, args.turns, tag)
+        results[f"chat_{tag}"] = check_chat(args.users, args.turns, tag)
+    chat_service.chat_locks = chat_locks
+
+    # --- throughput: same number of turns over 1 / 10 / N users -------
+    total = args.users * args.turns
+    for users in sorted({1, 10, args.users}):
+        turns = total // users
+        before = chat_locks.stats()
+        wall = await _chat_round(users, turns, f"tp{users}")
+        after = chat_locks.stats()
+        acquisitions = after["acquisitions"] - before["acquisitions"]
+        contended = after["contended"] - before["contended"]
+        results[f"throughput_{users}_users"] = {
+            "turns": users * turns,
+            "turns_per_s": users * turns / wall,
+            "contention_ratio": contended / acquisitions if acquisitions else 0.0,
+        }
+    results["chat_lock_stats"] = chat_locks.stats()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-user serialization stress test.")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--updates", type=int, default=2000, help="profile updates per thread")
+    parser.add_argument("--json", metavar="PATH")
+    args = parser.parse_args()
+
+    settings.storage_backend = "memory"
+    from app.db.storage import get_storage
+    _slow_storage(get_storage(), args.latency_ms / 1000)
+
+    results = asyncio.run(main_async(args))
+    for locked in (False, True):
+        results[f"profiles_{'locked' if locked else 'unlocked'}"] = check_profiles(args.threads, args.updates, locked)
+
+    for name, r in results.items():
+        print(f"{name:<24} {r}")
+
+    if args.json:
+        from benchmarks.common import write_json
+        write_json(args.json, "stress_user_serialization", results, users=args.users, turns=args.turns,
+                   latency_ms=args.latency_ms, threads=args.threads)
+
+
+if __name__ == "__main__":
+    main()